@@ -1,139 +1,557 @@
+import importlib
 import json
+import shutil
+import threading
+import tempfile
 import boto3
-import cv2
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 import numpy as np
 import subprocess
 import os
-from moviepy.editor import VideoFileClip
-import speech_recognition as sr
-import openai
+import multiprocessing
+from multiprocessing.connection import wait
+from concurrent.futures import ThreadPoolExecutor
+from result_cache import ResultCache, MemoryTier, DirectoryTier, S3Tier, cache_key
+import instrumentation
 
-s3 = boto3.client('s3')
-openai.api_key = os.environ['OPENAI_API_KEY'] 
+class LazyModule:
+    # Stands in for a module and imports it on first attribute access, so a cold start
+    # only pays for the libraries the invocation actually uses
 
-def detect_faces(video_file):
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    cap = cv2.VideoCapture(video_file)
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+def lazy_import(name):
+    return LazyModule(name)
+
+cv2 = lazy_import('cv2')
+frame_source = lazy_import('frame_source')
+sr = lazy_import('speech_recognition')
+openai = lazy_import('openai')
+
+# Heavy resources loaded once per container (and once per segment worker process)
+warm_resources = {}
+warm_resources_lock = threading.Lock()
+
+def warm_resource(name, loader):
+    resource = warm_resources.get(name)
+    if resource is None:
+        with warm_resources_lock:
+            resource = warm_resources.get(name)
+            if resource is None:
+                resource = warm_resources[name] = loader()
+    return resource
+
+def face_cascade():
+    return warm_resource(
+        'face_cascade',
+        lambda: cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    )
+
+# S3 transfers: multipart above S3_PART_SIZE, S3_MAX_CONCURRENCY parts in flight per file.
+# S3_ENDPOINT_URL points the client at another S3 API, e.g. s3_standin.py for local runs.
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL') or None
+S3_PART_SIZE = int(os.environ.get('S3_PART_SIZE', str(16 * 1024 * 1024)))
+S3_MAX_CONCURRENCY = int(os.environ.get('S3_MAX_CONCURRENCY', '10'))
+UPLOAD_THREADS = int(os.environ.get('UPLOAD_THREADS', '3'))
+STREAM_INPUT = os.environ.get('STREAM_INPUT', 'true').lower() == 'true'  # ffmpeg reads a presigned URL instead of a downloaded copy
+PRESIGNED_URL_EXPIRES = 3600
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=S3_PART_SIZE,
+    multipart_chunksize=S3_PART_SIZE,
+    max_concurrency=S3_MAX_CONCURRENCY,
+    use_threads=True
+)
+s3 = boto3.client(
+    's3',
+    endpoint_url=S3_ENDPOINT_URL,
+    config=Config(
+        max_pool_connections=S3_MAX_CONCURRENCY * UPLOAD_THREADS,
+        s3={'addressing_style': 'path' if S3_ENDPOINT_URL else 'auto'}
+    )
+)
+OPENAI_API_KEY = os.environ['OPENAI_API_KEY']
+
+# Face tracking settings
+DETECT_STRIDE = 5  # Run the Haar cascade on every Nth frame and interpolate in between
+DETECT_WIDTH = 480  # Frames are downscaled to this width before detection
+CROP_SMOOTHING = 0.2  # Weight of the new position in the crop window's moving average
+CROP_HEIGHT_RATIO = 0.9  # Crop window height as a fraction of the frame height
+
+# Output encoding (x264 through an ffmpeg pipe)
+ENCODE_PRESET = os.environ.get('ENCODE_PRESET', 'veryfast')
+ENCODE_CRF = int(os.environ.get('ENCODE_CRF', '23'))
+
+# Segments are cropped in parallel, one process per vCPU, while finished ones upload
+SEGMENT_WORKERS = int(os.environ.get('SEGMENT_WORKERS', str(os.cpu_count() or 1)))
+
+# Transcription: audio is split on pauses and the chunks are recognised concurrently
+SPEECH_BACKEND = os.environ.get('SPEECH_BACKEND', 'google')
+TRANSCRIBE_WORKERS = int(os.environ.get('TRANSCRIBE_WORKERS', '8'))
+TRANSCRIBE_SAMPLE_RATE = 16000
+CHUNK_MIN_SECONDS = 5.0  # Cut at the first pause after this much audio
+CHUNK_MAX_SECONDS = 30.0  # Hard limit per recognition request
+CHUNK_WINDOW_SECONDS = 0.05
+CHUNK_SILENCE_DB = -35.0  # Windows this far below the loudest window count as pauses
+
+# Stage result cache, keyed by the source object's ETag. Bump a stage's version when its output changes.
+CACHE_DIR = os.environ.get('CACHE_DIR', '/tmp/auto_cropper_cache')
+CACHE_S3_BUCKET = os.environ.get('CACHE_S3_BUCKET', '')  # Shared tier across containers, off when empty
+CACHE_S3_PREFIX = os.environ.get('CACHE_S3_PREFIX', 'cache/auto_cropper')
+CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+CACHE_MEMORY_ENTRIES = int(os.environ.get('CACHE_MEMORY_ENTRIES', '256'))
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', str(100 * 1024 * 1024)))
+STAGE_VERSIONS = {'transcript': 1, 'analysis': 1, 'faces': 1, 'crop': 1}
+
+result_cache = None
+instrumentation.configure(pipeline='auto_cropper')
+
+def get_result_cache():
+    # Built once per container so the memory tier survives warm invocations
+    global result_cache
+    if result_cache is None:
+        tiers = [MemoryTier(CACHE_MEMORY_ENTRIES)]
+        if CACHE_DIR:
+            tiers.append(DirectoryTier(CACHE_DIR, CACHE_MAX_BYTES))
+        if CACHE_S3_BUCKET:
+            tiers.append(S3Tier(s3, CACHE_S3_BUCKET, CACHE_S3_PREFIX))
+        result_cache = ResultCache(tiers, CACHE_TTL_SECONDS)
+    return result_cache
+
+def stage_settings(stage, **extra):
+    # Everything besides the source video that changes a stage's result
+    settings = {
+        'transcript': {'backend': SPEECH_BACKEND, 'sample_rate': TRANSCRIBE_SAMPLE_RATE,
+                       'chunks': [CHUNK_MIN_SECONDS, CHUNK_MAX_SECONDS, CHUNK_WINDOW_SECONDS, CHUNK_SILENCE_DB]},
+        'faces': {'stride': DETECT_STRIDE, 'width': DETECT_WIDTH},
+    }
+    settings['analysis'] = {'transcript': settings['transcript'], 'model': 'gpt-4'}
+    settings['crop'] = {'faces': settings['faces'], 'smoothing': CROP_SMOOTHING, 'height_ratio': CROP_HEIGHT_RATIO,
+                        'preset': ENCODE_PRESET, 'crf': ENCODE_CRF}
+    return {**settings[stage], **extra}
+
+def detect_faces(video_file, detect_stride=DETECT_STRIDE, detect_width=DETECT_WIDTH):
+    # Returns [frame_index, x, y, w, h] for the largest face on every detection frame that has one
+    cascade = face_cascade()
     faces = []
-    while len(faces) < 5:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        detected_faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-        for face in detected_faces:
-            if not any(np.array_equal(face, f) for f in faces):
-                faces.append(face)
-    cap.release()
+    # Frames between detections are skipped without converting them; the decode thread
+    # hands over detection frames already in grayscale at detect_width
+    with frame_source.FrameSource(video_file, stride=detect_stride, width=detect_width, gray=True) as source:
+        scale = source.scale
+        min_size = max(12, int(30 * scale))
+        for frame_index, gray in source:
+            detected_faces = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_size, min_size))
+
+            if len(detected_faces) > 0:
+                x, y, w, h = max(detected_faces, key=lambda face: face[2] * face[3])
+                faces.append([frame_index, int(x / scale), int(y / scale), int(w / scale), int(h / scale)])
     return faces if len(faces) > 0 else None
 
-def crop_video(faces, input_file, output_file):
-    if len(faces) > 0:
-        cap = cv2.VideoCapture(input_file)
-        frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        target_height = int(frame_height * 0.9)
-        target_width = int(target_height * 9 / 16)
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        out = cv2.VideoWriter(output_file, fourcc, 30.0, (target_width, target_height))
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            for face in faces:
-                x, y, w, h = face
-                crop_x = max(0, x + (w - target_width) // 2)
-                crop_y = max(0, y + (h - target_height) // 2)
-                crop_x2 = min(crop_x + target_width, frame_width)
-                crop_y2 = min(crop_y + target_height, frame_height)
-                cropped_frame = frame[crop_y:crop_y2, crop_x:crop_x2]
-                resized_frame = cv2.resize(cropped_frame, (target_width, target_height))
-                out.write(resized_frame)
-        cap.release()
-        out.release()
-
-def extract_audio(video_file, audio_file):
-    video = VideoFileClip(video_file)
-    audio = video.audio
-    audio.write_audiofile(audio_file)
-
-def speech_to_text(audio_file):
+def crop_window_size(frame_width, frame_height):
+    # Largest 9:16 window at CROP_HEIGHT_RATIO of the frame height that fits the frame (even sizes for the encoder)
+    target_height = int(frame_height * CROP_HEIGHT_RATIO)
+    target_width = int(target_height * 9 / 16)
+    if target_width > frame_width:
+        target_width = frame_width
+        target_height = min(frame_height, int(frame_width * 16 / 9))
+    return target_width - target_width % 2, target_height - target_height % 2
+
+def face_track(faces, frame_width, frame_height):
+    # Face centres at the detection frames; without any faces, hold the frame centre
+    if not faces:
+        return np.array([0.0]), np.array([frame_width / 2]), np.array([frame_height / 2])
+    track = np.array(faces, dtype=np.float64)
+    return track[:, 0], track[:, 1] + track[:, 3] / 2, track[:, 2] + track[:, 4] / 2
+
+def open_encoder(output_file, width, height, fps, audio_source, preset=ENCODE_PRESET, crf=ENCODE_CRF):
+    # ffmpeg reads raw BGR frames from stdin, encodes them with x264 and muxes the
+    # audio track of audio_source as-is (stream copy, no decode)
+    command = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+        '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', f'{fps}', '-i', 'pipe:0',
+        '-i', audio_source,
+        '-map', '0:v:0', '-map', '1:a?',
+        '-c:v', 'libx264', '-preset', preset, '-crf', str(crf), '-pix_fmt', 'yuv420p',
+        '-c:a', 'copy', '-shortest', '-movflags', '+faststart',
+        output_file
+    ]
+    return subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def close_encoder(encoder):
+    _, errors = encoder.communicate()
+    if encoder.returncode != 0:
+        raise RuntimeError(f"ffmpeg encode failed: {errors.decode(errors='replace').strip()}")
+
+def crop_video(faces, input_file, output_file, smoothing=CROP_SMOOTHING):
+    with frame_source.FrameSource(input_file) as source:
+        frame_width, frame_height = source.width, source.height
+        fps = source.fps or 30.0  # Keep the source frame rate
+        target_width, target_height = crop_window_size(frame_width, frame_height)
+        out = open_encoder(output_file, target_width, target_height, fps, input_file)
+        window = np.empty((target_height, target_width, 3), dtype=np.uint8)
+
+        track_frames, track_x, track_y = face_track(faces, frame_width, frame_height)
+        center_x = center_y = None
+        frames_written = 0
+        for frame_index, frame in source:
+            # Interpolate the face position between detections, then smooth the window
+            face_x = np.interp(frame_index, track_frames, track_x)
+            face_y = np.interp(frame_index, track_frames, track_y)
+            if center_x is None:
+                center_x, center_y = face_x, face_y
+            else:
+                center_x += smoothing * (face_x - center_x)
+                center_y += smoothing * (face_y - center_y)
+
+            # Keep the whole window inside the frame so no resize is needed
+            crop_x = int(min(max(center_x - target_width / 2, 0), frame_width - target_width))
+            crop_y = int(min(max(center_y - target_height / 2, 0), frame_height - target_height))
+            np.copyto(window, frame[crop_y:crop_y + target_height, crop_x:crop_x + target_width])
+            out.stdin.write(window.data)
+            frames_written += 1
+
+    close_encoder(out)
+    return frames_written
+
+def ffmpeg_input(source):
+    # -i arguments for a local path or an http(s) URL; over HTTP ffmpeg seeks with range
+    # requests, so only the bytes it needs are fetched
+    if source.startswith(('http://', 'https://')):
+        return ['-reconnect', '1', '-reconnect_on_network_error', '1', '-reconnect_delay_max', '5', '-i', source]
+    return ['-i', source]
+
+def extract_segment(video_file, start_time, end_time, output_file):
+    # Input-side seeking jumps straight to the keyframe before start_time instead of
+    # reading the whole file up to it; the streams are copied as they are
+    command = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+        '-ss', str(start_time), '-to', str(end_time), *ffmpeg_input(video_file),
+        '-c', 'copy', output_file
+    ]
+    subprocess.run(command, check=True, stderr=subprocess.PIPE)
+
+def crop_segment(input_file, output_file, faces=None):
+    # Face detection (skipped when faces are given) + crop for one segment; returns the faces and timings
+    timings = {}
+    if faces is None:
+        with instrumentation.stage('detect_faces') as span:
+            faces = detect_faces(input_file) or []
+            span.count('faces', len(faces))
+        timings['detect_faces'] = span.seconds
+
+    with instrumentation.stage('crop_video') as span:
+        span.count('frames_written', crop_video(faces, input_file, output_file))
+    timings['crop_video'] = span.seconds
+    return {'faces': faces, 'timings': timings}
+
+def _segment_worker(conn, input_file, output_file, faces):
+    instrumentation.configure(segment=os.path.basename(input_file))
+    try:
+        conn.send(('ok', crop_segment(input_file, output_file, faces)))
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
+
+def run_segment_workers(jobs, max_workers=SEGMENT_WORKERS):
+    # Runs crop_segment for each (index, input_file, output_file, faces) job in its own process,
+    # at most max_workers at a time, yielding (index, status, result) as they finish.
+    # Lambda has no /dev/shm, so this uses Process + Pipe rather than a multiprocessing Pool.
+    # Workers are spawned rather than forked: upload and boto3 transfer threads are already
+    # running, and a fork taken while one of them holds a lock can deadlock the child.
+    spawn = multiprocessing.get_context('spawn')
+    pending = list(jobs)
+    running = {}
+    while pending or running:
+        while pending and len(running) < max_workers:
+            index, input_file, output_file, faces = pending.pop(0)
+            parent_conn, child_conn = spawn.Pipe(duplex=False)
+            process = spawn.Process(target=_segment_worker, args=(child_conn, input_file, output_file, faces))
+            process.start()
+            child_conn.close()
+            running[parent_conn] = (index, process)
+
+        for conn in wait(list(running)):
+            index, process = running.pop(conn)
+            try:
+                status, result = conn.recv()
+            except EOFError:
+                status, result = 'error', f'segment worker exited with code {process.exitcode}'
+            process.join()
+            yield index, status, result
+
+def load_audio(audio_file, sample_rate=TRANSCRIBE_SAMPLE_RATE):
+    # Decode to mono float32 samples through an ffmpeg pipe
+    command = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error', *ffmpeg_input(audio_file),
+        '-f', 'f32le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1'
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def split_on_silence(samples, sample_rate=TRANSCRIBE_SAMPLE_RATE, min_chunk=CHUNK_MIN_SECONDS,
+                     max_chunk=CHUNK_MAX_SECONDS, silence_db=CHUNK_SILENCE_DB):
+    # Returns (start, end) sample ranges, each cut at a pause once it is min_chunk long,
+    # or at the quietest window once it reaches max_chunk; fully silent chunks are dropped.
+    # The final stretch is cut at its pauses too, it just has no quietest-window fallback.
+    window = int(sample_rate * CHUNK_WINDOW_SECONDS)
+    n_windows = len(samples) // window
+    if n_windows == 0:
+        return [(0, len(samples))] if len(samples) else []
+
+    rms = np.sqrt(np.mean(samples[:n_windows * window].reshape(n_windows, window) ** 2, axis=1))
+    level_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    silent = level_db < max(level_db.max() + silence_db, -60.0)
+
+    min_windows = int(min_chunk / CHUNK_WINDOW_SECONDS)
+    max_windows = int(max_chunk / CHUNK_WINDOW_SECONDS)
+    chunks = []
+    start = 0
+    while start < n_windows:
+        end = min(start + max_windows, n_windows)
+        pauses = np.flatnonzero(silent[start + min_windows:end])
+        if len(pauses):
+            end = start + min_windows + pauses[0] + 1
+        elif end < n_windows:
+            end = start + min_windows + int(np.argmin(level_db[start + min_windows:end])) + 1
+        if not silent[start:end].all():
+            chunks.append((start * window, end * window))
+        start = end
+
+    # The tail shorter than one window belongs to the last chunk
+    if chunks and chunks[-1][1] == n_windows * window:
+        chunks[-1] = (chunks[-1][0], len(samples))
+    return chunks
+
+def recognize_google(recognizer, audio):
+    return recognizer.recognize_google(audio)
+
+def recognize_sphinx(recognizer, audio):
+    # Offline CMU Sphinx, needs the pocketsphinx package
+    return recognizer.recognize_sphinx(audio)
+
+def recognize_placeholder(recognizer, audio):
+    # Offline stand-in for tests and local runs: no model, just marks where speech was found
+    duration = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+    return f"[speech {duration:.1f}s]"
+
+RECOGNIZER_BACKENDS = {
+    'google': recognize_google,
+    'sphinx': recognize_sphinx,
+    'placeholder': recognize_placeholder,
+}
+
+def transcribe_chunk(backend, samples, sample_rate):
     recognizer = sr.Recognizer()
-    with sr.AudioFile(audio_file) as source:
-        audio = recognizer.record(source)
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+    audio = sr.AudioData(pcm, sample_rate, 2)
     try:
-        text = recognizer.recognize_google(audio)
-        return text
+        return backend(recognizer, audio)
     except sr.UnknownValueError:
-        return "Speech recognition could not understand the audio"
+        return ""
     except sr.RequestError as e:
-        return f"Could not request results from speech recognition service; {e}"
+        raise RuntimeError(f"Could not request results from speech recognition service; {e}")
+
+def speech_to_text(audio_file, backend=SPEECH_BACKEND, workers=TRANSCRIBE_WORKERS,
+                   sample_rate=TRANSCRIBE_SAMPLE_RATE):
+    # Splits the audio on pauses and transcribes the chunks concurrently. Returns a list of
+    # {'start', 'end', 'text'} segments in seconds; chunks with no recognisable speech are left out.
+    # backend is a name from RECOGNIZER_BACKENDS or a callable(recognizer, audio_data) -> text.
+    if not callable(backend):
+        backend = RECOGNIZER_BACKENDS[backend]
+    with instrumentation.stage('load_audio') as span:
+        samples = load_audio(audio_file, sample_rate)
+        span.count('samples', len(samples))
+    chunks = split_on_silence(samples, sample_rate)
+    instrumentation.count('chunks', len(chunks))
+
+    with ThreadPoolExecutor(max(1, min(workers, len(chunks)))) as pool:
+        texts = pool.map(lambda chunk: transcribe_chunk(backend, samples[chunk[0]:chunk[1]], sample_rate), chunks)
+        segments = [
+            {'start': round(int(start) / sample_rate, 2), 'end': round(int(end) / sample_rate, 2), 'text': text.strip()}
+            for (start, end), text in zip(chunks, texts)
+        ]
+    return [segment for segment in segments if segment['text']]
+
+def format_transcript(segments):
+    return "\n".join(f"[{segment['start']:.2f}-{segment['end']:.2f}] {segment['text']}" for segment in segments)
 
-def analyze_transcript(transcript):
-    prompt = f"This is a transcript of a video. Please identify the 3 most viral sections from the whole, make sure they are more than 30 seconds in duration. Respond in JSON format with start_time, end_time, and description for each section."
+def snap_to_segments(sections, segments):
+    # Move each suggested section onto transcript boundaries: start at the segment start
+    # nearest start_time, end at the segment end nearest end_time (at least one segment long).
+    # Sections that land on a span an earlier section already covers are dropped.
+    if not segments:
+        return sections
+    starts = np.array([segment['start'] for segment in segments])
+    ends = np.array([segment['end'] for segment in segments])
+    snapped = []
+    spans = set()
+    for section in sections:
+        start_index = int(np.argmin(np.abs(starts - float(section['start_time']))))
+        end_index = int(np.argmin(np.abs(ends - float(section['end_time']))))
+        end_index = max(end_index, start_index)
+        span = (float(starts[start_index]), float(ends[end_index]))
+        if span in spans:
+            continue
+        spans.add(span)
+        snapped.append({**section, 'start_time': span[0], 'end_time': span[1]})
+    return snapped
+
+def analyze_transcript(segments):
+    prompt = f"This is a transcript of a video. Each line starts with its [start-end] time in seconds. Please identify the 3 most viral sections from the whole, make sure they are more than 30 seconds in duration. Respond in JSON format with start_time, end_time (in seconds, taken from the line times), and description for each section."
     messages = [
         {"role": "system", "content": "You are a ViralGPT helpful assistant. You are master at reading video transcripts and identifying the most Interesting and Viral Content"},
-        {"role": "user", "content": prompt + "\n" + transcript}
+        {"role": "user", "content": prompt + "\n" + format_transcript(segments)}
     ]
     response = openai.ChatCompletion.create(
+        api_key=OPENAI_API_KEY,
         model="gpt-4",
         messages=messages,
         max_tokens=512,
         n=1,
         stop=None
     )
-    return json.loads(response.choices[0]['message']['content'])
+    return snap_to_segments(json.loads(response.choices[0]['message']['content']), segments)
+
+def s3_object_exists(bucket, key):
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        return True
+    except Exception:
+        return False
 
 def lambda_handler(event, context):
+    # Scratch files live in a directory of their own so overlapping invocations in one container can't collide
+    work_dir = tempfile.mkdtemp(prefix='auto_cropper_')
     try:
         # Assuming the video file is uploaded to S3 and we receive the S3 key
         s3_bucket = event['s3_bucket']
         s3_key = event['s3_key']
         
-        # Download video from S3
-        local_video_path = '/tmp/input_video.mp4'
-        s3.download_file(s3_bucket, s3_key, local_video_path)
-        
-        # Extract audio from video
-        audio_path = '/tmp/audio.wav'
-        extract_audio(local_video_path, audio_path)
-        
-        # Convert speech to text
-        transcript = speech_to_text(audio_path)
-        
+        instrumentation.configure(request_id=getattr(context, 'aws_request_id', None))
+        timings = {}
+
+        # Every stage result is cached under the object's ETag, so repeat requests for
+        # the same upload only redo the stages that are missing
+        cache = get_result_cache()
+        etag = s3.head_object(Bucket=s3_bucket, Key=s3_key)['ETag']
+        cached_stages = []
+        video_source = None
+
+        def ensure_video():
+            # ffmpeg reads the object through a presigned URL with range requests, so audio
+            # decoding and segment seeking start right away; with STREAM_INPUT off the video
+            # is downloaded first (multipart, concurrent). Only done if some stage needs it.
+            nonlocal video_source
+            if video_source is None:
+                if STREAM_INPUT:
+                    video_source = s3.generate_presigned_url(
+                        'get_object', Params={'Bucket': s3_bucket, 'Key': s3_key}, ExpiresIn=PRESIGNED_URL_EXPIRES
+                    )
+                else:
+                    video_source = os.path.join(work_dir, 'input_video.mp4')
+                    with instrumentation.stage('download') as span:
+                        s3.download_file(s3_bucket, s3_key, video_source, Config=TRANSFER_CONFIG)
+                        span.count('bytes', os.path.getsize(video_source))
+                    timings['download'] = span.seconds
+            return video_source
+
+        transcript_key = cache_key('transcript', STAGE_VERSIONS['transcript'], etag, stage_settings('transcript'))
+        transcript = cache.get(transcript_key)
+        if transcript is None:
+            # Convert speech to text, decoding the audio straight from the video
+            video = ensure_video()
+            with instrumentation.stage('speech_to_text') as span:
+                transcript = speech_to_text(video)
+                span.count('segments', len(transcript))
+            timings['speech_to_text'] = span.seconds
+            cache.put(transcript_key, transcript)
+        else:
+            cached_stages.append('transcript')
+
         # Analyze transcript
-        interesting_segments = analyze_transcript(transcript)
-        
-        # Process each segment
+        analysis_key = cache_key('analysis', STAGE_VERSIONS['analysis'], etag, stage_settings('analysis'))
+        interesting_segments = cache.get(analysis_key)
+        if interesting_segments is None:
+            with instrumentation.stage('analyze_transcript') as span:
+                interesting_segments = analyze_transcript(transcript)
+            timings['analyze_transcript'] = span.seconds
+            cache.put(analysis_key, interesting_segments)
+        else:
+            cached_stages.append('analysis')
+
+        # Extract the segments that still need cropping (stream copy, fast)
         cropped_videos = []
+        jobs = []
+        segment_keys = {}
         for i, segment in enumerate(interesting_segments):
-            start_time = segment['start_time']
-            end_time = segment['end_time']
-            
-            # Extract segment
-            input_file = f'/tmp/segment_{i}.mp4'
-            command = f"ffmpeg -i {local_video_path} -ss {start_time} -to {end_time} -c copy {input_file}"
-            subprocess.call(command, shell=True)
-            
-            # Crop video
-            faces = detect_faces(input_file)
-            output_file = f'/tmp/cropped_segment_{i}.mp4'
-            crop_video(faces, input_file, output_file)
-            
-            # Upload cropped video to S3
             output_s3_key = f'cropped_videos/{os.path.basename(s3_key)}_segment_{i}.mp4'
-            s3.upload_file(output_file, s3_bucket, output_s3_key)
+            bounds = {'start_time': segment['start_time'], 'end_time': segment['end_time']}
             cropped_videos.append({
                 's3_key': output_s3_key,
-                'start_time': start_time,
-                'end_time': end_time,
-                'description': segment['description']
+                'start_time': segment['start_time'],
+                'end_time': segment['end_time'],
+                'description': segment['description'],
+                'cached': False,
+                'timings': {}
             })
-        
+
+            crop_key = cache_key('crop', STAGE_VERSIONS['crop'], etag, stage_settings('crop', s3_key=output_s3_key, **bounds))
+            if cache.get(crop_key) == output_s3_key and s3_object_exists(s3_bucket, output_s3_key):
+                cropped_videos[i]['cached'] = True
+                continue
+
+            input_file = os.path.join(work_dir, f'segment_{i}.mp4')
+            with instrumentation.stage('extract_segment', segment=i) as span:
+                extract_segment(ensure_video(), segment['start_time'], segment['end_time'], input_file)
+                span.count('bytes', os.path.getsize(input_file))
+            cropped_videos[i]['timings']['extract_segment'] = span.seconds
+            faces_key = cache_key('faces', STAGE_VERSIONS['faces'], etag, stage_settings('faces', **bounds))
+            jobs.append((i, input_file, os.path.join(work_dir, f'cropped_segment_{i}.mp4'), cache.get(faces_key)))
+            segment_keys[i] = (faces_key, crop_key)
+        output_files = {job[0]: job[2] for job in jobs}
+
+        def upload_segment(i, output_file):
+            # Upload cropped video to S3
+            with instrumentation.stage('upload', segment=i) as span:
+                s3.upload_file(output_file, s3_bucket, cropped_videos[i]['s3_key'],
+                               ExtraArgs={'ContentType': 'video/mp4'}, Config=TRANSFER_CONFIG)
+                span.count('bytes', os.path.getsize(output_file))
+            cropped_videos[i]['timings']['upload'] = span.seconds
+            cache.put(segment_keys[i][1], cropped_videos[i]['s3_key'])
+
+        # Crop segments in parallel; each upload starts as soon as its crop is done
+        errors = []
+        uploads = []
+        with instrumentation.stage('segments') as segments_span, ThreadPoolExecutor(UPLOAD_THREADS) as upload_pool:
+            for i, status, result in run_segment_workers(jobs, min(SEGMENT_WORKERS, len(jobs)) or 1):
+                if status != 'ok':
+                    errors.append(f'segment {i}: {result}')
+                    continue
+                cropped_videos[i]['timings'].update(result['timings'])
+                cache.put(segment_keys[i][0], result['faces'])
+                uploads.append(upload_pool.submit(upload_segment, i, output_files[i]))
+            for upload in uploads:
+                upload.result()
+
+        timings['segments'] = segments_span.seconds
+        if errors:
+            raise RuntimeError('; '.join(errors))
+
         return {
             'statusCode': 200,
             'body': json.dumps({
-                'cropped_videos': cropped_videos
+                'cropped_videos': cropped_videos,
+                'cached_stages': cached_stages,
+                'timings': timings
             })
         }
     except Exception as e:
@@ -142,4 +560,6 @@ def lambda_handler(event, context):
             'body': json.dumps({
                 'error': str(e)
             })
-        }
\ No newline at end of file
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
\ No newline at end of file
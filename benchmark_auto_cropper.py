@@ -0,0 +1,71 @@
+import argparse
+import os
+import tempfile
+import time
+import cv2
+import numpy as np
+
+# auto_cropper reads these at import time
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import auto_cropper
+
+def draw_face(frame, cx, cy, size):
+    # Simple face-like pattern: skin ellipse, dark eyes and mouth
+    cv2.ellipse(frame, (cx, cy), (size // 2, int(size * 0.65)), 0, 0, 360, (150, 180, 220), -1)
+    for eye_x in (cx - size // 5, cx + size // 5):
+        cv2.ellipse(frame, (eye_x, cy - size // 6), (size // 10, size // 16), 0, 0, 360, (40, 40, 40), -1)
+    cv2.ellipse(frame, (cx, cy + size // 4), (size // 5, size // 14), 0, 0, 360, (60, 50, 120), -1)
+
+def generate_face_clip(path, duration=10, width=1280, height=720, fps=30):
+    # A face drifting across a noisy background
+    rng = np.random.default_rng(0)
+    background = rng.integers(60, 120, (height, width, 3), dtype=np.uint8)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(int(duration * fps)):
+        frame = background.copy()
+        t = i / fps
+        cx = int(width / 2 + width / 3 * np.sin(t / 2))
+        cy = int(height / 2 + height / 8 * np.cos(t / 3))
+        draw_face(frame, cx, cy, height // 4)
+        writer.write(frame)
+    writer.release()
+
+def benchmark_strides(video_path, strides):
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    print(f"{'stride':>6} {'detect fps':>11} {'crop fps':>9} {'total fps':>10} {'faces':>6} {'frames out':>11}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_file = os.path.join(tmp_dir, 'cropped.mp4')
+        for stride in strides:
+            start = time.perf_counter()
+            faces = auto_cropper.detect_faces(video_path, detect_stride=stride)
+            detect_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            frames_out = auto_cropper.crop_video(faces, video_path, output_file)
+            crop_time = time.perf_counter() - start
+
+            print(f"{stride:>6} {frame_count / detect_time:>11.1f} {frame_count / crop_time:>9.1f} "
+                  f"{frame_count / (detect_time + crop_time):>10.1f} {len(faces or []):>6} {frames_out:>11}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of the auto_cropper face tracking crop")
+    parser.add_argument("--video", help="Use this video instead of a synthetic clip")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--strides", default="1,2,5,10,15")
+    args = parser.parse_args()
+
+    strides = [int(stride) for stride in args.strides.split(",")]
+    if args.video:
+        benchmark_strides(args.video, strides)
+    else:
+        width, height = (int(value) for value in args.size.split("x"))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            clip_path = os.path.join(tmp_dir, 'faces.mp4')
+            generate_face_clip(clip_path, args.duration, width, height)
+            benchmark_strides(clip_path, strides)
@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Cold-start cost of the Lambda modules. Every measurement runs in a fresh interpreter:
+# the time to import the handler module, the first call that touches the lazily imported
+# libraries and warm resources, and the same call again on the now-warm process.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+TARGETS = {
+    'auto_cropper': {
+        'path': ROOT,
+        'heavy_modules': ['cv2', 'openai', 'speech_recognition'],
+    },
+    'lambda_function': {
+        'path': os.path.join(ROOT, 'instagram-reel-processor'),
+        'heavy_modules': ['instaloader', 'cv2', 'scipy.signal', 'PIL.Image',
+                          'imagehash', 'transformers', 'torch'],
+    },
+}
+
+def child_invocation(target, clip_path, audio_path, whisper):
+    # Runs inside the fresh interpreter; prints one JSON line of timings
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    sys.path.insert(0, TARGETS[target]['path'])
+
+    start = time.perf_counter()
+    module = __import__(target)
+    timings = {'import': time.perf_counter() - start}
+
+    if target == 'auto_cropper':
+        call = lambda: module.detect_faces(clip_path)
+    elif whisper:
+        call = lambda: module.transcribe_audio_whisper(audio_path)
+    else:
+        call = lambda: module.analyze_video_style(clip_path)
+
+    for name in ('first_call', 'warm_call'):
+        start = time.perf_counter()
+        call()
+        timings[name] = time.perf_counter() - start
+    timings['loaded_modules'] = len(sys.modules)
+    print(json.dumps(timings))
+
+def child_eager_imports(modules):
+    # What the module import cost when every heavy dependency was imported up front
+    start = time.perf_counter()
+    missing = []
+    for name in modules:
+        try:
+            __import__(name)
+        except ImportError:
+            missing.append(name)
+    print(json.dumps({'import': time.perf_counter() - start, 'missing': missing}))
+
+def run_child(*args):
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', *args],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f'exit {result.returncode}'}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def generate_clip(path, audio_path, duration=5):
+    subprocess.run([
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size=640x360:rate=25:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=16000:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-shortest', path
+    ], check=True)
+    subprocess.run(['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-i', path, '-ac', '1', '-ar', '16000', audio_path],
+                   check=True)
+
+def benchmark(targets, repeats, whisper):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        clip_path = os.path.join(tmp_dir, 'clip.mp4')
+        audio_path = os.path.join(tmp_dir, 'clip.wav')
+        generate_clip(clip_path, audio_path)
+
+        print(f"{'module':<16} {'eager deps (s)':>15} {'import (s)':>11} {'first call (s)':>15} {'warm call (s)':>14}")
+        for target in targets:
+            eager = run_child('eager', *TARGETS[target]['heavy_modules'])
+            runs = [run_child('invoke', target, clip_path, audio_path, str(int(whisper))) for _ in range(repeats)]
+            errors = [run['error'] for run in runs if 'error' in run]
+            if errors:
+                print(f"{target:<16} failed: {errors[0]}")
+                continue
+
+            best = {name: min(run[name] for run in runs) for name in ('import', 'first_call', 'warm_call')}
+            print(f"{target:<16} {eager['import']:>15.3f} {best['import']:>11.3f} "
+                  f"{best['first_call']:>15.3f} {best['warm_call']:>14.3f}")
+            if eager.get('missing'):
+                print(f"{'':<16} not installed here: {', '.join(eager['missing'])}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == '--child':
+        if sys.argv[2] == 'eager':
+            child_eager_imports(sys.argv[3:])
+        else:
+            child_invocation(sys.argv[3], sys.argv[4], sys.argv[5], sys.argv[6] == '1')
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Import time and first-invocation latency of the Lambda modules")
+    parser.add_argument("--targets", default="auto_cropper,lambda_function")
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh interpreters per target (best is reported)")
+    parser.add_argument("--whisper", action="store_true",
+                        help="Time the Whisper transcription in lambda_function instead of the video style pass")
+    args = parser.parse_args()
+
+    benchmark(args.targets.split(","), args.repeats, args.whisper)
@@ -0,0 +1,69 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# auto_cropper reads these at import time
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instagram-reel-processor'))
+
+import auto_cropper
+import frame_source
+import lambda_function
+from benchmark_auto_cropper import generate_face_clip
+
+# End-to-end frames per second of the four OpenCV consumers with the frame source decoding
+# inline and decoding ahead on its thread. The overlap needs a spare core: on a single vCPU
+# prefetch is a few percent slower, which is why it is off by default there.
+
+def decode_only(video_path):
+    with frame_source.FrameSource(video_path) as source:
+        for _ in source:
+            pass
+
+def consumers(video_path, output_file):
+    faces = auto_cropper.detect_faces(video_path)
+    return {
+        'decode only': lambda: decode_only(video_path),
+        'detect_faces': lambda: auto_cropper.detect_faces(video_path),
+        'crop_video': lambda: auto_cropper.crop_video(faces, video_path, output_file),
+        'analyze_video_style': lambda: lambda_function.analyze_video_style(video_path),
+        'detect_video_effects': lambda: lambda_function.detect_video_effects(video_path),
+    }
+
+def benchmark(video_path, repeats):
+    with frame_source.FrameSource(video_path) as source:
+        frame_count = source.frame_count
+    print(f"{frame_count} frames, {os.cpu_count()} CPUs, ring of {frame_source.FRAME_BUFFERS} buffers")
+    print(f"{'consumer':<22} {'inline fps':>11} {'prefetch fps':>13} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, call in consumers(video_path, os.path.join(tmp_dir, 'cropped.mp4')).items():
+            fps = {}
+            for prefetch in (False, True):
+                frame_source.FRAME_PREFETCH = prefetch
+                best = float('inf')
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    call()
+                    best = min(best, time.perf_counter() - start)
+                fps[prefetch] = frame_count / best
+            print(f"{name:<22} {fps[False]:>11.1f} {fps[True]:>13.1f} {fps[True] / fps[False]:>7.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of the OpenCV consumers with and without frame prefetch")
+    parser.add_argument("--video", help="Use this video instead of a synthetic clip")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per configuration (best is reported)")
+    args = parser.parse_args()
+
+    if args.video:
+        benchmark(args.video, args.repeats)
+    else:
+        width, height = (int(value) for value in args.size.split("x"))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            clip_path = os.path.join(tmp_dir, 'faces.mp4')
+            generate_face_clip(clip_path, args.duration, width, height)
+            benchmark(clip_path, args.repeats)
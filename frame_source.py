@@ -0,0 +1,147 @@
+import os
+import queue
+import threading
+import cv2
+import numpy as np
+import instrumentation
+
+# Frames for the OpenCV consumers. A background thread decodes ahead into a ring of
+# preallocated buffers while the caller works on the current frame. Downscaling and the
+# grayscale conversion happen on that thread too, also into preallocated buffers.
+# Frames are views of the ring: one is only valid until the next is requested, so copy
+# whatever has to outlive the loop iteration.
+# (auto_cropper and the reel processor ship as separate images, each with a copy of this file;
+# tests/test_shared_modules.py checks that the copies stay identical.)
+
+# Decoding ahead only pays off with a spare core; on a single vCPU the thread is pure overhead
+FRAME_PREFETCH = os.environ.get('FRAME_PREFETCH', 'true' if (os.cpu_count() or 1) > 1 else 'false').lower() == 'true'
+FRAME_BUFFERS = int(os.environ.get('FRAME_BUFFERS', '8'))  # Ring size: up to FRAME_BUFFERS - 1 frames decoded ahead
+PREFETCH_POLL_SECONDS = 0.1
+
+class FrameSource:
+    # Iterating yields (frame_index, frame) for every stride-th frame from start_time (seconds)
+    # up to end_time. Frames are BGR, or grayscale with gray=True, downscaled to width when the
+    # video is wider (scale is the factor applied). stride may be changed until iteration starts.
+
+    def __init__(self, path, stride=1, start_time=None, end_time=None, width=0, gray=False,
+                 buffers=None, prefetch=None):
+        self.cap = cv2.VideoCapture(path)
+        self.stride = stride
+        self.prefetch = FRAME_PREFETCH if prefetch is None else prefetch
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.source_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.source_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        self.first_frame = int(round(start_time * self.fps)) if start_time else 0
+        self.end_frame = int(round(end_time * self.fps)) if end_time is not None else None
+        if self.first_frame:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.first_frame)
+
+        self.scale = min(1.0, width / self.source_width) if width and self.source_width else 1.0
+        self.width = int(round(self.source_width * self.scale))
+        self.height = int(round(self.source_height * self.scale))
+        self.gray = gray
+
+        shape = (self.height, self.width) if gray else (self.height, self.width, 3)
+        self.slots = [np.empty(shape, dtype=np.uint8) for _ in range(max(2, buffers or FRAME_BUFFERS))]
+        self.decoded = None
+        if gray or self.scale < 1.0:
+            self.decoded = np.empty((self.source_height, self.source_width, 3), dtype=np.uint8)
+        self.decoded_gray = None
+        if gray and self.scale < 1.0:
+            self.decoded_gray = np.empty((self.source_height, self.source_width), dtype=np.uint8)
+
+        self.next_frame = self.first_frame
+        self.frames_decoded = 0
+        self.frames_read = 0
+        self.thread = None
+        self.error = None
+        self.stopped = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def read(self, out):
+        # Decodes the next wanted frame into out; returns its index, or None at the end
+        while self.end_frame is None or self.next_frame < self.end_frame:
+            frame_index = self.next_frame
+            self.next_frame += 1
+            if not self.cap.grab():
+                return None
+            self.frames_decoded += 1
+            if (frame_index - self.first_frame) % self.stride:
+                continue
+
+            if self.decoded is None:
+                ok, frame = self.cap.retrieve(out)
+            else:
+                ok, frame = self.cap.retrieve(self.decoded)
+                if ok and self.gray:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=out if self.decoded_gray is None else self.decoded_gray)
+                if ok and self.scale < 1.0:
+                    frame = cv2.resize(frame, (0, 0), dst=out, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+            if not ok:
+                return None
+            if frame.ctypes.data != out.ctypes.data:
+                raise RuntimeError(f"Decoded frame is {frame.shape[1]}x{frame.shape[0]}, expected {self.width}x{self.height}")
+            self.frames_read += 1
+            return frame_index
+        return None
+
+    def _decode_ahead(self, free, filled):
+        # Decode thread: fills free slots in order and queues (frame_index, slot); None marks the end
+        try:
+            while not self.stopped.is_set():
+                try:
+                    slot = free.get(timeout=PREFETCH_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+                frame_index = self.read(self.slots[slot])
+                if frame_index is None:
+                    break
+                filled.put((frame_index, slot))
+        except Exception as e:
+            self.error = e
+        filled.put(None)
+
+    def __iter__(self):
+        if not self.prefetch:
+            while True:
+                frame_index = self.read(self.slots[0])
+                if frame_index is None:
+                    return
+                yield frame_index, self.slots[0]
+
+        free = queue.Queue()
+        filled = queue.Queue()
+        for slot in range(len(self.slots)):
+            free.put(slot)
+        self.thread = threading.Thread(target=self._decode_ahead, args=(free, filled), daemon=True)
+        self.thread.start()
+
+        held = None
+        while True:
+            if held is not None:
+                free.put(held)
+            item = filled.get()
+            if item is None:
+                break
+            frame_index, held = item
+            yield frame_index, self.slots[held]
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.cap.release()
+        # Counted into the caller's open stage, e.g. detect_faces
+        instrumentation.count('frames_decoded', self.frames_decoded)
+        instrumentation.count('frames_read', self.frames_read)
+        self.frames_decoded = self.frames_read = 0
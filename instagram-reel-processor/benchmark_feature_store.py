@@ -0,0 +1,122 @@
+import argparse
+import ast
+import os
+import random
+import tempfile
+import time
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+import feature_store
+from lambda_function import SPECTRAL_BANDS_HZ
+
+# Bulk analytics over many reels: the same query answered by scanning the feature store and by
+# parsing the per-reel video_analysis.txt reports the processor used to write. The query is the
+# mean duration of bright reels with a text overlay, plus (store only, the reports never had
+# it) the mean motion over the seconds that show the overlay.
+
+BANDS = list(SPECTRAL_BANDS_HZ)
+EFFECTS = ["rapid transitions", "color filters", "text overlay", "slow motion"]
+
+def synthetic_reel(rng, seconds):
+    effects = [effect for effect in EFFECTS if rng.random() < 0.4]
+    analysis = {
+        "video_style": {"duration": float(seconds), "color_style": rng.choice(["bright", "dark"]),
+                        "motion_style": rng.choice(["high motion", "low motion"]),
+                        "dominant_color": [rng.uniform(0, 255) for _ in range(3)]},
+        "audio_style": {"volume_style": "quiet", "frequency_style": "bass-heavy", "rms_dbfs": -20.0,
+                        "peak_dbfs": -1.0, "spectral_centroid_hz": 2000.0,
+                        "band_energy": {name: 1 / len(BANDS) for name in BANDS}},
+        "tags": {"hashtags": ["reel"], "mentions": []},
+        "video_effects": effects,
+        "fingerprint": "0" * 80,
+        "transcription": [{"start": 0.0, "end": 2.0, "text": "words " * 10}],
+    }
+    columns = {
+        "second": list(range(seconds)),
+        "color_b": [rng.uniform(0, 255) for _ in range(seconds)],
+        "color_g": [rng.uniform(0, 255) for _ in range(seconds)],
+        "color_r": [rng.uniform(0, 255) for _ in range(seconds)],
+        "motion": [rng.uniform(0, 20) for _ in range(seconds)],
+        "rms_dbfs": [rng.uniform(-40, 0) for _ in range(seconds)],
+        "peak_dbfs": [rng.uniform(-20, 0) for _ in range(seconds)],
+        **{f"band_{name}": [1 / len(BANDS)] * seconds for name in BANDS},
+        "frame_hash": [rng.getrandbits(64) for _ in range(seconds)],
+        **{flag: [rng.random() < 0.2 for _ in range(seconds)] for flag in ("transition", "color_filter", "slow_motion")},
+        "text_overlay": [("text overlay" in effects) and rng.random() < 0.5 for _ in range(seconds)],
+    }
+    return analysis, columns
+
+def write_report(path, analysis):
+    # The old free-text format
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Video Analysis Results\n")
+        f.write("======================\n\n")
+        f.write(f"Video Style:\n{analysis['video_style']}\n\n")
+        f.write(f"Audio Style:\n{analysis['audio_style']}\n\n")
+        f.write(f"Tags:\n{analysis['tags']}\n\n")
+        f.write(f"Video Effects:\n{analysis['video_effects']}\n\n")
+        f.write("Transcription:\n")
+        f.write("\n".join(f"[{s['start']:.2f}-{s['end']:.2f}] {s['text']}" for s in analysis["transcription"]))
+
+def query_reports(report_dir):
+    durations = []
+    for name in os.listdir(report_dir):
+        with open(os.path.join(report_dir, name), encoding="utf-8") as f:
+            sections = f.read().split("\n\n")
+        video_style = ast.literal_eval(sections[1].split("\n", 1)[1])
+        effects = ast.literal_eval(sections[4].split("\n", 1)[1])
+        if video_style["color_style"] == "bright" and "text overlay" in effects:
+            durations.append(video_style["duration"])
+    return sum(durations) / max(len(durations), 1)
+
+def query_store(root):
+    videos = feature_store.read_table(root, "videos", BANDS, columns=["duration", "color_style", "video_effects"],
+                                      filter=ds.field("color_style") == "bright")
+    effects = videos["video_effects"]
+    with_overlay = pc.filter(pc.list_parent_indices(effects), pc.equal(pc.list_flatten(effects), "text overlay"))
+    duration = pc.mean(pc.take(videos["duration"], with_overlay)).as_py()
+    seconds = feature_store.read_table(root, "seconds", BANDS, columns=["motion"], filter=ds.field("text_overlay"))
+    return duration, pc.mean(seconds["motion"]).as_py()
+
+def benchmark(reels, seconds, batch):
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = os.path.join(tmp_dir, "features")
+        report_dir = os.path.join(tmp_dir, "reports")
+        os.makedirs(report_dir)
+
+        writer = feature_store.FeatureWriter(root, BANDS)
+        start = time.perf_counter()
+        rows = 0
+        for i in range(reels):
+            length = rng.randint(seconds // 2, seconds * 3 // 2)
+            analysis, columns = synthetic_reel(rng, length)
+            rows += length
+            writer.add(f"reel{i}", analysis, columns)
+            write_report(os.path.join(report_dir, f"reel{i}.txt"), analysis)
+            if (i + 1) % batch == 0:
+                writer.flush()
+        writer.flush()
+        print(f"wrote {reels} reels of about {seconds}s ({rows} second rows) in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        report_duration = query_reports(report_dir)
+        report_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store_duration, overlay_motion = query_store(root)
+        store_time = time.perf_counter() - start
+
+        print(f"{'source':<14} {'seconds':>8} {'mean duration':>14}")
+        print(f"{'text reports':<14} {report_time:>8.3f} {report_duration:>14.2f}")
+        print(f"{'feature store':<14} {store_time:>8.3f} {store_duration:>14.2f}  (+ mean overlay motion {overlay_motion:.2f})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar scans of the feature store against parsing text reports")
+    parser.add_argument("--reels", type=int, default=5000)
+    parser.add_argument("--seconds", type=int, default=30, help="Mean length of the synthetic reels")
+    parser.add_argument("--batch", type=int, default=100, help="Reels per flush (one Parquet file per table)")
+    args = parser.parse_args()
+
+    benchmark(args.reels, args.seconds, args.batch)
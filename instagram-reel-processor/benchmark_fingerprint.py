@@ -0,0 +1,87 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+import numpy as np
+
+import fingerprint
+
+# Lookup latency of the fingerprint index at scale: builds an index of random signatures, then
+# times nearest() for near-duplicates of indexed videos (a few flipped bits, as a re-encode
+# produces) and for unseen videos, against a linear scan over the same signatures.
+
+def flip_bits(signature, count, rng):
+    for bit in rng.sample(range(fingerprint.SIGNATURE_BITS), count):
+        signature ^= 1 << bit
+    return signature
+
+def percentiles(latencies):
+    return np.percentile(latencies, 50) * 1e6, np.percentile(latencies, 99) * 1e6
+
+def linear_scan(signatures, query, max_video_distance, max_audio_distance):
+    def within(signature):
+        video_distance, audio_distance = fingerprint.split_distance(signature, query)
+        return video_distance <= max_video_distance and audio_distance <= max_audio_distance
+    matches = [signature for signature in signatures if within(signature)]
+    return min(matches, key=lambda signature: fingerprint.hamming(signature, query)) if matches else None
+
+def benchmark(size, queries, flipped_bits, max_video_distance, max_audio_distance, db_path, scan_queries):
+    rng = random.Random(0)
+    signatures = [rng.getrandbits(fingerprint.SIGNATURE_BITS) for _ in range(size)]
+
+    start = time.perf_counter()
+    index = fingerprint.FingerprintIndex(db_path)
+    for i, signature in enumerate(signatures):
+        index.add(f"video{i}", signature, {"transcription": []})
+    build_time = time.perf_counter() - start
+    print(f"indexed {len(index)} signatures in {build_time:.1f}s ({'SQLite' if db_path else 'memory'})")
+
+    if db_path:
+        start = time.perf_counter()
+        reopened = fingerprint.FingerprintIndex(db_path)
+        print(f"reopened from {db_path} in {time.perf_counter() - start:.1f}s")
+        reopened.close()
+
+    cases = {
+        "near-duplicate": [flip_bits(rng.choice(signatures), flipped_bits, rng) for _ in range(queries)],
+        "unseen": [rng.getrandbits(fingerprint.SIGNATURE_BITS) for _ in range(queries)],
+    }
+    print(f"{'query':<16} {'method':<8} {'p50 (us)':>10} {'p99 (us)':>10} {'hits':>7}")
+    for name, batch in cases.items():
+        latencies, hits = [], 0
+        for query in batch:
+            start = time.perf_counter()
+            match = index.nearest(query, max_video_distance, max_audio_distance)
+            latencies.append(time.perf_counter() - start)
+            hits += match is not None
+        p50, p99 = percentiles(latencies)
+        print(f"{name:<16} {'index':<8} {p50:>10.1f} {p99:>10.1f} {hits:>7}")
+
+        latencies, hits = [], 0
+        for query in batch[:scan_queries]:
+            start = time.perf_counter()
+            hits += linear_scan(signatures, query, max_video_distance, max_audio_distance) is not None
+            latencies.append(time.perf_counter() - start)
+        p50, p99 = percentiles(latencies)
+        print(f"{name:<16} {'scan':<8} {p50:>10.1f} {p99:>10.1f} {hits:>7}")
+    index.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fingerprint index lookup latency")
+    parser.add_argument("--size", type=int, default=100000, help="Indexed videos")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--flipped-bits", type=int, default=12, help="Bits flipped in the near-duplicate queries")
+    parser.add_argument("--max-video-distance", type=int, default=fingerprint.VIDEO_MAX_DISTANCE)
+    parser.add_argument("--max-audio-distance", type=int, default=fingerprint.AUDIO_MAX_DISTANCE)
+    parser.add_argument("--scan-queries", type=int, default=20, help="Queries timed with the linear scan")
+    parser.add_argument("--db", action="store_true", help="Persist the index in a temporary SQLite file")
+    args = parser.parse_args()
+
+    if args.db:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            benchmark(args.size, args.queries, args.flipped_bits, args.max_video_distance, args.max_audio_distance,
+                      os.path.join(tmp_dir, "fingerprints.sqlite"), args.scan_queries)
+    else:
+        benchmark(args.size, args.queries, args.flipped_bits, args.max_video_distance, args.max_audio_distance,
+                  None, args.scan_queries)
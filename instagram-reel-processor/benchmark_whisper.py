@@ -0,0 +1,63 @@
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+import lambda_function
+
+# Real-time factor (transcription time / audio duration) of transcribe_audio_whisper for each
+# model size and quantization option, plus the one-off model load time. Use --audio with real
+# speech: on the synthetic tones Whisper emits very few tokens, which flatters the decoder.
+
+def synthetic_audio(path, duration=90, sample_rate=lambda_function.WHISPER_SAMPLE_RATE):
+    # Syllable-rate bursts of harmonics with pauses, written as 16 kHz mono WAV
+    rng = np.random.default_rng(0)
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    pitch = 140 + 40 * np.sin(2 * np.pi * 0.3 * t)
+    voice = sum(np.sin(2 * np.pi * k * np.cumsum(pitch) / sample_rate) / k for k in range(1, 6))
+    envelope = (np.sin(2 * np.pi * 4 * t) > 0) * (np.sin(2 * np.pi * 0.2 * t) > -0.6)
+    samples = (0.3 * voice * envelope + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+    subprocess.run([
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+        '-f', 'f32le', '-ar', str(sample_rate), '-ac', '1', '-i', 'pipe:0', path
+    ], input=samples.tobytes(), check=True)
+
+def benchmark(audio_path, model_sizes, quantize_options, batch_size):
+    audio = lambda_function.AudioTrack.from_file(audio_path)
+    duration = audio.duration
+    print(f"audio: {duration:.1f}s, batch size {batch_size}")
+    print(f"{'model':<10} {'quantize':>8} {'load (s)':>9} {'transcribe (s)':>15} {'RTF':>6} {'segments':>9}")
+    for model_size in model_sizes:
+        for quantize in quantize_options:
+            start = time.perf_counter()
+            lambda_function.get_whisper(model_size, quantize)
+            load_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            segments = lambda_function.transcribe_audio_whisper(audio, model_size, quantize, batch_size)
+            transcribe_time = time.perf_counter() - start
+
+            print(f"{model_size:<10} {quantize or 'none':>8} {load_time:>9.1f} {transcribe_time:>15.1f} "
+                  f"{transcribe_time / duration:>6.2f} {len(segments):>9}")
+            lambda_function.warm_resources.clear()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Whisper real-time factor per model size and quantization")
+    parser.add_argument("--audio", help="Audio or video file to transcribe (default: synthetic)")
+    parser.add_argument("--duration", type=float, default=90, help="Length of the synthetic audio in seconds")
+    parser.add_argument("--models", default="tiny,base,small")
+    parser.add_argument("--quantize", default="none,int8", help="Comma separated: none, int8")
+    parser.add_argument("--batch-size", type=int, default=lambda_function.WHISPER_BATCH_SIZE)
+    args = parser.parse_args()
+
+    model_sizes = args.models.split(",")
+    quantize_options = ["" if option == "none" else option for option in args.quantize.split(",")]
+    if args.audio:
+        benchmark(args.audio, model_sizes, quantize_options, args.batch_size)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            audio_path = os.path.join(tmp_dir, 'speech.wav')
+            synthetic_audio(audio_path, args.duration)
+            benchmark(audio_path, model_sizes, quantize_options, args.batch_size)
@@ -0,0 +1,143 @@
+import os
+import time
+import uuid
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs
+import pyarrow.parquet as pq
+
+# Columnar store for the reel analysis, as a Parquet dataset with two typed tables:
+#   seconds  one row per second of video: mean color, motion, loudness, band energy, the
+#            frame hash and the effect flags detected in that second
+#   videos   one summary row per reel: styles, effects, tags, fingerprint, transcription
+# Every flush writes one new file per table under <root>/<table>/date=YYYY-MM-DD/, so
+# concurrent invocations never touch each other's files, and analytics over many reels is a
+# column scan:
+#   read_table(root, "seconds", bands, columns=["video_id", "motion"], filter=ds.field("text_overlay"))
+# root is a local directory or any URI pyarrow opens, e.g. s3://bucket/features.
+
+TABLES = ("seconds", "videos")
+EFFECT_FLAGS = {  # seconds column: effect name in the analysis
+    "transition": "rapid transitions",
+    "color_filter": "color filters",
+    "text_overlay": "text overlay",
+    "slow_motion": "slow motion",
+}
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+def band_fields(bands):
+    return [pa.field(f"band_{name}", pa.float32()) for name in bands]
+
+def seconds_schema(bands):
+    return pa.schema([
+        pa.field("video_id", pa.string(), nullable=False),
+        pa.field("second", pa.int32(), nullable=False),
+        pa.field("color_b", pa.float32()),
+        pa.field("color_g", pa.float32()),
+        pa.field("color_r", pa.float32()),
+        pa.field("motion", pa.float32()),
+        pa.field("rms_dbfs", pa.float32()),
+        pa.field("peak_dbfs", pa.float32()),
+        *band_fields(bands),
+        pa.field("frame_hash", pa.uint64()),
+        *[pa.field(flag, pa.bool_()) for flag in EFFECT_FLAGS],
+    ])
+
+def videos_schema(bands):
+    segment = pa.struct([("start", pa.float32()), ("end", pa.float32()), ("text", pa.string())])
+    return pa.schema([
+        pa.field("video_id", pa.string(), nullable=False),
+        pa.field("processed_at", pa.timestamp("ms", tz="UTC"), nullable=False),
+        pa.field("duration", pa.float64()),
+        pa.field("color_style", pa.string()),
+        pa.field("motion_style", pa.string()),
+        pa.field("dominant_color", pa.list_(pa.float32())),  # BGR
+        pa.field("volume_style", pa.string()),
+        pa.field("frequency_style", pa.string()),
+        pa.field("rms_dbfs", pa.float32()),
+        pa.field("peak_dbfs", pa.float32()),
+        pa.field("spectral_centroid_hz", pa.float32()),
+        *band_fields(bands),
+        pa.field("video_effects", pa.list_(pa.string())),
+        pa.field("hashtags", pa.list_(pa.string())),
+        pa.field("mentions", pa.list_(pa.string())),
+        pa.field("fingerprint", pa.string()),
+        pa.field("duplicate_of", pa.string()),
+        pa.field("transcription", pa.list_(segment)),
+    ])
+
+def schemas(bands):
+    return {"seconds": seconds_schema(bands), "videos": videos_schema(bands)}
+
+def open_root(root):
+    # (filesystem, path) for a local directory or a URI
+    return pyarrow.fs.FileSystem.from_uri(root if "://" in root else os.path.abspath(root))
+
+def video_row(video_id, analysis, processed_at=None):
+    # The summary row of one reel, from the analysis the handler returns
+    video_style = analysis.get("video_style", {})
+    audio_style = analysis.get("audio_style", {})
+    tags = analysis.get("tags", {})
+    row = {
+        "video_id": video_id,
+        "processed_at": int((processed_at or time.time()) * 1000),
+        "duration": video_style.get("duration"),
+        "color_style": video_style.get("color_style"),
+        "motion_style": video_style.get("motion_style"),
+        "dominant_color": video_style.get("dominant_color"),
+        "volume_style": audio_style.get("volume_style"),
+        "frequency_style": audio_style.get("frequency_style"),
+        "rms_dbfs": audio_style.get("rms_dbfs"),
+        "peak_dbfs": audio_style.get("peak_dbfs"),
+        "spectral_centroid_hz": audio_style.get("spectral_centroid_hz"),
+        "video_effects": analysis.get("video_effects"),
+        "hashtags": tags.get("hashtags"),
+        "mentions": tags.get("mentions"),
+        "fingerprint": analysis.get("fingerprint"),
+        "duplicate_of": (analysis.get("duplicate_of") or {}).get("video_id"),
+        "transcription": analysis.get("transcription"),
+    }
+    for name, energy in audio_style.get("band_energy", {}).items():
+        row[f"band_{name}"] = energy
+    return row
+
+class FeatureWriter:
+    # Buffers the rows of both tables for any number of reels; flush() writes them out as one
+    # Parquet file per table. Not thread-safe: add and flush from one thread.
+
+    def __init__(self, root, bands):
+        self.filesystem, self.path = open_root(root)
+        self.schemas = schemas(bands)
+        self.pending = {name: [] for name in TABLES}
+
+    def add(self, video_id, analysis, seconds):
+        # seconds maps the per-second columns (without video_id) to equal-length lists
+        n_seconds = len(seconds["second"])
+        columns = {"video_id": [video_id] * n_seconds, **seconds}
+        self.pending["seconds"].append(pa.Table.from_pydict(columns, schema=self.schemas["seconds"]))
+        self.pending["videos"].append(pa.Table.from_pylist([video_row(video_id, analysis)], schema=self.schemas["videos"]))
+
+    def flush(self):
+        # Writes the buffered rows; returns the paths of the new files
+        date = time.strftime("%Y-%m-%d", time.gmtime())
+        name = f"{uuid.uuid4().hex}.parquet"
+        written = []
+        for table in TABLES:
+            if not self.pending[table]:
+                continue
+            directory = f"{self.path}/{table}/date={date}"
+            self.filesystem.create_dir(directory, recursive=True)
+            pq.write_table(pa.concat_tables(self.pending[table]), f"{directory}/{name}", filesystem=self.filesystem)
+            self.pending[table] = []
+            written.append(f"{directory}/{name}")
+        return written
+
+def dataset(root, table, bands):
+    # The table across every flush, with the date partition as an extra string column
+    filesystem, path = open_root(root)
+    schema = schemas(bands)[table].append(pa.field("date", pa.string()))
+    return ds.dataset(f"{path}/{table}", schema=schema, format="parquet", filesystem=filesystem,
+                      partitioning=PARTITIONING)
+
+def read_table(root, table, bands, columns=None, filter=None):
+    return dataset(root, table, bands).to_table(columns=columns, filter=filter)
@@ -0,0 +1,171 @@
+import itertools
+import json
+import sqlite3
+import threading
+import time
+import numpy as np
+
+# Perceptual fingerprints of reels, used to recognise re-uploads and re-posts of a video we
+# already analyzed. A signature is 320 bits: the 64-bit average hashes of the frames at 1/8,
+# 3/8, 5/8 and 7/8 of the video, followed by 64 bits for the shape of the audio energy
+# envelope (is the next step louder than the last). Near-duplicates are a small Hamming
+# distance apart in both parts, so the index answers "closest signature within
+# max_video_distance frame bits and max_audio_distance audio bits". The parts are held to
+# separate limits because the audio is only a fifth of the signature: the same pictures under
+# a different soundtrack would otherwise pass on the frames alone.
+
+FRAME_HASH_BITS = 64
+SIGNATURE_FRAMES = 4
+AUDIO_SIGNATURE_BITS = 64
+SIGNATURE_BITS = FRAME_HASH_BITS * SIGNATURE_FRAMES + AUDIO_SIGNATURE_BITS
+AUDIO_ENVELOPE_SECONDS = 0.25  # RMS window for the audio energy envelope
+VIDEO_MAX_DISTANCE = 32  # Frame bits that may differ between two copies of the same reel
+AUDIO_MAX_DISTANCE = 8  # Audio bits that may differ (unrelated soundtracks sit about 32 apart)
+DUPLICATE_MAX_DISTANCE = VIDEO_MAX_DISTANCE + AUDIO_MAX_DISTANCE
+AUDIO_MASK = (1 << AUDIO_SIGNATURE_BITS) - 1
+INDEX_SUBSTRINGS = 20  # Multi-index hashing: the signature is split into this many 16-bit keys
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+def split_distance(a, b):
+    # (frame bits, audio bits) that differ between two signatures
+    difference = a ^ b
+    return bin(difference >> AUDIO_SIGNATURE_BITS).count("1"), bin(difference & AUDIO_MASK).count("1")
+
+def frame_signature(frame_hashes):
+    # Frame hashes at fixed relative positions, so the result doesn't depend on the frame rate
+    signature = 0
+    for position in range(SIGNATURE_FRAMES):
+        frame_hash = 0
+        if frame_hashes:
+            frame_hash = frame_hashes[int((position + 0.5) / SIGNATURE_FRAMES * len(frame_hashes))]
+        signature = (signature << FRAME_HASH_BITS) | frame_hash
+    return signature
+
+def audio_signature(samples, sample_rate):
+    # Rises and falls of the loudness envelope, stretched to the clip length; unaffected by gain
+    window = max(int(AUDIO_ENVELOPE_SECONDS * sample_rate), 1)
+    n_windows = len(samples) // window
+    if n_windows < 2:
+        return 0
+    envelope = np.sqrt(np.mean(np.square(samples[:n_windows * window].reshape(n_windows, window)), axis=1))
+    envelope = np.interp(np.linspace(0, n_windows - 1, AUDIO_SIGNATURE_BITS + 1), np.arange(n_windows), envelope)
+    signature = 0
+    for rising in np.diff(envelope) > 0:
+        signature = (signature << 1) | int(rising)
+    return signature
+
+def video_signature(frame_hashes, samples, sample_rate):
+    return (frame_signature(frame_hashes) << AUDIO_SIGNATURE_BITS) | audio_signature(samples, sample_rate)
+
+def signature_to_hex(signature):
+    return f"{signature:0{SIGNATURE_BITS // 4}x}"
+
+def signature_from_hex(value):
+    return int(value, 16)
+
+class FingerprintIndex:
+    # Nearest-neighbour index over signatures under Hamming distance, using multi-index hashing:
+    # the signature is cut into INDEX_SUBSTRINGS keys, each with its own hash table. If two
+    # signatures are within r bits, at least one key pair is within r // INDEX_SUBSTRINGS bits
+    # (pigeonhole), so a lookup only probes the keys that close to the query's keys and then
+    # checks the full distance of those candidates. (A BK-tree prunes poorly at 320 bits,
+    # where unrelated signatures all sit about 160 bits apart.)
+    # With a path, entries and their stored analysis persist in SQLite and are loaded on open.
+
+    def __init__(self, path=None, substrings=INDEX_SUBSTRINGS):
+        self.substrings = substrings
+        self.key_bits = SIGNATURE_BITS // substrings
+        self.key_mask = (1 << self.key_bits) - 1
+        self.tables = [{} for _ in range(substrings)]
+        self.signatures = []
+        self.video_ids = []
+        self.row_ids = []
+        self.payloads = {}
+        self.probe_masks = {}
+        self.lock = threading.Lock()
+
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            with self.db:
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS fingerprints ("
+                    "id INTEGER PRIMARY KEY, video_id TEXT, signature TEXT, payload TEXT, added_at REAL)"
+                )
+            for row_id, video_id, signature in self.db.execute("SELECT id, video_id, signature FROM fingerprints ORDER BY id"):
+                self._insert(video_id, signature_from_hex(signature), row_id)
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _keys(self, signature):
+        return [(signature >> (i * self.key_bits)) & self.key_mask for i in range(self.substrings)]
+
+    def _insert(self, video_id, signature, row_id=None):
+        entry = len(self.signatures)
+        self.signatures.append(signature)
+        self.video_ids.append(video_id)
+        self.row_ids.append(row_id)
+        for table, key in zip(self.tables, self._keys(signature)):
+            table.setdefault(key, []).append(entry)
+        return entry
+
+    def _masks(self, radius):
+        # Every key_bits-wide mask with at most radius bits set
+        if radius not in self.probe_masks:
+            masks = [0]
+            for flips in range(1, radius + 1):
+                for bits in itertools.combinations(range(self.key_bits), flips):
+                    masks.append(sum(1 << bit for bit in bits))
+            self.probe_masks[radius] = masks
+        return self.probe_masks[radius]
+
+    def add(self, video_id, signature, payload=None):
+        with self.lock:
+            row_id = None
+            if self.db is not None:
+                with self.db:
+                    row_id = self.db.execute(
+                        "INSERT INTO fingerprints (video_id, signature, payload, added_at) VALUES (?, ?, ?, ?)",
+                        (video_id, signature_to_hex(signature), json.dumps(payload), time.time())
+                    ).lastrowid
+            entry = self._insert(video_id, signature, row_id)
+            if self.db is None:
+                self.payloads[entry] = payload
+
+    def nearest(self, signature, max_video_distance=VIDEO_MAX_DISTANCE, max_audio_distance=AUDIO_MAX_DISTANCE):
+        # Returns (video_id, distance, payload) for the closest signature within both limits, or None.
+        # Anything within both is within their sum overall, which is the radius the keys are probed at.
+        max_distance = max_video_distance + max_audio_distance
+        masks = self._masks(max_distance // self.substrings)
+        best_entry, best_distance = None, max_distance + 1
+        with self.lock:
+            checked = set()
+            for table, key in zip(self.tables, self._keys(signature)):
+                for mask in masks:
+                    for entry in table.get(key ^ mask, ()):
+                        if entry in checked:
+                            continue
+                        checked.add(entry)
+                        video_distance, audio_distance = split_distance(signature, self.signatures[entry])
+                        if video_distance > max_video_distance or audio_distance > max_audio_distance:
+                            continue
+                        distance = video_distance + audio_distance
+                        if distance < best_distance:
+                            best_entry, best_distance = entry, distance
+            if best_entry is None:
+                return None
+            return self.video_ids[best_entry], best_distance, self._payload(best_entry)
+
+    def _payload(self, entry):
+        if self.db is None:
+            return self.payloads.get(entry)
+        row = self.db.execute("SELECT payload FROM fingerprints WHERE id = ?", (self.row_ids[entry],)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        if self.db is not None:
+            with self.lock:
+                self.db.close()
@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Minimal local stand-in for Instagram: serves a post node for any shortcode at /p/<shortcode>/
+# and its video at /media/<shortcode>.mp4 (the same file for every post). Point
+# INSTAGRAM_STANDIN_URL at it to run download_reel without touching Instagram.
+
+class StandinState:
+    def __init__(self, video_path, caption="Stand-in reel #standin @someone", delay=0.0):
+        self.video_path = video_path
+        self.caption = caption
+        self.delay = delay
+        self.requests = 0
+        self.media_requests = 0
+        self.connections = set()
+        self.lock = threading.Lock()
+
+def make_handler(state, base_url):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def do_HEAD(self):
+            self.do_GET()
+
+        def do_GET(self):
+            with state.lock:
+                state.requests += 1
+                state.connections.add(self.client_address)
+            if state.delay:
+                time.sleep(state.delay)
+
+            post = re.fullmatch(r"/p/([\w-]+)/?", self.path.split("?")[0])
+            if post:
+                shortcode = post.group(1)
+                node = {
+                    "shortcode": shortcode,
+                    "is_video": True,
+                    "video_url": f"{base_url()}/media/{shortcode}.mp4",
+                    "edge_media_to_caption": {"edges": [{"node": {"text": state.caption}}]},
+                }
+                return self._send(200, json.dumps(node).encode(), "application/json")
+
+            if re.fullmatch(r"/media/[\w-]+\.mp4", self.path.split("?")[0]):
+                with state.lock:
+                    state.media_requests += 1
+                with open(state.video_path, "rb") as f:
+                    return self._send(200, f.read(), "video/mp4")
+
+            self._send(404, b'{"message": "not found"}', "application/json")
+
+    return Handler
+
+def start_standin(video_path, port=0, caption=None, delay=0.0):
+    # Start the stand-in on a background thread; returns (server, state, url)
+    state = StandinState(video_path, delay=delay)
+    if caption is not None:
+        state.caption = caption
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state, lambda: url))
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, url
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for Instagram posts and media")
+    parser.add_argument("video", help="MP4 served as the media of every post")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--caption", default=None)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to stall every request")
+    args = parser.parse_args()
+
+    server, state, url = start_standin(os.path.abspath(args.video), args.port, args.caption, args.delay)
+    print(f"Instagram stand-in listening on {url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+# Stage spans for the pipelines: wall time, sub-step counters (frames, samples, bytes) and
+# memory per stage. Every finished span is written as one JSON line on stdout, where the
+# Lambda log capture picks it up. METRICS_FORMAT selects the output:
+#   off   spans still time themselves (callers read span.seconds), nothing else is collected
+#   json  one flat JSON object per span
+#   emf   CloudWatch embedded metric format, turned into metrics by CloudWatch Logs itself;
+#         `python instrumentation.py check < log` validates such lines locally
+# Memory is read from /proc: rss_mb when the span ends, peak_rss_mb the highest RSS while the
+# span was open and peak_rss_growth_mb how far that is above the RSS it started at. The kernel
+# keeps one peak (VmHWM) per process, so each span start records it for every open span and
+# resets it by writing 5 to /proc/self/clear_refs. Where that write isn't allowed the peak
+# is the process-wide one and the growth how much the span raised it. Spans in worker
+# processes report on those processes.
+# (The pipelines ship separately, each with a copy of this file; tests/test_shared_modules.py
+# checks that the copies stay identical.)
+
+METRICS_FORMAT = os.environ.get('METRICS_FORMAT', 'off').lower()
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'VideoPipelines')
+EMF_DIMENSIONS = ['pipeline', 'stage']
+EMF_UNITS = {'seconds': 'Seconds', 'rss_mb': 'Megabytes', 'peak_rss_mb': 'Megabytes', 'peak_rss_growth_mb': 'Megabytes'}
+
+# Fields added to every span of this process, e.g. the pipeline name and the request id
+context = {}
+_local = threading.local()
+_output_lock = threading.Lock()
+_memory_lock = threading.Lock()
+_open_spans = set()  # Spans on every thread that collect memory, for peak resets
+_peak_resettable = None  # Whether /proc/self/clear_refs takes writes, known after the first try
+
+def enabled():
+    return METRICS_FORMAT in ('json', 'emf')
+
+def configure(**fields):
+    context.update({name: value for name, value in fields.items() if value is not None})
+
+def memory_mb():
+    # (current RSS, peak RSS) of this process in MB, None where /proc isn't available
+    try:
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':', 1) for line in f if line.startswith(('VmRSS', 'VmHWM')))
+    except OSError:
+        return None, None
+    return int(status['VmRSS'].split()[0]) / 1024, int(status['VmHWM'].split()[0]) / 1024
+
+def reset_peak():
+    # Sets VmHWM back to the current RSS; False where the kernel or sandbox doesn't allow it
+    global _peak_resettable
+    if _peak_resettable is not False:
+        try:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+            _peak_resettable = True
+        except OSError:
+            _peak_resettable = False
+    return _peak_resettable
+
+class Span:
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.counters = {}
+        self.seconds = 0.0
+        self.parent = None
+
+    def __enter__(self):
+        if enabled():
+            stack = _local.__dict__.setdefault('spans', [])
+            self.parent = stack[-1].name if stack else None
+            stack.append(self)
+            with _memory_lock:
+                self.rss_at_start, self.peak_at_start = memory_mb()
+                self.peak_seen = self.rss_at_start
+                self.peak_reset = False
+                if self.peak_at_start is not None:
+                    # The peak so far belongs to the spans already open; keep it before resetting it
+                    for span in _open_spans:
+                        span.peak_seen = max(span.peak_seen, self.peak_at_start)
+                    self.peak_reset = reset_peak()
+                _open_spans.add(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.seconds = time.perf_counter() - self.start
+        if enabled():
+            _local.spans.pop()
+            record = self.record('error' if exc_type else 'ok')
+            emit(record, [name for name in ('seconds', *self.counters, *EMF_UNITS) if name in record])
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, status):
+        with _memory_lock:
+            _open_spans.discard(self)
+            rss, peak = memory_mb()
+        record = {**context, 'stage': self.name, 'parent': self.parent, 'status': status,
+                  'seconds': round(self.seconds, 6), **self.fields, **self.counters}
+        if peak is not None:
+            if self.peak_reset:
+                peak = max(peak, self.peak_seen)
+                growth = peak - self.rss_at_start
+            else:
+                growth = peak - (self.peak_at_start or peak)
+            record.update(rss_mb=round(rss, 1), peak_rss_mb=round(peak, 1), peak_rss_growth_mb=round(growth, 1))
+        return record
+
+def stage(name, **fields):
+    # with stage('crop_video', segment=3) as span: ... span.count('frames', n)
+    return Span(name, fields)
+
+def count(name, value=1):
+    # Adds to the innermost open span on this thread; free when instrumentation is off
+    if enabled():
+        stack = getattr(_local, 'spans', None)
+        if stack:
+            stack[-1].count(name, value)
+
+def metric_unit(name):
+    if name in EMF_UNITS:
+        return EMF_UNITS[name]
+    return 'Bytes' if name.endswith('bytes') else 'Count'
+
+def to_emf(record, metric_names, timestamp=None):
+    # The named members become metrics, dimensioned by pipeline and stage; the rest stay properties
+    metrics = [{'Name': name, 'Unit': metric_unit(name)} for name in dict.fromkeys(metric_names)]
+    dimensions = [name for name in EMF_DIMENSIONS if isinstance(record.get(name), str)]
+    emf = {name: value for name, value in record.items() if value is not None}
+    emf['_aws'] = {
+        'Timestamp': int((timestamp or time.time()) * 1000),
+        'CloudWatchMetrics': [{'Namespace': METRICS_NAMESPACE, 'Dimensions': [dimensions], 'Metrics': metrics}],
+    }
+    return emf
+
+def emit(record, metric_names=()):
+    line = json.dumps(to_emf(record, metric_names) if METRICS_FORMAT == 'emf' else record, default=str)
+    with _output_lock:
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+def check_emf(record):
+    # Problems that would make CloudWatch reject or ignore an EMF record; empty when valid
+    directive = record.get('_aws')
+    if not isinstance(directive, dict):
+        return ['missing _aws metadata']
+    problems = []
+    if not isinstance(directive.get('Timestamp'), int):
+        problems.append('_aws.Timestamp must be an integer in milliseconds')
+    metric_sets = directive.get('CloudWatchMetrics')
+    if not isinstance(metric_sets, list) or not metric_sets:
+        return problems + ['_aws.CloudWatchMetrics must be a non-empty list']
+    for metric_set in metric_sets:
+        if not isinstance(metric_set.get('Namespace'), str) or not metric_set['Namespace']:
+            problems.append('Namespace must be a non-empty string')
+        for dimension_set in metric_set.get('Dimensions', []):
+            if len(dimension_set) > 30:
+                problems.append('more than 30 dimensions in a dimension set')
+            problems += [f"dimension {name} must be a string member" for name in dimension_set
+                         if not isinstance(record.get(name), str)]
+        metrics = metric_set.get('Metrics', [])
+        if len(metrics) > 100:
+            problems.append('more than 100 metrics in a directive')
+        for metric in metrics:
+            value = record.get(metric.get('Name'))
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                problems.append(f"metric {metric.get('Name')} has no numeric member")
+    return problems
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Validate EMF lines from a log (other lines are skipped)')
+    parser.add_argument('command', choices=['check'])
+    parser.add_argument('log', nargs='?', help='Log file (default: stdin)')
+    args = parser.parse_args()
+
+    checked = invalid = 0
+    with (open(args.log) if args.log else sys.stdin) as log:
+        for number, line in enumerate(log, 1):
+            try:
+                record = json.loads(line[line.index('{'):]) if '{' in line else None
+            except ValueError:
+                record = None
+            if not isinstance(record, dict) or '_aws' not in record:
+                continue
+            checked += 1
+            problems = check_emf(record)
+            if problems:
+                invalid += 1
+                print(f"line {number} ({record.get('stage')}): {'; '.join(problems)}")
+    print(f"{checked} EMF records, {invalid} invalid")
+    sys.exit(1 if invalid or not checked else 0)
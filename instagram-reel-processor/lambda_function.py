@@ -1,26 +1,144 @@
+import functools
+import importlib
+import math
 import json
 import os
 import time
 import random
+import uuid
+import shutil
+import struct
+import subprocess
 import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures, FIRST_COMPLETED
+from multiprocessing.connection import wait
 from urllib.parse import urlparse, parse_qs
-import instaloader
-import moviepy.editor as mp
-from pydub import AudioSegment
-import cv2
 import numpy as np
-from scipy.fftpack import fft
 import re
-from PIL import Image
-import imagehash
-from transformers import WhisperProcessor, WhisperForConditionalGeneration
-import torch
-import librosa
 import logging
 from requests.exceptions import RequestException
 
+import fingerprint
+import instrumentation
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
+instrumentation.configure(pipeline='reel_processor')
+
+class LazyModule:
+    # Stands in for a module and imports it on first attribute access, so a cold start
+    # only pays for the libraries the invocation actually uses
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+def lazy_import(name):
+    return LazyModule(name)
+
+instaloader = lazy_import('instaloader')
+cv2 = lazy_import('cv2')
+frame_source = lazy_import('frame_source')
+signal = lazy_import('scipy.signal')
+Image = lazy_import('PIL.Image')
+imagehash = lazy_import('imagehash')
+feature_store = lazy_import('feature_store')
+transformers = lazy_import('transformers')
+torch = lazy_import('torch')
+
+# Reel download: the Instaloader session is kept per container and its cookies on disk
+INSTAGRAM_SESSION_FILE = os.environ.get("INSTAGRAM_SESSION_FILE", "/tmp/instaloader-session")
+INSTAGRAM_STANDIN_URL = os.environ.get("INSTAGRAM_STANDIN_URL")  # Fetch posts from instagram_standin.py instead
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = 60
+
+# Batch mode: reels download on a thread pool and are analyzed in worker processes
+BATCH_DOWNLOAD_WORKERS = int(os.environ.get("BATCH_DOWNLOAD_WORKERS", "4"))
+BATCH_ANALYSIS_WORKERS = int(os.environ.get("BATCH_ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+BATCH_POLL_SECONDS = 0.05
+# Each reel's result is written as it finishes, one JSON object per reel under
+# <BATCH_RESULTS_URI>/<batch_id>/ (a directory or e.g. s3://bucket/results); "" only logs them
+BATCH_RESULTS_URI = os.environ.get("BATCH_RESULTS_URI", "")
+
+# Fingerprints and transcriptions of processed reels, for skipping near-duplicates; "" keeps them in memory
+FINGERPRINT_DB = os.environ.get("FINGERPRINT_DB", "/tmp/reel_fingerprints.sqlite")
+
+# Per-second features and per-reel summaries go to a Parquet dataset here (a directory or e.g.
+# s3://bucket/features, see feature_store.py); "" only returns the analysis
+FEATURE_STORE_URI = os.environ.get("FEATURE_STORE_URI", "")
+
+# Whisper: model size and CPU int8 dynamic quantization are selectable; the weights are cached
+# under WHISPER_CACHE_DIR (bake it into the image or mount EFS so cold starts skip the download)
+WHISPER_MODEL_SIZE = os.environ.get("WHISPER_MODEL_SIZE", "large-v3")
+WHISPER_QUANTIZE = os.environ.get("WHISPER_QUANTIZE", "").lower()  # "int8" or empty
+WHISPER_CACHE_DIR = os.environ.get("WHISPER_CACHE_DIR") or None
+WHISPER_BATCH_SIZE = int(os.environ.get("WHISPER_BATCH_SIZE", "4"))  # 30 s windows per generate call
+WHISPER_SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30.0  # Whisper's input length
+WINDOW_OVERLAP_SECONDS = 5.0  # Overlap between consecutive windows, split down the middle when stitching
+# Spectral analysis of the audio track
+SPECTRUM_FRAME_SIZE = 4096  # Samples per STFT frame (~93 ms at 44.1 kHz)
+SPECTRUM_BLOCK_FRAMES = 64  # STFT frames processed per block
+SPECTRAL_BANDS_HZ = {
+    "sub_bass": (20, 60),
+    "bass": (60, 250),
+    "low_mid": (250, 500),
+    "mid": (500, 2000),
+    "high_mid": (2000, 4000),
+    "presence": (4000, 6000),
+    "brilliance": (6000, 20000),
+}
+# frequency_style compares these bands, given as fractions of the Nyquist frequency so they cover
+# the same share of the spectrum at any sample rate: the lowest 10% and the top 40%
+BASS_STYLE_BAND = (0.0, 0.1)
+TREBLE_STYLE_BAND = (0.6, 1.0)
+ANALYSIS_WIDTH = int(os.environ.get("ANALYSIS_WIDTH", "0"))  # Downscale frames to this width for analysis, 0 keeps full size
+
+# Heavy resources loaded once per container and reused by warm invocations
+warm_resources = {}
+warm_resources_lock = threading.Lock()
+
+def warm_resource(name, loader):
+    resource = warm_resources.get(name)
+    if resource is None:
+        with warm_resources_lock:
+            resource = warm_resources.get(name)
+            if resource is None:
+                resource = warm_resources[name] = loader()
+    return resource
+
+def load_whisper(model_size=WHISPER_MODEL_SIZE, quantize=WHISPER_QUANTIZE):
+    model_name = f"openai/whisper-{model_size}"
+    with instrumentation.stage('load_whisper', model=model_name):
+        processor = transformers.WhisperProcessor.from_pretrained(model_name, cache_dir=WHISPER_CACHE_DIR)
+        model = transformers.WhisperForConditionalGeneration.from_pretrained(model_name, cache_dir=WHISPER_CACHE_DIR)
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = model.to(device)
+    model.eval()
+    if quantize == "int8" and device == "cpu":
+        # Linear layers run with int8 weights; activations are quantized on the fly
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    logger.info(f"Loaded {model_name} on {device} (quantize={quantize or 'none'})")
+    return processor, model, device
+
+def get_whisper(model_size=WHISPER_MODEL_SIZE, quantize=WHISPER_QUANTIZE):
+    return warm_resource(f"whisper:{model_size}:{quantize}", lambda: load_whisper(model_size, quantize))
+
+def get_fingerprint_index():
+    return warm_resource("fingerprints", lambda: fingerprint.FingerprintIndex(FINGERPRINT_DB))
+
+def get_feature_writer():
+    return warm_resource("feature_store", lambda: feature_store.FeatureWriter(FEATURE_STORE_URI, list(SPECTRAL_BANDS_HZ)))
 
 def extract_shortcode(url):
     parsed_url = urlparse(url)
@@ -36,113 +154,512 @@ def extract_shortcode(url):
         return query_params['igsh'][0]
     raise ValueError("Could not extract shortcode from the provided URL")
 
-def download_reel(reel_url, output_filename="reel", max_retries=3):
-    L = instaloader.Instaloader()
-    
-    # Set a user agent
-    L.context._session.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-    
-    # Get credentials from environment variables
-    username = os.environ.get('INSTAGRAM_USERNAME')
-    password = os.environ.get('INSTAGRAM_PASSWORD')
-    
-    if username and password:
+class ReelDownloader:
+    # One Instaloader context per container. It logs in once, keeps the session cookies in
+    # INSTAGRAM_SESSION_FILE so later cold starts can skip the login, and its requests session
+    # (with its connection pool) serves every metadata and media request after that.
+    # Instaloader itself isn't thread-safe, so metadata lookups are serialised; media
+    # downloads run concurrently.
+
+    def __init__(self, username=None, password=None, session_file=INSTAGRAM_SESSION_FILE):
+        self.lock = threading.Lock()
+        self.loader = instaloader.Instaloader(
+            quiet=True, user_agent=USER_AGENT, download_pictures=False, download_video_thumbnails=False,
+            save_metadata=False, compress_json=False
+        )
+        if username and password:
+            self.login(username, password, session_file)
+        else:
+            logger.warning("Instagram credentials not provided. Proceeding without authentication.")
+
+    def login(self, username, password, session_file):
+        if os.path.exists(session_file):
+            try:
+                self.loader.load_session_from_file(username, session_file)
+                logger.info("Reusing saved Instagram session")
+                return
+            except Exception as e:
+                logger.warning(f"Saved Instagram session unusable, logging in again: {e}")
         try:
-            L.login(username, password)
+            self.loader.login(username, password)
+            self.loader.save_session_to_file(session_file)
             logger.info("Successfully logged in to Instagram")
         except instaloader.exceptions.InstaloaderException as e:
             logger.error(f"Failed to log in to Instagram: {e}")
-    else:
-        logger.warning("Instagram credentials not provided. Proceeding without authentication.")
-    
-    for attempt in range(max_retries):
-        try:
-            shortcode = extract_shortcode(reel_url)
-            post = instaloader.Post.from_shortcode(L.context, shortcode)
-            L.download_post(post, target=output_filename)
-            logger.info(f"Reel downloaded successfully to folder: {output_filename}")
-            return post
-        except instaloader.exceptions.InstaloaderException as ie:
-            logger.warning(f"Instaloader exception (attempt {attempt + 1}/{max_retries}): {ie}")
-        except RequestException as re:
-            logger.warning(f"Request failed (attempt {attempt + 1}/{max_retries}): {re}")
-        except ValueError as ve:
-            logger.error(f"Error extracting shortcode: {ve}")
-            return None
-        except Exception as e:
-            logger.error(f"An unexpected error occurred: {e}")
-            return None
-
-        if attempt < max_retries - 1:
-            wait_time = (2 ** attempt) + random.random()
-            logger.info(f"Waiting for {wait_time:.2f} seconds before retrying...")
-            time.sleep(wait_time)
-        else:
-            logger.error("Max retries reached. Unable to download reel.")
 
-    return None
+    @property
+    def session(self):
+        return self.loader.context._session
 
-def analyze_video_style(video_path):
-    cap = cv2.VideoCapture(video_path)
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-    duration = frame_count / fps
-
-    colors = []
-    for i in range(0, frame_count, fps):
-        cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-        ret, frame = cap.read()
-        if ret:
-            avg_color = frame.mean(axis=(0, 1))
-            colors.append(avg_color)
-
-    dominant_color = np.mean(colors, axis=0)
-    brightness = np.mean(dominant_color)
-    brightness_style = "bright" if brightness > 127 else "dark"
-
-    prev_frame = None
-    motion = []
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        if prev_frame is not None:
-            motion.append(np.mean(cv2.absdiff(gray, prev_frame)))
-        prev_frame = gray
+    def fetch_post(self, shortcode):
+        with self.lock:
+            if INSTAGRAM_STANDIN_URL:
+                response = self.session.get(f"{INSTAGRAM_STANDIN_URL}/p/{shortcode}/")
+                response.raise_for_status()
+                return instaloader.Post(self.loader.context, response.json())
+            return instaloader.Post.from_shortcode(self.loader.context, shortcode)
+
+    def download_video(self, post, target_dir):
+        # Streams only the video file to disk (no thumbnails, captions or metadata JSON)
+        with self.lock:
+            video_url = post.video_url
+        if not video_url:
+            raise ValueError(f"Post {post.shortcode} has no video")
+
+        video_path = os.path.join(target_dir, f"{post.shortcode}.mp4")
+        with self.session.get(video_url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            with open(video_path + ".part", "wb") as f:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    instrumentation.count('bytes', len(chunk))
+        os.replace(video_path + ".part", video_path)
+        return video_path
+
+def get_downloader():
+    return warm_resource(
+        "instaloader",
+        lambda: ReelDownloader(os.environ.get('INSTAGRAM_USERNAME'), os.environ.get('INSTAGRAM_PASSWORD'))
+    )
+
+def download_reel(reel_url, output_dir, max_retries=3):
+    # Returns (post, video_path), or (None, None) if the reel can't be downloaded
+    downloader = get_downloader()
+
+    with instrumentation.stage('download'):
+        for attempt in range(max_retries):
+            instrumentation.count('attempts')
+            try:
+                shortcode = extract_shortcode(reel_url)
+                post = downloader.fetch_post(shortcode)
+                video_path = downloader.download_video(post, output_dir)
+                logger.info(f"Reel downloaded successfully to: {video_path}")
+                return post, video_path
+            except instaloader.exceptions.InstaloaderException as ie:
+                logger.warning(f"Instaloader exception (attempt {attempt + 1}/{max_retries}): {ie}")
+            except RequestException as re:
+                logger.warning(f"Request failed (attempt {attempt + 1}/{max_retries}): {re}")
+            except ValueError as ve:
+                logger.error(f"Error extracting shortcode or video: {ve}")
+                return None, None
+            except Exception as e:
+                logger.error(f"An unexpected error occurred: {e}")
+                return None, None
+
+            if attempt < max_retries - 1:
+                wait_time = (2 ** attempt) + random.random()
+                logger.info(f"Waiting for {wait_time:.2f} seconds before retrying...")
+                time.sleep(wait_time)
+            else:
+                logger.error("Max retries reached. Unable to download reel.")
+
+        return None, None
+
+class FrameReducer:
+    # One per-frame statistic for analyze_frames. setup() picks how often the reducer wants a
+    # frame (every Nth frame, from the fps); update() gets the BGR frame and its grayscale.
+    # result() is the whole-video value, per_second() the value for each second it saw.
+
+    every = 1
+    fps = 1
+
+    def setup(self, fps, frame_count):
+        pass
 
-    avg_motion = np.mean(motion)
-    motion_style = "high motion" if avg_motion > 10 else "low motion"
+    def update(self, frame_index, frame, gray):
+        raise NotImplementedError
 
-    cap.release()
+    def result(self):
+        raise NotImplementedError
 
+    def per_second(self):
+        return {}
+
+    def second(self, frame_index):
+        return frame_index // self.fps
+
+class MeanColorReducer(FrameReducer):
+    # Average BGR color, one frame per second
+    def setup(self, fps, frame_count):
+        self.every = self.fps = max(fps, 1)
+        self.colors = {}
+
+    def update(self, frame_index, frame, gray):
+        self.colors[self.second(frame_index)] = frame.mean(axis=(0, 1))
+
+    def result(self):
+        return np.mean(list(self.colors.values()), axis=0)
+
+    def per_second(self):
+        return self.colors
+
+class MotionReducer(FrameReducer):
+    # Mean absolute difference between consecutive frames
+    def setup(self, fps, frame_count):
+        self.every = 1
+        self.fps = max(fps, 1)
+        self.prev_gray = None
+        self.motion = []
+        self.seconds = []
+
+    def update(self, frame_index, frame, gray):
+        if self.prev_gray is not None:
+            self.motion.append(np.mean(cv2.absdiff(gray, self.prev_gray)))
+            self.seconds.append(self.second(frame_index))
+        self.prev_gray = gray
+
+    def result(self):
+        return np.mean(self.motion)
+
+    def per_second(self):
+        if not self.motion:
+            return {}
+        seconds = np.asarray(self.seconds)
+        totals = np.bincount(seconds, weights=self.motion)
+        counts = np.bincount(seconds)
+        return {second: totals[second] / counts[second] for second in np.flatnonzero(counts).tolist()}
+
+class EffectsReducer(FrameReducer):
+    # Base for the effect detectors, which look at two frames per second
+    def setup(self, fps, frame_count):
+        self.every = max(fps // 2, 1)
+        self.fps = max(fps, 1)
+        self.frame_count = frame_count
+        self.found_seconds = set()
+
+    def mark(self, frame_index):
+        self.found_seconds.add(self.second(frame_index))
+
+    def result(self):
+        return bool(self.found_seconds)
+
+    def per_second(self):
+        return {second: True for second in self.found_seconds}
+
+class TransitionReducer(EffectsReducer):
+    def update(self, frame_index, frame, gray):
+        if frame_index > 0 and np.mean(cv2.absdiff(gray, self.prev_gray)) > 30:
+            self.mark(frame_index)
+        self.prev_gray = gray
+
+class ColorFilterReducer(EffectsReducer):
+    def update(self, frame_index, frame, gray):
+        hist = cv2.calcHist([frame], [0, 1, 2], None, [8, 8, 8], [0, 256, 0, 256, 0, 256])
+        if np.max(hist) > self.frame_count / 10:
+            self.mark(frame_index)
+
+class EdgeDensityReducer(EffectsReducer):
+    def update(self, frame_index, frame, gray):
+        edges = cv2.Canny(gray, 100, 200)
+        if np.sum(edges) > gray.size * 0.1:
+            self.mark(frame_index)
+
+class FrameHashReducer(EffectsReducer):
+    # 64-bit average hash of each sampled frame, kept for slow-motion detection and the fingerprint
+    def setup(self, fps, frame_count):
+        super().setup(fps, frame_count)
+        self.hashes = []
+        self.seconds = []
+
+    def update(self, frame_index, frame, gray):
+        self.hashes.append(int(str(imagehash.average_hash(Image.fromarray(frame))), 16))
+        self.seconds.append(self.second(frame_index))
+
+    def result(self):
+        return self.hashes
+
+    def per_second(self):
+        # The first hash of each second
+        first = {}
+        for second, frame_hash in zip(self.seconds, self.hashes):
+            first.setdefault(second, frame_hash)
+        return first
+
+    def slow_motion_seconds(self):
+        # Seconds in which a sample barely changed from the one before
+        return {second: True for second, a, b in zip(self.seconds[1:], self.hashes, self.hashes[1:]) if is_slow_motion([a, b])}
+
+def analyze_frames(video_path, reducers, width=ANALYSIS_WIDTH):
+    # Decodes the video once, front to back, and hands each frame to the reducers that sample
+    # it. Only every stride-th frame (the gcd of the reducers' intervals) is converted to BGR,
+    # and nothing seeks (seeking re-decodes from the previous keyframe). width > 0 downscales
+    # frames first; decoding and downscaling run ahead on the frame source's thread.
+    with frame_source.FrameSource(video_path, width=width) as source:
+        frame_count = source.frame_count
+        fps = int(source.fps)
+        for reducer in reducers.values():
+            reducer.setup(fps, frame_count)
+        source.stride = functools.reduce(math.gcd, [reducer.every for reducer in reducers.values()])
+
+        for frame_index, frame in source:
+            if frame_count > 0 and frame_index >= frame_count:
+                break
+            due = [reducer for reducer in reducers.values() if frame_index % reducer.every == 0]
+            if not due:
+                continue
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            for reducer in due:
+                reducer.update(frame_index, frame, gray)
+
+    return fps, frame_count, {name: reducer.result() for name, reducer in reducers.items()}
+
+def style_reducers():
+    return {"color": MeanColorReducer(), "motion": MotionReducer()}
+
+def effect_reducers():
     return {
-        "duration": duration,
-        "color_style": brightness_style,
-        "motion_style": motion_style,
+        "rapid transitions": TransitionReducer(),
+        "color filters": ColorFilterReducer(),
+        "text overlay": EdgeDensityReducer(),
+        "frame hashes": FrameHashReducer(),
+    }
+
+def video_style_from(fps, frame_count, results):
+    dominant_color = results["color"]
+    brightness = np.mean(dominant_color)
+    return {
+        "duration": frame_count / fps,
+        "color_style": "bright" if brightness > 127 else "dark",
+        "motion_style": "high motion" if results["motion"] > 10 else "low motion",
         "dominant_color": dominant_color.tolist()
     }
 
-def analyze_audio(audio_path):
-    audio = AudioSegment.from_wav(audio_path)
-    samples = np.array(audio.get_array_of_samples())
-    
-    volume = np.abs(samples).mean()
-    volume_style = "loud" if volume > 10000 else "quiet"
+def is_slow_motion(frame_hashes):
+    # Consecutive samples (half a second apart) that barely changed
+    return any(fingerprint.hamming(a, b) < 5 for a, b in zip(frame_hashes, frame_hashes[1:]))
+
+def video_effects_from(results):
+    effects = [effect for effect in ("rapid transitions", "color filters", "text overlay") if results[effect]]
+    if is_slow_motion(results["frame hashes"]):
+        effects.append("slow motion")
+    return effects
+
+def video_seconds_from(reducers):
+    # {second: value} per feature, for the seconds the reducers sampled
+    frame_hashes = reducers["frame hashes"]
+    return {
+        "color": reducers["color"].per_second(),
+        "motion": reducers["motion"].per_second(),
+        "frame_hash": frame_hashes.per_second(),
+        "transition": reducers["rapid transitions"].per_second(),
+        "color_filter": reducers["color filters"].per_second(),
+        "text_overlay": reducers["text overlay"].per_second(),
+        "slow_motion": frame_hashes.slow_motion_seconds(),
+    }
+
+def analyze_video(video_path):
+    # Style, effects, the sampled frame hashes and the per-second values from a single decode of the video
+    reducers = {**style_reducers(), **effect_reducers()}
+    fps, frame_count, results = analyze_frames(video_path, reducers)
+    return (video_style_from(fps, frame_count, results), video_effects_from(results), results["frame hashes"],
+            video_seconds_from(reducers))
 
-    fft_result = np.abs(fft(samples))
-    freq_bins = len(fft_result) // 2
-    frequencies = np.fft.fftfreq(len(samples), 1 / audio.frame_rate)[:freq_bins]
-    
-    bass = np.mean(fft_result[:int(freq_bins * 0.1)])
-    treble = np.mean(fft_result[int(freq_bins * 0.6):])
-    
-    freq_style = "bass-heavy" if bass > treble else "treble-heavy"
+def analyze_video_style(video_path):
+    fps, frame_count, results = analyze_frames(video_path, style_reducers())
+    return video_style_from(fps, frame_count, results)
+
+def detect_video_effects(video_path):
+    _, _, results = analyze_frames(video_path, effect_reducers())
+    return video_effects_from(results)
+
+class AudioTrack:
+    # The audio of a video decoded once through an ffmpeg pipe into a float32 (frames, channels)
+    # buffer in [-1, 1]; nothing is written to disk. Consumers take views of it, and resampled
+    # mono copies are made once per rate and cached.
+
+    def __init__(self, samples, sample_rate):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self._resampled = {}
+
+    @classmethod
+    def from_file(cls, path):
+        # Native sample rate; more than two channels are downmixed to stereo. The decoded audio
+        # comes back as a WAV stream, so the rate and channel count are read from its header
+        # rather than from ffmpeg's log output.
+        command = [
+            'ffmpeg', '-nostdin', '-i', path, '-vn', '-map', '0:a:0',
+            '-af', 'aformat=sample_fmts=flt:channel_layouts=mono|stereo',
+            '-c:a', 'pcm_f32le', '-f', 'wav', 'pipe:1'
+        ]
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            errors = result.stderr.decode(errors='replace').strip()
+            raise RuntimeError(f"ffmpeg audio decode failed: {errors.splitlines()[-1] if errors else result.returncode}")
+
+        channels, sample_rate, data_offset = read_wav_header(result.stdout)
+        data = memoryview(result.stdout)[data_offset:]
+        usable = len(data) - len(data) % (4 * channels)
+        samples = np.frombuffer(data[:usable], dtype=np.float32).reshape(-1, channels)
+        return cls(samples, sample_rate)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def interleaved(self):
+        # Zero-copy flat view, channel samples interleaved as in a WAV file
+        return self.samples.reshape(-1)
+
+    def blocks(self, frames):
+        # Consecutive zero-copy (frames, channels) views
+        for start in range(0, len(self.samples), frames):
+            yield self.samples[start:start + frames]
+
+    def mono(self, sample_rate=None):
+        # Channel average at sample_rate (default: native), computed once per rate
+        sample_rate = sample_rate or self.sample_rate
+        if sample_rate not in self._resampled:
+            mono = self.samples[:, 0] if self.samples.shape[1] == 1 else self.samples.mean(axis=1)
+            if sample_rate != self.sample_rate:
+                divisor = np.gcd(sample_rate, self.sample_rate)
+                mono = signal.resample_poly(mono, sample_rate // divisor, self.sample_rate // divisor)
+            self._resampled[sample_rate] = np.ascontiguousarray(mono, dtype=np.float32)
+        return self._resampled[sample_rate]
+
+def read_wav_header(wav):
+    # (channels, sample_rate, offset of the samples) of a streamed WAV file. ffmpeg can't seek back
+    # into a pipe to fill in the sizes, so the data chunk is taken to run to the end of the stream.
+    if len(wav) < 12 or wav[:4] != b'RIFF' or wav[8:12] != b'WAVE':
+        raise RuntimeError("ffmpeg audio decode returned no WAV header")
+    channels = sample_rate = None
+    position = 12
+    while position + 8 <= len(wav):
+        chunk_id, chunk_size = struct.unpack_from('<4sI', wav, position)
+        position += 8
+        if chunk_id == b'data':
+            if channels is None:
+                break
+            return channels, sample_rate, position
+        if chunk_id == b'fmt ' and chunk_size >= 8:
+            channels, sample_rate = struct.unpack_from('<HI', wav, position + 2)
+        position += chunk_size + chunk_size % 2
+    raise RuntimeError("ffmpeg audio decode returned a WAV stream without a format or data chunk")
+
+def as_audio_track(audio):
+    return audio if isinstance(audio, AudioTrack) else AudioTrack.from_file(audio)
+
+def spectral_features(audio, frame_size=SPECTRUM_FRAME_SIZE, block_frames=SPECTRUM_BLOCK_FRAMES):
+    # Welch-style average spectrum of the channel-averaged signal (Hann frames, 50% overlap) and
+    # loudness over all channels, for the whole clip and for each second. Audio is consumed
+    # block_frames STFT frames at a time, so apart from the per-second sums the working memory
+    # does not depend on the clip length.
+    hop = frame_size // 2
+    sample_rate = audio.sample_rate
+    window = np.hanning(frame_size).astype(np.float32)
+    frequencies = np.fft.rfftfreq(frame_size, 1 / sample_rate)
+    band_masks = np.stack([(frequencies >= low) & (frequencies < high) for low, high in SPECTRAL_BANDS_HZ.values()], axis=1)
+    magnitude_sum = np.zeros(frame_size // 2 + 1)
+    power_sum = np.zeros(frame_size // 2 + 1)
+    frame_band_power = []  # (frames, bands) per block, and the frames' total power
+    frame_power = []
+    n_frames = 0
+    abs_sum = 0.0
+    second_square, second_peak, second_values = [], [], []
+    offset = 0
+    carry = np.zeros(0, dtype=np.float32)
+
+    def add_frames(frames):
+        nonlocal n_frames
+        spectrum = np.abs(np.fft.rfft(frames * window, axis=1))
+        power = np.square(spectrum)
+        magnitude_sum[:] += spectrum.sum(axis=0)
+        power_sum[:] += power.sum(axis=0)
+        frame_band_power.append(power @ band_masks)
+        frame_power.append(power.sum(axis=1))
+        n_frames += len(frames)
+
+    for block in audio.blocks(hop * block_frames):
+        abs_block = np.abs(block)
+        abs_sum += float(abs_block.sum(dtype=np.float64))
+        # Loudness sums per second, the block cut at the second boundaries
+        position = offset
+        while position < offset + len(block):
+            second = position // sample_rate
+            end = min((second + 1) * sample_rate, offset + len(block))
+            part = slice(position - offset, end - offset)
+            if second == len(second_square):
+                second_square.append(0.0)
+                second_peak.append(0.0)
+                second_values.append(0)
+            second_square[second] += float(np.square(block[part], dtype=np.float64).sum())
+            second_peak[second] = max(second_peak[second], float(abs_block[part].max()))
+            second_values[second] += block[part].size
+            position = end
+        offset += len(block)
+
+        data = np.concatenate([carry, block.mean(axis=1)])
+        if len(data) >= frame_size:
+            frames = np.lib.stride_tricks.sliding_window_view(data, frame_size)[::hop]
+            add_frames(frames)
+            carry = data[len(frames) * hop:]
+        else:
+            carry = data
+
+    if n_frames == 0 and len(carry):
+        # Clip shorter than one frame: zero-pad it
+        add_frames(np.pad(carry, (0, frame_size - len(carry)))[np.newaxis])
+
+    magnitude = magnitude_sum / max(n_frames, 1)
+    total_power = power_sum.sum() or 1.0
+    n_values = sum(second_values)
+
+    def band_mean(low, high):
+        nyquist = sample_rate / 2
+        in_band = (frequencies >= low * nyquist) & (frequencies < high * nyquist)
+        return float(magnitude[in_band].mean()) if in_band.any() else 0.0
+
+    # Each STFT frame counts toward the second its center falls in
+    n_seconds = len(second_square)
+    frame_seconds = np.minimum((np.arange(n_frames) * hop + frame_size // 2) // sample_rate, max(n_seconds - 1, 0))
+    band_power = np.concatenate(frame_band_power) if frame_band_power else np.zeros((0, len(SPECTRAL_BANDS_HZ)))
+    second_power = np.bincount(frame_seconds, np.concatenate(frame_power) if frame_power else None, minlength=n_seconds)
+    second_power[second_power == 0] = 1.0
+    second_square = np.asarray(second_square)
+    second_values = np.maximum(second_values, 1)
+
+    return {
+        "mean_abs": abs_sum / max(n_values, 1),
+        "rms_dbfs": float(10 * np.log10(max(second_square.sum() / max(n_values, 1), 1e-20))),
+        "peak_dbfs": float(20 * np.log10(max(max(second_peak, default=0.0), 1e-10))),
+        "spectral_centroid_hz": float((frequencies * power_sum).sum() / total_power),
+        "band_energy": {
+            name: float(power_sum[(frequencies >= low) & (frequencies < high)].sum() / total_power)
+            for name, (low, high) in SPECTRAL_BANDS_HZ.items()
+        },
+        "bass_magnitude": band_mean(*BASS_STYLE_BAND),
+        "treble_magnitude": band_mean(*TREBLE_STYLE_BAND),
+        "seconds": {
+            "rms_dbfs": 10 * np.log10(np.maximum(second_square / second_values, 1e-20)),
+            "peak_dbfs": 20 * np.log10(np.maximum(second_peak, 1e-10)),
+            "band_energy": {
+                name: np.bincount(frame_seconds, band_power[:, i], minlength=n_seconds) / second_power
+                for i, name in enumerate(SPECTRAL_BANDS_HZ)
+            },
+        },
+    }
+
+def analyze_audio(audio):
+    # The audio style and the per-second loudness and band energy; audio is an AudioTrack or a path to decode
+    features = spectral_features(as_audio_track(audio))
+    seconds = features["seconds"]
+
+    # Same scale as the 16-bit PCM samples this used to read
+    volume = features["mean_abs"] * 32768
+    volume_style = "loud" if volume > 10000 else "quiet"
+    freq_style = "bass-heavy" if features["bass_magnitude"] > features["treble_magnitude"] else "treble-heavy"
 
     return {
         "volume_style": volume_style,
-        "frequency_style": freq_style
+        "frequency_style": freq_style,
+        "rms_dbfs": round(features["rms_dbfs"], 2),
+        "peak_dbfs": round(features["peak_dbfs"], 2),
+        "spectral_centroid_hz": round(features["spectral_centroid_hz"], 1),
+        "band_energy": {name: round(energy, 4) for name, energy in features["band_energy"].items()}
+    }, {
+        "rms_dbfs": np.round(seconds["rms_dbfs"], 2).tolist(),
+        "peak_dbfs": np.round(seconds["peak_dbfs"], 2).tolist(),
+        "band_energy": {name: np.round(energy, 4).tolist() for name, energy in seconds["band_energy"].items()},
     }
 
 def extract_tags(post):
@@ -154,163 +671,365 @@ def extract_tags(post):
         "mentions": mentions
     }
 
-def detect_video_effects(video_path):
-    cap = cv2.VideoCapture(video_path)
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-
-    effects = set()
-    prev_frame = None
-    prev_hash = None
-
-    for i in range(0, frame_count, fps // 2):
-        cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-        ret, frame = cap.read()
-        if not ret:
+def audio_windows(audio, sample_rate=WHISPER_SAMPLE_RATE, window=WINDOW_SECONDS, overlap=WINDOW_OVERLAP_SECONDS):
+    # (offset in seconds, samples) for overlapping windows that together cover the whole clip
+    size = int(window * sample_rate)
+    step = int((window - overlap) * sample_rate)
+    windows = []
+    for start in range(0, max(len(audio), 1), step):
+        windows.append((start / sample_rate, audio[start:start + size]))
+        if start + size >= len(audio):
             break
+    return windows
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+def stitch_windows(window_results, window=WINDOW_SECONDS, overlap=WINDOW_OVERLAP_SECONDS):
+    # window_results: (offset, [(start, end, text), ...]) with times relative to the window.
+    # Each overlap is split down the middle and a segment is kept by the window its start falls in.
+    segments = []
+    for i, (offset, window_segments) in enumerate(window_results):
+        keep_from = offset + overlap / 2 if i > 0 else float("-inf")
+        keep_until = offset + window - overlap / 2 if i < len(window_results) - 1 else float("inf")
+        for start, end, text in window_segments:
+            start = offset + start
+            end = offset + (end if end is not None else window)
+            if keep_from <= start < keep_until and text.strip():
+                segments.append({"start": round(start, 2), "end": round(end, 2), "text": text.strip()})
+    return segments
 
-        if prev_frame is not None:
-            diff = cv2.absdiff(gray, prev_frame)
-            if np.mean(diff) > 30:
-                effects.add("rapid transitions")
+def transcribe_windows(windows, processor, model, device, batch_size=WHISPER_BATCH_SIZE):
+    # Runs the windows through generate batch_size at a time with timestamp tokens on
+    results = []
+    for i in range(0, len(windows), batch_size):
+        batch = windows[i:i + batch_size]
+        inputs = processor([samples for _, samples in batch], sampling_rate=WHISPER_SAMPLE_RATE, return_tensors="pt")
+        input_features = inputs.input_features.to(device)
+        with torch.inference_mode():
+            generated_ids = model.generate(input_features, return_timestamps=True)
+        decoded = processor.batch_decode(generated_ids, skip_special_tokens=True, output_offsets=True)
 
-        hist = cv2.calcHist([frame], [0, 1, 2], None, [8, 8, 8], [0, 256, 0, 256, 0, 256])
-        if np.max(hist) > frame_count / 10:
-            effects.add("color filters")
+        for (offset, samples), output in zip(batch, decoded):
+            window_segments = [(item["timestamp"][0], item["timestamp"][1], item["text"]) for item in output["offsets"]]
+            if not window_segments and output["text"].strip():
+                window_segments = [(0.0, len(samples) / WHISPER_SAMPLE_RATE, output["text"])]
+            results.append((offset, window_segments))
+    return results
 
-        edges = cv2.Canny(gray, 100, 200)
-        if np.sum(edges) > gray.size * 0.1:
-            effects.add("text overlay")
+def transcribe_audio_whisper(audio, model_size=WHISPER_MODEL_SIZE, quantize=WHISPER_QUANTIZE,
+                             batch_size=WHISPER_BATCH_SIZE):
+    # Full-length transcription as [{"start", "end", "text"}] segments in seconds;
+    # audio is an AudioTrack or a path to decode
+    with instrumentation.stage('whisper') as span:
+        processor, model, device = get_whisper(model_size, quantize)
+        samples = as_audio_track(audio).mono(WHISPER_SAMPLE_RATE)
+        windows = audio_windows(samples)
+        span.count('samples', len(samples))
+        span.count('windows', len(windows))
+        segments = stitch_windows(transcribe_windows(windows, processor, model, device, batch_size))
+        span.count('segments', len(segments))
+    return segments
 
-        img_hash = imagehash.average_hash(Image.fromarray(frame))
-        if prev_hash and img_hash - prev_hash < 5:
-            effects.add("slow motion")
+def per_second_features(video_seconds, audio_seconds):
+    # Columns of the feature store's seconds table, one entry per second of the longer of the two
+    # streams; None where a stream has no value, effect flags are False where none was seen
+    n_seconds = max([len(audio_seconds["rms_dbfs"])] + [max(values) + 1 for values in video_seconds.values() if values])
+    seconds = range(n_seconds)
 
-        prev_frame = gray
-        prev_hash = img_hash
+    def column(values):
+        return [values[second] if second < len(values) else None for second in seconds]
 
-    cap.release()
-    return list(effects)
+    color, motion, frame_hash = video_seconds["color"], video_seconds["motion"], video_seconds["frame_hash"]
+    columns = {"second": list(seconds)}
+    for channel, name in enumerate(("color_b", "color_g", "color_r")):
+        columns[name] = [round(float(color[second][channel]), 2) if second in color else None for second in seconds]
+    columns["motion"] = [round(float(motion[second]), 3) if second in motion else None for second in seconds]
+    columns["rms_dbfs"] = column(audio_seconds["rms_dbfs"])
+    columns["peak_dbfs"] = column(audio_seconds["peak_dbfs"])
+    for name, energy in audio_seconds["band_energy"].items():
+        columns[f"band_{name}"] = column(energy)
+    columns["frame_hash"] = [frame_hash.get(second) for second in seconds]
+    for flag in ("transition", "color_filter", "text_overlay", "slow_motion"):
+        columns[flag] = [second in video_seconds[flag] for second in seconds]
+    return columns
 
-def transcribe_audio_whisper(audio_path):
-    processor = WhisperProcessor.from_pretrained("openai/whisper-large-v3")
-    model = WhisperForConditionalGeneration.from_pretrained("openai/whisper-large-v3")
-    
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model = model.to(device)
+def analyze_media(video_path):
+    # The CPU-bound analysis: one in-memory decode of the audio, one pass over the frames.
+    # Returns the results (with the reel's fingerprint), the per-second feature columns and
+    # the decoded AudioTrack for transcription.
+    with instrumentation.stage('decode_audio') as span:
+        audio = AudioTrack.from_file(video_path)
+        span.count('samples', len(audio.samples))
+    with instrumentation.stage('analyze_video'):
+        video_style, video_effects, frame_hashes, video_seconds = analyze_video(video_path)
+    with instrumentation.stage('analyze_audio'):
+        audio_style, audio_seconds = analyze_audio(audio)
+    signature = fingerprint.video_signature(frame_hashes, audio.mono(WHISPER_SAMPLE_RATE), WHISPER_SAMPLE_RATE)
+    return {
+        "video_style": video_style,
+        "video_effects": video_effects,
+        "audio_style": audio_style,
+        "fingerprint": fingerprint.signature_to_hex(signature),
+    }, per_second_features(video_seconds, audio_seconds), audio
 
-    audio, rate = librosa.load(audio_path, sr=16000)
-    input_features = processor(audio, sampling_rate=rate, return_tensors="pt").input_features
-    input_features = input_features.to(device)
+def find_duplicate(analysis):
+    # Stored transcription of an already processed copy of this reel, or None
+    match = get_fingerprint_index().nearest(fingerprint.signature_from_hex(analysis["fingerprint"]))
+    if match is None or not match[2]:
+        return None
+    video_id, distance, payload = match
+    logger.info(f"Near-duplicate of {video_id} ({distance} bits apart), reusing its transcription")
+    analysis["duplicate_of"] = {"video_id": video_id, "distance": distance}
+    return payload["transcription"]
 
-    generated_ids = model.generate(input_features)
-    transcription = processor.batch_decode(generated_ids, skip_special_tokens=True)
+def remember_transcription(video_id, analysis, transcription):
+    get_fingerprint_index().add(video_id, fingerprint.signature_from_hex(analysis["fingerprint"]),
+                                {"transcription": transcription})
 
-    return transcription[0]
+def record_features(video_id, analysis, seconds):
+    # Buffers the reel's rows for the feature store; flush_features() writes them
+    if FEATURE_STORE_URI:
+        get_feature_writer().add(video_id, analysis, seconds)
 
-def process_video_to_text(video_folder, post):
+def flush_features():
+    # Paths of the Parquet files written, [] when the store is off
+    if not FEATURE_STORE_URI:
+        return []
     try:
-        # Find the MP4 file
-        video_path = next((os.path.join(video_folder, file) for file in os.listdir(video_folder) if file.endswith(".mp4")), None)
-        
-        if not video_path:
-            logger.error("No MP4 file found in the specified folder.")
-            raise FileNotFoundError("No MP4 file found")
+        with instrumentation.stage('write_features') as span:
+            paths = get_feature_writer().flush()
+            span.count('files', len(paths))
+    except Exception as e:
+        # The rows stay buffered and go out with the next flush on this container
+        logger.error(f"Writing features to {FEATURE_STORE_URI} failed: {e}")
+        return []
+    logger.info(f"Features written to {', '.join(paths) or 'nothing'}")
+    return paths
 
-        logger.info(f"Processing video: {video_path}")
+def process_video(video_path, post):
+    # The structured analysis of one downloaded reel: styles, effects, tags, fingerprint and
+    # transcription. The per-second features are buffered for the feature store.
+    try:
+        if not os.path.exists(video_path):
+            logger.error(f"Video file not found: {video_path}")
+            raise FileNotFoundError(f"No video at {video_path}")
 
-        # Process video
-        with mp.VideoFileClip(video_path) as video:
-            audio_path = os.path.join(video_folder, "full_audio.wav")
-            video.audio.write_audiofile(audio_path)
+        logger.info(f"Processing video: {video_path}")
 
         # Analyze video and audio
-        video_style = analyze_video_style(video_path)
-        audio_style = analyze_audio(audio_path)
-        tags = extract_tags(post)
-        video_effects = detect_video_effects(video_path)
-
-        logger.info("Transcribing audio with OpenAI Whisper...")
-        transcription = transcribe_audio_whisper(audio_path)
-
-        # Write results
-        results_path = os.path.join(video_folder, "video_analysis.txt")
-        with open(results_path, "w", encoding="utf-8") as f:
-            f.write("Video Analysis Results\n")
-            f.write("======================\n\n")
-            f.write(f"Video Style:\n{video_style}\n\n")
-            f.write(f"Audio Style:\n{audio_style}\n\n")
-            f.write(f"Tags:\n{tags}\n\n")
-            f.write(f"Video Effects:\n{video_effects}\n\n")
-            f.write("Transcription:\n")
-            f.write(transcription)
-
-        logger.info(f"Video analysis and transcription saved to {results_path}")
-
-        # Clean up temporary audio file
-        os.remove(audio_path)
-        logger.info("Temporary audio file removed")
-
-        return results_path
+        analysis, seconds, audio = analyze_media(video_path)
+        analysis["tags"] = extract_tags(post)
+
+        transcription = find_duplicate(analysis)
+        if transcription is None:
+            logger.info("Transcribing audio with OpenAI Whisper...")
+            transcription = transcribe_audio_whisper(audio)
+            remember_transcription(post.shortcode, analysis, transcription)
+        analysis["transcription"] = transcription
+
+        record_features(post.shortcode, analysis, seconds)
+        return analysis
 
     except FileNotFoundError as e:
         logger.error(f"File not found: {str(e)}")
         raise
     except Exception as e:
-        logger.error(f"Error in process_video_to_text: {str(e)}", exc_info=True)
+        logger.error(f"Error in process_video: {str(e)}", exc_info=True)
         raise
 
+def _analysis_worker(conn, video_path):
+    try:
+        analysis, seconds, audio = analyze_media(video_path)
+        conn.send(("ok", (analysis, seconds, audio.mono(WHISPER_SAMPLE_RATE))))
+    except Exception as e:
+        conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+def process_reels(reel_urls, download_workers=BATCH_DOWNLOAD_WORKERS, analysis_workers=BATCH_ANALYSIS_WORKERS,
+                  transcribe=True):
+    # Yields one result per reel, in the order they finish. Downloads run on a thread pool;
+    # each downloaded reel is analyzed in its own spawned process, at most analysis_workers
+    # at a time (Lambda has no /dev/shm, so no multiprocessing pools); transcription runs on
+    # one thread here so the Whisper model is loaded once and shared. Features of the reels
+    # that succeed are buffered for the feature store; call flush_features() afterwards.
+    # A reel is fingerprinted into the batch as soon as it goes to transcription, so its
+    # near-duplicates later in the same batch wait for that transcription instead of repeating it.
+    started = time.perf_counter()
+    spawn = multiprocessing.get_context("spawn")
+    work_dir = tempfile.mkdtemp(prefix="reels_")
+
+    def result(index, analysis=None, error=None):
+        shutil.rmtree(os.path.join(work_dir, str(index)), ignore_errors=True)
+        entry = {"index": index, "reel_url": reel_urls[index], "status": "error" if error else "ok",
+                 "seconds": round(time.perf_counter() - started, 2)}
+        if error:
+            entry["error"] = error
+            logger.warning(f"Reel {reel_urls[index]} failed: {error}")
+        else:
+            entry["analysis"] = analysis
+        return entry
+
+    def download(index, reel_url):
+        reel_dir = os.path.join(work_dir, str(index))
+        os.makedirs(reel_dir)
+        return download_reel(reel_url, reel_dir)
+
+    downloaded = deque()
+    running = {}
+    transcribing = {}
+    in_transcription = fingerprint.FingerprintIndex()  # payload: the reel's index in reel_urls
+    waiting_duplicates = {}  # index of a reel being transcribed -> its near-duplicates in this batch
+    try:
+        with ThreadPoolExecutor(max(1, download_workers)) as download_pool, ThreadPoolExecutor(1) as transcribe_pool:
+            def queue_transcription(index, post, analysis, seconds, audio_16k):
+                signature = fingerprint.signature_from_hex(analysis["fingerprint"])
+                match = in_transcription.nearest(signature)
+                if match is not None and match[2] in waiting_duplicates:
+                    video_id, distance, original = match
+                    logger.info(f"Near-duplicate of {video_id} ({distance} bits apart), waiting for its transcription")
+                    analysis["duplicate_of"] = {"video_id": video_id, "distance": distance}
+                    waiting_duplicates[original].append((index, post, analysis, seconds, audio_16k))
+                    return
+                in_transcription.add(post.shortcode, signature, index)
+                waiting_duplicates[index] = []
+                audio = AudioTrack(audio_16k[:, np.newaxis], WHISPER_SAMPLE_RATE)
+                transcribing[transcribe_pool.submit(transcribe_audio_whisper, audio)] = (index, post, analysis, seconds)
+
+            downloads = {download_pool.submit(download, i, url): i for i, url in enumerate(reel_urls)}
+            while downloads or downloaded or running or transcribing:
+                for future in [future for future in downloads if future.done()]:
+                    index = downloads.pop(future)
+                    post, video_path = future.result()
+                    if post is None:
+                        yield result(index, error="Failed to download the reel")
+                    else:
+                        downloaded.append((index, post, video_path))
+
+                while downloaded and len(running) < max(1, analysis_workers):
+                    index, post, video_path = downloaded.popleft()
+                    parent_conn, child_conn = spawn.Pipe(duplex=False)
+                    process = spawn.Process(target=_analysis_worker, args=(child_conn, video_path))
+                    process.start()
+                    child_conn.close()
+                    running[parent_conn] = (index, post, process)
+
+                if running:
+                    ready = wait(list(running), timeout=BATCH_POLL_SECONDS)
+                else:
+                    wait_futures(list(downloads) + list(transcribing), timeout=BATCH_POLL_SECONDS,
+                                 return_when=FIRST_COMPLETED)
+                    ready = []
+
+                for conn in ready:
+                    index, post, process = running.pop(conn)
+                    try:
+                        status, payload = conn.recv()
+                    except EOFError:
+                        status, payload = "error", f"analysis worker exited with code {process.exitcode}"
+                    process.join()
+                    if status != "ok":
+                        yield result(index, error=payload)
+                        continue
+
+                    analysis, seconds, audio_16k = payload
+                    analysis["tags"] = extract_tags(post)
+                    duplicate = find_duplicate(analysis) if transcribe else None
+                    if duplicate is not None:
+                        analysis["transcription"] = duplicate
+                        record_features(post.shortcode, analysis, seconds)
+                        yield result(index, analysis)
+                    elif transcribe:
+                        queue_transcription(index, post, analysis, seconds, audio_16k)
+                    else:
+                        record_features(post.shortcode, analysis, seconds)
+                        yield result(index, analysis)
+
+                for future in [future for future in transcribing if future.done()]:
+                    index, post, analysis, seconds = transcribing.pop(future)
+                    duplicates = waiting_duplicates.pop(index)
+                    try:
+                        analysis["transcription"] = future.result()
+                    except Exception as e:
+                        yield result(index, error=f"Transcription failed: {e}")
+                        # Its duplicates are transcribed on their own instead
+                        for duplicate_index, duplicate_post, duplicate_analysis, duplicate_seconds, audio_16k in duplicates:
+                            del duplicate_analysis["duplicate_of"]
+                            queue_transcription(duplicate_index, duplicate_post, duplicate_analysis, duplicate_seconds, audio_16k)
+                        continue
+                    remember_transcription(post.shortcode, analysis, analysis["transcription"])
+                    record_features(post.shortcode, analysis, seconds)
+                    yield result(index, analysis)
+                    for duplicate_index, duplicate_post, duplicate_analysis, duplicate_seconds, _ in duplicates:
+                        duplicate_analysis["transcription"] = analysis["transcription"]
+                        record_features(duplicate_post.shortcode, duplicate_analysis, duplicate_seconds)
+                        yield result(duplicate_index, duplicate_analysis)
+    finally:
+        for _, _, process in running.values():
+            process.terminate()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def publish_result(results_uri, batch_id, entry):
+    # Hands one finished reel's result out before the rest of the batch is done
+    logger.info(f"Reel {entry['index']} of batch {batch_id}: {entry['status']} after {entry['seconds']}s")
+    if not results_uri:
+        return
+    try:
+        filesystem, path = feature_store.open_root(results_uri)
+        directory = f"{path}/{batch_id}"
+        filesystem.create_dir(directory, recursive=True)
+        with filesystem.open_output_stream(f"{directory}/{entry['index']:05d}.json") as f:
+            f.write(json.dumps(entry).encode("utf-8"))
+    except Exception as e:
+        # The result still goes out in the response
+        logger.error(f"Writing the result of reel {entry['index']} to {results_uri} failed: {e}")
+
+def process_reel_batch(event):
+    reel_urls = event['reel_urls']
+    download_workers = int(event.get('download_workers', BATCH_DOWNLOAD_WORKERS))
+    analysis_workers = int(event.get('analysis_workers', BATCH_ANALYSIS_WORKERS))
+    results_uri = event.get('results_uri', BATCH_RESULTS_URI)
+    batch_id = event.get('batch_id') or uuid.uuid4().hex
+    logger.info(f"Processing {len(reel_urls)} reels as batch {batch_id} "
+                f"({download_workers} downloads, {analysis_workers} analyses at a time)")
+
+    results = []
+    for entry in process_reels(reel_urls, download_workers, analysis_workers):
+        publish_result(results_uri, batch_id, entry)
+        results.append(entry)
+    failed = sum(1 for entry in results if entry["status"] != "ok")
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': f'Processed {len(results) - failed} of {len(results)} reels',
+            'batch_id': batch_id,
+            'results': results,
+            'feature_files': flush_features()
+        })
+    }
+
 def lambda_handler(event, context):
+    instrumentation.configure(request_id=getattr(context, 'aws_request_id', None))
     try:
+        if 'reel_urls' in event:
+            return process_reel_batch(event)
+
         reel_url = event['reel_url']
         logger.info(f"Processing reel: {reel_url}")
         
         with tempfile.TemporaryDirectory() as tmp_dir:
-            post = download_reel(reel_url, tmp_dir)
+            post, video_path = download_reel(reel_url, tmp_dir)
             if post:
-                max_retries = 5
-                base_delay = 1  # Start with a 1-second delay
-                
-                for attempt in range(max_retries):
-                    try:
-                        video_path = find_video_file(tmp_dir)
-                        if video_path:
-                            process_video_to_text(tmp_dir, post)
-                            break
-                        else:
-                            delay = base_delay * (2 ** attempt)  # Exponential backoff
-                            logger.info(f"Video file not found. Retrying in {delay} seconds. Attempt {attempt + 1}/{max_retries}")
-                            time.sleep(delay)
-                    except FileNotFoundError:
-                        if attempt == max_retries - 1:
-                            raise
-                        continue
-                
-                results_path = os.path.join(tmp_dir, "video_analysis.txt")
-                logger.info(f"Checking for results file: {results_path}")
-                
-                if os.path.exists(results_path):
-                    with open(results_path, "r", encoding="utf-8") as f:
-                        analysis_results = f.read()
-                    
-                    logger.info("Reel processed successfully")
-                    return {
-                        'statusCode': 200,
-                        'body': json.dumps({
-                            'message': 'Reel processed successfully',
-                            'analysis': analysis_results
-                        })
-                    }
-                else:
-                    logger.error(f"Results file not found: {results_path}")
-                    return {
-                        'statusCode': 500,
-                        'body': json.dumps({
-                            'message': 'Error: Results file not found'
-                        })
-                    }
+                analysis = process_video(video_path, post)
+                feature_files = flush_features()
+
+                logger.info("Reel processed successfully")
+                return {
+                    'statusCode': 200,
+                    'body': json.dumps({
+                        'message': 'Reel processed successfully',
+                        'analysis': analysis,
+                        'feature_files': feature_files
+                    })
+                }
             else:
                 logger.warning("Failed to download the reel")
                 return {
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Layered cache for auto_cropper stage results (transcript, analysis, faces, crops).
+# Entries are JSON values keyed by the source object's ETag, the stage, the stage version
+# and a hash of the settings that affect the result.
+
+def cache_key(stage, version, etag, settings=None):
+    settings_hash = hashlib.sha256(json.dumps(settings or {}, sort_keys=True).encode()).hexdigest()[:16]
+    etag = etag.strip('"')
+    return f"{stage}/v{version}/{etag}/{settings_hash}"
+
+class MemoryTier:
+    # LRU dict for warm containers, bounded by entry count
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+class DirectoryTier:
+    # One JSON file per key under path; once the directory grows past max_bytes the
+    # least recently used files (by mtime, refreshed on read) are removed
+
+    def __init__(self, path, max_bytes=100 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, key.replace("/", "__") + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._file(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(self._file(key))
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, entry):
+        file_path = self._file(key)
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, file_path)
+        self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        with self.lock:
+            files = []
+            for name in os.listdir(self.path):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.path, name))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in files)
+            for _, size, name in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+                total -= size
+
+class S3Tier:
+    # One JSON object per key under an S3 prefix, shared by every container. Expired entries
+    # are ignored on read; size is left to a lifecycle rule on the prefix.
+
+    def __init__(self, client, bucket, prefix="cache/auto_cropper"):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+
+    def get(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=f"{self.prefix}/{key}.json")
+            return json.loads(response["Body"].read())
+        except Exception:
+            return None
+
+    def put(self, key, entry):
+        self.client.put_object(
+            Bucket=self.bucket, Key=f"{self.prefix}/{key}.json",
+            Body=json.dumps(entry).encode(), ContentType="application/json"
+        )
+
+    def delete(self, key):
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=f"{self.prefix}/{key}.json")
+        except Exception:
+            pass
+
+class ResultCache:
+    # Looks up the memory tier first, then each persistent tier in order; a hit in a slower
+    # tier is copied into the faster ones. Entries older than ttl seconds count as misses.
+
+    def __init__(self, tiers, ttl=7 * 24 * 3600):
+        self.tiers = tiers
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        for level, tier in enumerate(self.tiers):
+            entry = tier.get(key)
+            if entry is None:
+                continue
+            if time.time() - entry["created"] > self.ttl:
+                tier.delete(key)
+                continue
+            for faster in self.tiers[:level]:
+                try:
+                    faster.put(key, entry)
+                except Exception as e:
+                    # As in put: a failed back-fill still returns the hit
+                    print(f"Cache write to {type(faster).__name__} failed: {e}")
+            self.hits += 1
+            return entry["value"]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        entry = {"created": time.time(), "value": value}
+        for tier in self.tiers:
+            try:
+                tier.put(key, entry)
+            except Exception as e:
+                # A cache that can't be written must never fail the request
+                print(f"Cache write to {type(tier).__name__} failed: {e}")
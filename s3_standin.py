@@ -0,0 +1,189 @@
+import argparse
+import hashlib
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+from xml.etree import ElementTree
+
+# Minimal in-memory stand-in for the S3 REST API: enough of HEAD/GET (with Range)/PUT/DELETE
+# object and multipart upload, path-style, to run auto_cropper without AWS. Signatures are
+# not checked, so presigned URLs from a client pointed at it work too (ffmpeg reads them).
+# Set S3_ENDPOINT_URL to its address and use any credentials.
+
+class StandinState:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.objects = {}
+        self.uploads = {}
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+def decode_aws_chunked(body):
+    # Newer boto3 sends PUT bodies as aws-chunked with a trailing checksum
+    data = bytearray()
+    position = 0
+    while True:
+        line_end = body.index(b"\r\n", position)
+        size = int(body[position:line_end].split(b";")[0], 16)
+        position = line_end + 2
+        if size == 0:
+            return bytes(data)
+        data += body[position:position + size]
+        position += size + 2
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _target(self):
+            parsed = urlparse(self.path)
+            bucket, _, key = unquote(parsed.path).lstrip("/").partition("/")
+            return bucket, key, parse_qs(parsed.query, keep_blank_values=True)
+
+        def _send(self, status, body=b"", headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+                with state.lock:
+                    state.bytes_sent += len(body)
+
+        def _xml(self, status, root, fields):
+            body = f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><{root}>"
+            body += "".join(f"<{name}>{value}</{name}>" for name, value in fields.items())
+            body += f"</{root}>"
+            self._send(status, body.encode(), {"Content-Type": "application/xml"})
+
+        def _not_found(self, key):
+            self._xml(404, "Error", {"Code": "NoSuchKey", "Message": "The specified key does not exist.", "Key": key})
+
+        def _body(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if "aws-chunked" in self.headers.get("Content-Encoding", ""):
+                body = decode_aws_chunked(body)
+            return body
+
+        def _begin(self):
+            with state.lock:
+                state.requests += 1
+            if state.delay:
+                time.sleep(state.delay)
+
+        def do_HEAD(self):
+            self.do_GET()
+
+        def do_GET(self):
+            self._begin()
+            bucket, key, _ = self._target()
+            with state.lock:
+                stored = state.objects.get((bucket, key))
+            if stored is None:
+                return self._not_found(key)
+
+            data, etag = stored
+            headers = {"ETag": etag, "Accept-Ranges": "bytes", "Content-Type": "application/octet-stream",
+                       "Last-Modified": "Thu, 01 Jan 2026 00:00:00 GMT"}
+            match = re.match(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+            if not match:
+                if self.command == "HEAD":
+                    self.send_response(200)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(data)))
+                    return self.end_headers()
+                return self._send(200, data, headers)
+
+            first, last = match.groups()
+            if first:
+                start, end = int(first), int(last) if last else len(data) - 1
+            else:
+                start, end = max(len(data) - int(last), 0), len(data) - 1
+            end = min(end, len(data) - 1)
+            if start >= len(data):
+                return self._send(416, b"", {"Content-Range": f"bytes */{len(data)}"})
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            self._send(206, data[start:end + 1], headers)
+
+        def do_PUT(self):
+            self._begin()
+            bucket, key, query = self._target()
+            body = self._body()
+            etag = f"\"{hashlib.md5(body).hexdigest()}\""
+            if "uploadId" in query:
+                with state.lock:
+                    parts = state.uploads.get(query["uploadId"][0])
+                    if parts is None:
+                        return self._xml(404, "Error", {"Code": "NoSuchUpload"})
+                    parts[int(query["partNumber"][0])] = body
+            else:
+                with state.lock:
+                    state.objects[(bucket, key)] = (body, etag)
+            self._send(200, b"", {"ETag": etag})
+
+        def do_POST(self):
+            self._begin()
+            bucket, key, query = self._target()
+            body = self._body()
+            if "uploads" in query:
+                upload_id = uuid.uuid4().hex
+                with state.lock:
+                    state.uploads[upload_id] = {}
+                return self._xml(200, "InitiateMultipartUploadResult", {"Bucket": bucket, "Key": key, "UploadId": upload_id})
+
+            if "uploadId" in query:
+                upload_id = query["uploadId"][0]
+                numbers = [int(element.text) for element in ElementTree.fromstring(body).iter() if element.tag.endswith("PartNumber")]
+                with state.lock:
+                    parts = state.uploads.pop(upload_id, None)
+                    if parts is None:
+                        return self._xml(404, "Error", {"Code": "NoSuchUpload"})
+                    data = b"".join(parts[number] for number in sorted(numbers))
+                    digest = hashlib.md5(b"".join(hashlib.md5(parts[number]).digest() for number in sorted(numbers)))
+                    etag = f"\"{digest.hexdigest()}-{len(numbers)}\""
+                    state.objects[(bucket, key)] = (data, etag)
+                return self._xml(200, "CompleteMultipartUploadResult", {"Bucket": bucket, "Key": key, "ETag": etag.replace("\"", "&quot;")})
+
+            self._xml(400, "Error", {"Code": "NotImplemented"})
+
+        def do_DELETE(self):
+            self._begin()
+            bucket, key, query = self._target()
+            with state.lock:
+                if "uploadId" in query:
+                    state.uploads.pop(query["uploadId"][0], None)
+                else:
+                    state.objects.pop((bucket, key), None)
+            self._send(204)
+
+    return Handler
+
+def start_standin(port=0, delay=0.0):
+    # Start the stand-in on a background thread; returns (server, state, url)
+    state = StandinState(delay)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the S3 REST API")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to stall every request")
+    args = parser.parse_args()
+
+    server, state, url = start_standin(args.port, args.delay)
+    print(f"S3 stand-in listening on {url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
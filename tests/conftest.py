@@ -0,0 +1,46 @@
+import os
+import sys
+
+# The three deploy units ship separately and import their modules top-level; put each on the
+# path. Shared modules (instrumentation, frame_source) are identical copies, so any one will do.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.join(ROOT, 'whisper', 'main'), os.path.join(ROOT, 'instagram-reel-processor'), ROOT):
+    if path not in sys.path:
+        sys.path.append(path)
+
+import subprocess
+import pytest
+
+def make_clip(path, duration=4, video='testsrc2=size=320x240:rate=25', audio='sine=frequency=440:sample_rate=44100',
+              preset='ultrafast'):
+    # Short H.264/AAC clip from ffmpeg's test sources (presets above ultrafast add B-frames)
+    subprocess.run([
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', f'{video}:duration={duration}',
+        '-f', 'lavfi', '-i', f'{audio}:duration={duration}',
+        '-c:v', 'libx264', '-preset', preset, '-g', '25', '-c:a', 'aac', '-shortest', str(path)
+    ], check=True)
+    return str(path)
+
+@pytest.fixture
+def reel_processor(monkeypatch):
+    # lambda_function with its Instagram requests going to the stand-in (call serve(video_path)),
+    # fingerprints kept in memory and nothing carried over between tests
+    import instagram_standin
+    import lambda_function
+    servers = []
+
+    def serve(video_path, **options):
+        server, state, url = instagram_standin.start_standin(video_path, **options)
+        servers.append(server)
+        monkeypatch.setattr(lambda_function, 'INSTAGRAM_STANDIN_URL', url)
+        return state
+
+    monkeypatch.setattr(lambda_function, 'FINGERPRINT_DB', '')
+    monkeypatch.setattr(lambda_function, 'FEATURE_STORE_URI', '')
+    monkeypatch.setattr(lambda_function, 'warm_resources', {})
+    lambda_function.serve = serve
+    yield lambda_function
+    del lambda_function.serve
+    for server in servers:
+        server.shutdown()
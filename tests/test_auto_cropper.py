@@ -0,0 +1,59 @@
+import threading
+import numpy as np
+import pytest
+
+from conftest import make_clip
+
+@pytest.fixture
+def auto_cropper(monkeypatch):
+    # Read at import time, by the test process and by every spawned segment worker
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    import auto_cropper
+    return auto_cropper
+
+def test_segment_workers_start_clean_while_a_lock_is_held(auto_cropper, tmp_path):
+    # A forked worker would inherit warm_resources_lock held and block on the face cascade
+    source = make_clip(tmp_path / 'segment.mp4', duration=1)
+    jobs = [(0, source, str(tmp_path / 'cropped.mp4'), None)]
+    results = []
+    with auto_cropper.warm_resources_lock:
+        worker = threading.Thread(target=lambda: results.extend(auto_cropper.run_segment_workers(jobs, 1)), daemon=True)
+        worker.start()
+        worker.join(timeout=120)
+    assert not worker.is_alive()
+    [(index, status, result)] = results
+    assert (index, status) == (0, 'ok'), result
+    assert (tmp_path / 'cropped.mp4').stat().st_size > 0
+
+def test_segment_worker_errors_are_reported(auto_cropper, tmp_path):
+    jobs = [(3, str(tmp_path / 'missing.mp4'), str(tmp_path / 'cropped.mp4'), [])]
+    [(index, status, _)] = list(auto_cropper.run_segment_workers(jobs, 1))
+    assert (index, status) == (3, 'error')
+
+def test_split_on_silence_cuts_the_final_stretch_at_pauses_too(auto_cropper):
+    # 19 s, under one max_chunk: speech 0-7 s, 8-15 s and 16-19 s with a second of silence between
+    rate = auto_cropper.TRANSCRIBE_SAMPLE_RATE
+    t = np.arange(19 * rate) / rate
+    samples = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    for pause in (7, 15):
+        samples[pause * rate:(pause + 1) * rate] = 0
+    chunks = auto_cropper.split_on_silence(samples, rate)
+    assert len(chunks) == 3
+    # Each chunk ends early in the pause after its speech
+    for (start, end), speech_end in zip(chunks, (7, 15, 19)):
+        assert speech_end <= end / rate <= speech_end + 0.1
+
+SEGMENTS = [{'start': float(i * 5), 'end': float(i * 5 + 5), 'text': ''} for i in range(6)]
+
+def test_sections_snap_to_the_nearest_segment_edges(auto_cropper):
+    [section] = auto_cropper.snap_to_segments([{'start_time': 4.9, 'end_time': 10.2, 'description': 'x'}], SEGMENTS)
+    assert (section['start_time'], section['end_time'], section['description']) == (5.0, 10.0, 'x')
+
+def test_sections_are_at_least_one_segment_long(auto_cropper):
+    [section] = auto_cropper.snap_to_segments([{'start_time': 11.0, 'end_time': 11.5}], SEGMENTS)
+    assert (section['start_time'], section['end_time']) == (10.0, 15.0)
+
+def test_sections_that_collapse_onto_one_span_are_dropped(auto_cropper):
+    sections = [{'start_time': 5.2, 'end_time': 9.7}, {'start_time': 4.8, 'end_time': 10.3}, {'start_time': 15.0, 'end_time': 29.0}]
+    snapped = auto_cropper.snap_to_segments(sections, SEGMENTS)
+    assert [(s['start_time'], s['end_time']) for s in snapped] == [(5.0, 10.0), (15.0, 30.0)]
@@ -0,0 +1,57 @@
+import random
+import subprocess
+import pytest
+
+import fingerprint
+from conftest import make_clip
+
+# A tone whose loudness swells at the given rate, so the audio envelope has a shape to hash
+SWELLING_TONE = "aevalsrc=exprs='0.5*sin(2*PI*440*t)*(0.5+0.5*sin(2*PI*{}*t))':sample_rate=44100"
+
+def flip(signature, bits):
+    for bit in bits:
+        signature ^= 1 << bit
+    return signature
+
+@pytest.fixture
+def indexed():
+    signature = random.Random(0).getrandbits(fingerprint.SIGNATURE_BITS)
+    index = fingerprint.FingerprintIndex()
+    index.add("original", signature, {"transcription": []})
+    return index, signature
+
+VIDEO_BITS = range(fingerprint.AUDIO_SIGNATURE_BITS, fingerprint.SIGNATURE_BITS)
+AUDIO_BITS = range(fingerprint.AUDIO_SIGNATURE_BITS)
+
+@pytest.mark.parametrize("video_flips, audio_flips, found", [
+    (0, 0, True),
+    (fingerprint.VIDEO_MAX_DISTANCE, fingerprint.AUDIO_MAX_DISTANCE, True),
+    (fingerprint.VIDEO_MAX_DISTANCE + 1, 0, False),
+    (0, fingerprint.AUDIO_MAX_DISTANCE + 1, False),
+])
+def test_nearest_holds_video_and_audio_to_their_own_limits(indexed, video_flips, audio_flips, found):
+    index, signature = indexed
+    rng = random.Random(video_flips * 100 + audio_flips)
+    query = flip(signature, rng.sample(VIDEO_BITS, video_flips) + rng.sample(AUDIO_BITS, audio_flips))
+    match = index.nearest(query)
+    assert (match is not None) == found
+    if found:
+        assert match[:2] == ("original", video_flips + audio_flips)
+
+def test_same_pictures_with_a_different_soundtrack_is_not_a_duplicate(reel_processor, tmp_path):
+    original = make_clip(tmp_path / "original.mp4", duration=6, audio=SWELLING_TONE.format(0.7))
+    redubbed = make_clip(tmp_path / "redubbed.mp4", duration=6, audio=SWELLING_TONE.format(1.9))
+    reencoded = str(tmp_path / "reencoded.mp4")
+    subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", original, "-vf", "scale=240:180",
+                    "-c:v", "libx264", "-crf", "30", "-c:a", "aac", "-b:a", "64k", reencoded], check=True)
+    signatures = {
+        path: fingerprint.signature_from_hex(reel_processor.analyze_media(path)[0]["fingerprint"])
+        for path in (original, redubbed, reencoded)
+    }
+
+    index = fingerprint.FingerprintIndex()
+    index.add("original", signatures[original], {"transcription": [{"start": 0.0, "end": 1.0, "text": "hello"}]})
+    # Close enough overall to pass on the total distance alone, but the audio differs
+    assert fingerprint.hamming(signatures[original], signatures[redubbed]) <= fingerprint.DUPLICATE_MAX_DISTANCE
+    assert index.nearest(signatures[redubbed]) is None
+    assert index.nearest(signatures[reencoded])[0] == "original"
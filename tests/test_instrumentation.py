@@ -0,0 +1,58 @@
+import json
+import numpy as np
+import pytest
+
+import instrumentation
+
+BIG_MB = 150
+
+@pytest.fixture
+def spans(monkeypatch, capsys):
+    # JSON spans on; returns a function giving the records emitted so far, by stage name
+    monkeypatch.setattr(instrumentation, 'METRICS_FORMAT', 'json')
+    if instrumentation.memory_mb()[1] is None:
+        pytest.skip('no /proc/self/status')
+
+    def records():
+        return {record['stage']: record for record in map(json.loads, capsys.readouterr().out.splitlines())}
+    return records
+
+def allocate(mb):
+    # Touches every page so it counts towards RSS, then frees it again
+    block = np.ones(mb * 1024 * 1024 // 8)
+    del block
+
+@pytest.fixture
+def resettable(spans):
+    if not instrumentation.reset_peak():
+        pytest.skip('/proc/self/clear_refs is not writable')
+    return spans
+
+def test_each_span_reports_its_own_peak(resettable):
+    with instrumentation.stage('big'):
+        allocate(BIG_MB)
+    with instrumentation.stage('small'):
+        allocate(10)
+    records = resettable()
+    assert records['big']['peak_rss_growth_mb'] >= BIG_MB * 0.9
+    assert records['small']['peak_rss_growth_mb'] < BIG_MB / 3
+    assert records['small']['peak_rss_mb'] < records['big']['peak_rss_mb'] - BIG_MB / 2
+
+def test_an_inner_span_does_not_hide_the_outer_peak(resettable):
+    with instrumentation.stage('outer'):
+        allocate(BIG_MB)
+        with instrumentation.stage('inner'):
+            allocate(10)
+    records = resettable()
+    assert records['outer']['peak_rss_growth_mb'] >= BIG_MB * 0.9
+    assert records['outer']['peak_rss_mb'] >= records['inner']['peak_rss_mb']
+
+def test_without_clear_refs_the_peak_is_process_wide(spans, monkeypatch):
+    monkeypatch.setattr(instrumentation, '_peak_resettable', False)
+    with instrumentation.stage('big'):
+        allocate(BIG_MB)
+    with instrumentation.stage('small'):
+        pass
+    records = spans()
+    assert records['small']['peak_rss_mb'] >= records['big']['peak_rss_mb']
+    assert records['small']['peak_rss_growth_mb'] == 0
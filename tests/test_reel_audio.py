@@ -0,0 +1,30 @@
+import subprocess
+import numpy as np
+import pytest
+
+def make_audio(path, source):
+    subprocess.run(['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-f', 'lavfi', '-i', source, '-t', '3', str(path)], check=True)
+    return str(path)
+
+@pytest.mark.parametrize('sample_rate', [16000, 22050, 44100])
+@pytest.mark.parametrize('tone, style', [(0.05, 'bass-heavy'), (0.8, 'treble-heavy')])
+def test_frequency_style_is_relative_to_the_sample_rate(reel_processor, tmp_path, sample_rate, tone, style):
+    # A tone at a fixed fraction of the Nyquist frequency lands in the same band at every rate
+    frequency = int(tone * sample_rate / 2)
+    path = make_audio(tmp_path / 'tone.wav', f'sine=frequency={frequency}:sample_rate={sample_rate}')
+    track = reel_processor.AudioTrack.from_file(path)
+    assert track.sample_rate == sample_rate
+    summary, _ = reel_processor.analyze_audio(track)
+    assert summary['frequency_style'] == style
+
+@pytest.mark.parametrize('layout, channels', [('mono', 1), ('stereo', 2), ('5.1', 2)])
+def test_audio_track_reads_rate_and_channels_from_the_decoded_stream(reel_processor, tmp_path, layout, channels):
+    path = make_audio(tmp_path / 'tone.wav', f'sine=frequency=440:sample_rate=24000,aformat=channel_layouts={layout}')
+    track = reel_processor.AudioTrack.from_file(path)
+    assert (track.sample_rate, track.samples.shape) == (24000, (3 * 24000, channels))
+    assert track.samples.dtype == np.float32
+    assert 0.05 < np.abs(track.samples).max() <= 1.0
+
+def test_audio_track_without_a_wav_header_is_a_clear_error(reel_processor):
+    with pytest.raises(RuntimeError, match='WAV header'):
+        reel_processor.read_wav_header(b'Output #0, f32le')
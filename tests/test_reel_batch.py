@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+
+from conftest import make_clip
+
+URLS = [f'https://www.instagram.com/reel/R{i}/' for i in range(3)]
+TRANSCRIPTION = [{'start': 0.0, 'end': 1.0, 'text': 'hello'}]
+
+def hold_transcription_until_checked(monkeypatch, reel_processor, reels):
+    # Counts transcriptions instead of loading Whisper. Each one is held until `reels` reels have
+    # been checked for duplicates, so none of them can find a finished transcription in the index.
+    checked = threading.Semaphore(0)
+    calls = []
+    find_duplicate = reel_processor.find_duplicate
+
+    def counting_find_duplicate(analysis):
+        checked.release()
+        return find_duplicate(analysis)
+
+    def transcribe(audio):
+        calls.append(len(audio.samples))
+        if len(calls) == 1:
+            for _ in range(reels):
+                assert checked.acquire(timeout=120)
+        return TRANSCRIPTION
+
+    monkeypatch.setattr(reel_processor, 'find_duplicate', counting_find_duplicate)
+    monkeypatch.setattr(reel_processor, 'transcribe_audio_whisper', transcribe)
+    return calls
+
+def test_near_duplicates_in_one_batch_share_the_first_transcription(reel_processor, monkeypatch, tmp_path):
+    # The stand-in serves the same video for every reel
+    reel_processor.serve(make_clip(tmp_path / 'source.mp4'))
+    calls = hold_transcription_until_checked(monkeypatch, reel_processor, len(URLS))
+
+    results = list(reel_processor.process_reels(URLS, analysis_workers=1))
+    assert len(calls) == 1
+    assert sorted(entry['index'] for entry in results) == [0, 1, 2]
+    assert all(entry['analysis']['transcription'] == TRANSCRIPTION for entry in results)
+    [original] = [entry for entry in results if 'duplicate_of' not in entry['analysis']]
+    # The duplicates come out right behind the reel they waited for
+    assert results[0] is original
+    original_id = original['reel_url'].rstrip('/').rsplit('/', 1)[1]
+    assert all(entry['analysis']['duplicate_of']['video_id'] == original_id for entry in results[1:])
+
+def test_batch_results_are_written_as_each_reel_finishes(reel_processor, monkeypatch, tmp_path):
+    reel_processor.serve(make_clip(tmp_path / 'source.mp4'))
+    results_dir = tmp_path / 'results'
+    written = []
+    publish_result = reel_processor.publish_result
+
+    def recording_publish_result(results_uri, batch_id, entry):
+        publish_result(results_uri, batch_id, entry)
+        # Everything finished so far is already out
+        written.append(sorted(os.listdir(results_dir / batch_id)))
+
+    monkeypatch.setattr(reel_processor, 'transcribe_audio_whisper', lambda audio: TRANSCRIPTION)
+    monkeypatch.setattr(reel_processor, 'publish_result', recording_publish_result)
+    response = reel_processor.process_reel_batch({
+        'reel_urls': URLS + ['https://www.instagram.com/'],
+        'results_uri': str(results_dir),
+        'batch_id': 'batch1',
+    })
+
+    body = json.loads(response['body'])
+    assert body['batch_id'] == 'batch1'
+    assert [len(files) for files in written] == [1, 2, 3, 4]
+    for entry in body['results']:
+        with open(results_dir / 'batch1' / f"{entry['index']:05d}.json") as f:
+            assert json.load(f) == entry
+    assert sorted(entry['status'] for entry in body['results']) == ['error', 'ok', 'ok', 'ok']
@@ -0,0 +1,30 @@
+import os
+
+from conftest import make_clip
+
+def test_download_reel_streams_the_video(reel_processor, tmp_path):
+    clip = make_clip(tmp_path / 'source.mp4')
+    state = reel_processor.serve(clip, caption='Watch this #cooking #food with @chef')
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+
+    post, video_path = reel_processor.download_reel('https://www.instagram.com/reel/ABC123/', str(out_dir))
+    assert post.shortcode == 'ABC123'
+    assert os.listdir(out_dir) == ['ABC123.mp4']
+    with open(video_path, 'rb') as downloaded, open(clip, 'rb') as source:
+        assert downloaded.read() == source.read()
+    assert state.media_requests == 1
+    assert reel_processor.extract_tags(post) == {'hashtags': ['cooking', 'food'], 'mentions': ['chef']}
+
+def test_download_reel_reuses_one_session(reel_processor, tmp_path):
+    clip = make_clip(tmp_path / 'source.mp4')
+    state = reel_processor.serve(clip)
+    for shortcode in ('A1', 'B2', 'C3'):
+        post, _ = reel_processor.download_reel(f'https://www.instagram.com/reel/{shortcode}/', str(tmp_path))
+        assert post.shortcode == shortcode
+    assert state.media_requests == 3
+    assert len({port for _, port in state.connections}) == 1
+
+def test_download_reel_rejects_bad_urls(reel_processor, tmp_path):
+    reel_processor.serve(make_clip(tmp_path / 'source.mp4'))
+    assert reel_processor.download_reel('https://www.instagram.com/', str(tmp_path)) == (None, None)
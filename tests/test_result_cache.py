@@ -0,0 +1,94 @@
+import boto3
+import pytest
+from botocore.config import Config
+
+import result_cache
+import s3_standin
+from result_cache import ResultCache, MemoryTier, DirectoryTier, S3Tier, cache_key
+
+@pytest.fixture
+def s3_tier():
+    server, state, url = s3_standin.start_standin()
+    client = boto3.client('s3', endpoint_url=url, region_name='us-east-1', aws_access_key_id='test',
+                          aws_secret_access_key='test', config=Config(s3={'addressing_style': 'path'}))
+    yield S3Tier(client, 'cache-bucket'), state
+    server.shutdown()
+
+@pytest.fixture
+def tiers(tmp_path, s3_tier):
+    return [MemoryTier(), DirectoryTier(str(tmp_path / "cache")), s3_tier[0]]
+
+def test_cache_key_depends_on_every_part():
+    key = cache_key('faces', 1, '"abc"', {'stride': 5})
+    assert key == cache_key('faces', 1, 'abc', {'stride': 5})
+    assert key != cache_key('faces', 2, 'abc', {'stride': 5})
+    assert key != cache_key('faces', 1, 'abd', {'stride': 5})
+    assert key != cache_key('faces', 1, 'abc', {'stride': 4})
+    assert key != cache_key('crop', 1, 'abc', {'stride': 5})
+
+def test_hit_in_slower_tier_fills_faster_ones(tiers):
+    memory, directory, s3 = tiers
+    cache = ResultCache(tiers)
+    cache.put('stage/key', {'faces': [1, 2]})
+    for tier in tiers:
+        assert tier.get('stage/key')['value'] == {'faces': [1, 2]}
+
+    memory.delete('stage/key')
+    directory.delete('stage/key')
+    assert cache.get('stage/key') == {'faces': [1, 2]}
+    assert memory.get('stage/key') is not None
+    assert directory.get('stage/key') is not None
+
+    s3.delete('stage/key')
+    memory.delete('stage/key')
+    assert cache.get('stage/key') == {'faces': [1, 2]}
+    assert memory.get('stage/key') is not None
+    assert (cache.hits, cache.misses) == (2, 0)
+
+def test_miss_in_every_tier(tiers):
+    cache = ResultCache(tiers)
+    assert cache.get('stage/missing') is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+def test_expired_entries_are_misses_and_deleted(tiers, monkeypatch):
+    cache = ResultCache(tiers, ttl=60)
+    now = result_cache.time.time()
+    monkeypatch.setattr(result_cache.time, 'time', lambda: now)
+    cache.put('stage/key', 'value')
+
+    monkeypatch.setattr(result_cache.time, 'time', lambda: now + 59)
+    assert cache.get('stage/key') == 'value'
+
+    monkeypatch.setattr(result_cache.time, 'time', lambda: now + 61)
+    assert cache.get('stage/key') is None
+    assert all(tier.get('stage/key') is None for tier in tiers)
+
+def test_failing_tier_does_not_fail_put(tiers, s3_tier, capsys):
+    _, state = s3_tier
+    memory, directory, s3 = tiers
+    s3.client = None  # Every S3 call raises
+    cache = ResultCache(tiers)
+    cache.put('stage/key', 'value')
+    assert cache.get('stage/key') == 'value'
+    assert 'S3Tier failed' in capsys.readouterr().out
+
+def test_failing_back_fill_does_not_fail_get(tiers, monkeypatch, capsys):
+    memory, directory, s3 = tiers
+    cache = ResultCache(tiers)
+    cache.put('stage/key', 'value')
+    memory.delete('stage/key')
+    directory.delete('stage/key')
+
+    def full_disk(key, entry):
+        raise OSError('No space left on device')
+    monkeypatch.setattr(directory, 'put', full_disk)
+    assert cache.get('stage/key') == 'value'
+    assert 'DirectoryTier failed' in capsys.readouterr().out
+    assert memory.get('stage/key') is not None
+
+def test_directory_tier_evicts_least_recently_used(tmp_path):
+    directory = DirectoryTier(str(tmp_path / "cache"), max_bytes=250)
+    for i in range(5):
+        directory.put(f'stage/{i}', {'created': 0, 'value': 'x' * 50})
+    assert directory.get('stage/0') is None
+    assert directory.get('stage/4') is not None
@@ -0,0 +1,22 @@
+import os
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules each deploy unit ships its own copy of, since every unit is built from its own directory.
+# The copies must not drift apart; whisper/main keeps CRLF line endings, so those are not compared.
+SHARED_MODULES = {
+    'frame_source.py': ['.', 'instagram-reel-processor'],
+    'instrumentation.py': ['.', 'instagram-reel-processor', 'whisper/main'],
+}
+
+def read_normalized(path):
+    with open(path, 'rb') as f:
+        return f.read().replace(b'\r\n', b'\n')
+
+@pytest.mark.parametrize('module', sorted(SHARED_MODULES))
+def test_copies_of_a_shared_module_are_identical(module):
+    source, *copies = SHARED_MODULES[module]
+    expected = read_normalized(os.path.join(ROOT, source, module))
+    for copy in copies:
+        assert read_normalized(os.path.join(ROOT, copy, module)) == expected, f'{copy}/{module} differs from {source}/{module}'
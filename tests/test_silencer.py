@@ -0,0 +1,97 @@
+import subprocess
+from collections import Counter
+import numpy as np
+import pytest
+
+from conftest import make_clip
+from silencer import SAMPLE_RATE, build_speech_track, to_original_time, plan_fast_cuts, fast_cut, KEYFRAME_TOLERANCE
+
+@pytest.fixture
+def speech_track():
+    # Speech at 1.0-2.0 s and 5.0-6.5 s of an 8 s clip
+    samples = np.zeros(8 * SAMPLE_RATE, dtype=np.float32)
+    return build_speech_track(samples, [(1.0, 2.0), (5.0, 6.5)])
+
+def test_speech_track_keeps_only_the_intervals(speech_track):
+    speech, speech_starts, original_starts = speech_track
+    assert len(speech) == int(2.5 * SAMPLE_RATE)
+    assert list(speech_starts) == [0.0, 1.0]
+    assert list(original_starts) == [1.0, 5.0]
+
+@pytest.mark.parametrize("t, is_end, expected", [
+    (0.0, False, 1.0),
+    (0.5, False, 1.5),
+    (1.0, False, 5.0),  # A start on a join belongs to the next interval
+    (1.0, True, 2.0),   # An end on a join belongs to the previous one
+    (2.0, False, 6.0),
+    (2.5, True, 6.5),
+])
+def test_to_original_time(speech_track, t, is_end, expected):
+    _, speech_starts, original_starts = speech_track
+    assert to_original_time(t, speech_starts, original_starts, is_end) == pytest.approx(expected)
+
+KEYFRAMES = [0.0, 2.0, 4.0, 6.0, 8.0]
+
+def test_interval_starting_on_a_keyframe_is_copied():
+    assert plan_fast_cuts([(2.0 + KEYFRAME_TOLERANCE / 2, 3.0)], KEYFRAMES) == [("copy", 2.0, 3.0)]
+
+def test_head_up_to_the_next_keyframe_is_encoded():
+    assert plan_fast_cuts([(3.0, 5.0)], KEYFRAMES) == [("encode", 3.0, 4.0), ("copy", 4.0, 5.0)]
+
+def test_interval_without_a_keyframe_is_encoded_whole():
+    assert plan_fast_cuts([(2.5, 3.5)], KEYFRAMES) == [("encode", 2.5, 3.5)]
+
+def test_without_smart_encode_starts_snap_back():
+    assert plan_fast_cuts([(3.0, 5.0)], KEYFRAMES, smart_encode=False) == [("copy", 2.0, 5.0)]
+
+def test_snapped_pieces_merge_instead_of_overlapping():
+    pieces = plan_fast_cuts([(2.5, 3.0), (3.2, 5.0)], KEYFRAMES, smart_encode=False)
+    assert pieces == [("copy", 2.0, 5.0)]
+
+def test_pieces_are_ordered_and_disjoint():
+    intervals = [(0.3, 1.0), (1.5, 2.6), (2.7, 4.4), (5.9, 7.5), (7.6, 7.9)]
+    pieces = plan_fast_cuts(intervals, KEYFRAMES)
+    for (_, _, previous_end), (_, start, end) in zip(pieces, pieces[1:]):
+        assert previous_end <= start < end
+    # Every moment of speech falls in some piece
+    for start, end in intervals:
+        for t in np.linspace(start, end, 20):
+            assert any(piece_start <= t <= piece_end for _, piece_start, piece_end in pieces)
+
+def test_with_b_frames_the_tail_after_the_last_keyframe_is_encoded():
+    pieces = plan_fast_cuts([(3.0, 7.0)], KEYFRAMES, reordered=True)
+    assert pieces == [("encode", 3.0, 4.0), ("copy", 4.0, 6.0), ("encode", 6.0, 7.0)]
+
+def test_with_b_frames_an_end_near_a_keyframe_snaps_to_it():
+    pieces = plan_fast_cuts([(2.0, 6.0 - KEYFRAME_TOLERANCE / 2)], KEYFRAMES, reordered=True)
+    assert pieces == [("copy", 2.0, 6.0)]
+
+def test_with_b_frames_and_without_smart_encode_ends_snap_forward():
+    pieces = plan_fast_cuts([(3.0, 5.0)], KEYFRAMES, smart_encode=False, reordered=True)
+    assert pieces == [("copy", 2.0, 6.0)]
+
+def packets(path):
+    # (dts, pts) of every video packet in decode order
+    result = subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-i", path, "-map", "0:v:0", "-c", "copy",
+                             "-f", "framecrc", "-"], stdout=subprocess.PIPE, check=True, text=True)
+    rows = [line.split(",") for line in result.stdout.splitlines() if not line.startswith("#")]
+    return [(int(row[1]), int(row[2])) for row in rows]
+
+def test_fast_cut_joins_pieces_on_a_clean_timeline(tmp_path):
+    # NTSC rate and B-frames: the case where mistimed pieces show up as DTS warnings and odd fps
+    source = make_clip(tmp_path / "source.mp4", duration=6, video="testsrc2=size=160x120:rate=30000/1001",
+                       preset="veryfast")
+    output = str(tmp_path / "cut.mp4")
+    pieces = fast_cut(source, [(0.3, 1.7), (2.45, 4.3), (4.9, 5.8)], output)
+    assert {kind for kind, _, _ in pieces} == {"copy", "encode"}
+
+    remux = subprocess.run(["ffmpeg", "-nostdin", "-i", output, "-c", "copy", "-f", "null", "-"],
+                           stderr=subprocess.PIPE, text=True).stderr
+    assert "dts" not in remux.lower()
+    assert "29.97 fps, 29.97 tbr" in remux
+
+    dts, pts = zip(*packets(output))
+    assert all(a < b for a, b in zip(dts, dts[1:]))
+    # Every frame is kept exactly once, one frame duration apart
+    assert len(Counter(b - a for a, b in zip(sorted(pts), sorted(pts)[1:]))) == 1
+    assert len(pts) == sum(round((end - start) * 30000 / 1001) for _, start, end in pieces)
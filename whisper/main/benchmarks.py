@@ -0,0 +1,125 @@
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+import numpy as np
+from silencer import SAMPLE_RATE, CUT_MODE_EXACT, CUT_MODE_FAST, load_audio, detect_non_silent_intervals, remove_silent_parts
+
+def synthetic_speech(duration, sample_rate=SAMPLE_RATE, seed=0):
+    # Alternate 1-3 s bursts of a noisy tone with 0.3-2 s of low-level noise
+    rng = np.random.default_rng(seed)
+    samples = rng.normal(0, 0.001, int(duration * sample_rate)).astype(np.float32)
+    position = 0
+    while position < len(samples):
+        burst = int(rng.uniform(1, 3) * sample_rate)
+        t = np.arange(min(burst, len(samples) - position)) / sample_rate
+        samples[position:position + len(t)] += 0.3 * np.sin(2 * np.pi * 220 * t) * (1 + 0.2 * rng.standard_normal(len(t)))
+        position += burst + int(rng.uniform(0.3, 2) * sample_rate)
+    return samples
+
+def benchmark_silence_detection(duration=600, repeats=5, video_path=None):
+    if video_path:
+        start = time.perf_counter()
+        samples = load_audio(video_path)
+        decode_time = time.perf_counter() - start
+        duration = len(samples) / SAMPLE_RATE
+        print(f"Decoded {duration:.1f}s of audio in {decode_time:.3f}s ({duration / decode_time:.0f}x real time)")
+    else:
+        samples = synthetic_speech(duration)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        intervals = detect_non_silent_intervals(samples)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    print(f"Silence detection: {duration:.1f}s of audio, {len(intervals)} intervals, "
+          f"best {best * 1000:.1f} ms -> {duration / best:,.0f} s of audio per second")
+    return duration / best
+
+def generate_test_clip(path, duration=60, size="1280x720", gop=90):
+    # Test pattern video with a tone that is on for 2.5 s out of every 4 s
+    subprocess.run([
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=300:duration={duration},volume='if(lt(mod(t,4),2.5),1,0)':eval=frame",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-g", str(gop), "-c:a", "aac", "-shortest", path
+    ], check=True)
+
+def benchmark_cut_modes(video_path=None, duration=60):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if not video_path:
+            video_path = os.path.join(tmp_dir, "test_clip.mp4")
+            generate_test_clip(video_path, duration)
+
+        timings = {}
+        for label, mode, smart_encode in [
+            ("exact (moviepy re-encode)", CUT_MODE_EXACT, True),
+            ("fast (smart boundary encode)", CUT_MODE_FAST, True),
+            ("fast (keyframe snap only)", CUT_MODE_FAST, False),
+        ]:
+            output_path = os.path.join(tmp_dir, f"{mode}_{smart_encode}.mp4")
+            start = time.perf_counter()
+            remove_silent_parts(video_path, output_path, mode, smart_encode)
+            timings[label] = time.perf_counter() - start
+
+    baseline = timings["exact (moviepy re-encode)"]
+    for label, elapsed in timings.items():
+        print(f"{label:30s} {elapsed:8.2f}s  {baseline / elapsed:6.1f}x")
+    return timings
+
+KEYWORD_VOCABULARY = (
+    "today we talk about machine learning video editing audio transcription keyword extraction "
+    "social media growth content creators short form reels engagement camera lighting microphone "
+    "storytelling editing workflow timeline color grading export settings thumbnails captions"
+).split()
+
+def synthetic_segments(count, words_per_segment=14, seed=0):
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(KEYWORD_VOCABULARY, words_per_segment)) for _ in range(count)]
+
+def benchmark_keywords(segment_count=200, batch_size=64):
+    # CPU throughput of per-segment KeyBERT calls vs batched extraction with the embedding cache
+    from keybert import KeyBERT
+    from keywords import EmbeddingCache, extract_keywords_batch
+
+    kw_model = KeyBERT()
+    texts = synthetic_segments(segment_count)
+    kw_model.extract_keywords(texts[0])  # Warm up the model
+
+    start = time.perf_counter()
+    for text in texts:
+        kw_model.extract_keywords(text, keyphrase_ngram_range=(1, 2), stop_words="english")
+    per_segment = time.perf_counter() - start
+
+    cache = EmbeddingCache()
+    start = time.perf_counter()
+    extract_keywords_batch(kw_model, texts, cache, batch_size)
+    batched = time.perf_counter() - start
+
+    # Second video with the same vocabulary: candidate phrases come from the cache
+    start = time.perf_counter()
+    extract_keywords_batch(kw_model, synthetic_segments(segment_count, seed=1), cache, batch_size)
+    cached = time.perf_counter() - start
+
+    for label, elapsed in [("per-segment", per_segment), ("batched", batched), ("batched, warm cache", cached)]:
+        print(f"{label:20s} {elapsed:8.2f}s  {segment_count / elapsed:8.1f} segments/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the whisper batch pipeline")
+    parser.add_argument("--duration", type=float, default=600, help="Seconds of synthetic audio")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--video", help="Benchmark on a real video instead of synthetic media")
+    parser.add_argument("--cut", action="store_true", help="Compare the exact and fast cut modes")
+    parser.add_argument("--keywords", type=int, metavar="SEGMENTS", help="Compare per-segment and batched keyword extraction")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    if args.keywords:
+        benchmark_keywords(args.keywords, args.batch_size)
+    elif args.cut:
+        benchmark_cut_modes(args.video)
+    else:
+        benchmark_silence_detection(args.duration, args.repeats, args.video)
@@ -0,0 +1,118 @@
+import sqlite3
+from collections import OrderedDict
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+
+# Same candidate settings process_video has always used
+KEYPHRASE_NGRAM_RANGE = (1, 2)
+STOP_WORDS = "english"
+TOP_N = 5
+
+EMBEDDING_BATCH_SIZE = 64  # Texts per sentence-transformer forward pass
+EMBEDDING_CACHE_SIZE = 50000  # Phrase embeddings kept in memory
+
+class EmbeddingCache:
+    # LRU cache of phrase -> embedding, optionally backed by an SQLite file so
+    # vocabulary embedded in earlier runs is not embedded again
+
+    def __init__(self, max_entries=EMBEDDING_CACHE_SIZE, path=None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, timeout=30)  # Worker processes share the file
+            self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (phrase TEXT PRIMARY KEY, vector BLOB)")
+
+    def get_many(self, phrases):
+        found = {}
+        missing = []
+        for phrase in phrases:
+            if phrase in self.entries:
+                self.entries.move_to_end(phrase)
+                found[phrase] = self.entries[phrase]
+            else:
+                missing.append(phrase)
+
+        if self.db is not None and missing:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.db.execute(f"SELECT phrase, vector FROM embeddings WHERE phrase IN ({placeholders})", chunk)
+                for phrase, vector in rows:
+                    found[phrase] = np.frombuffer(vector, dtype=np.float32)
+                    self._remember(phrase, found[phrase])
+
+        return found
+
+    def put_many(self, phrases, embeddings):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        for phrase, embedding in zip(phrases, embeddings):
+            self._remember(phrase, embedding)
+
+        if self.db is not None:
+            with self.db:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (phrase, vector) VALUES (?, ?)",
+                    [(phrase, embedding.tobytes()) for phrase, embedding in zip(phrases, embeddings)]
+                )
+
+    def _remember(self, phrase, embedding):
+        self.entries[phrase] = embedding
+        self.entries.move_to_end(phrase)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+def embed_in_batches(kw_model, texts, batch_size=EMBEDDING_BATCH_SIZE):
+    # One forward pass per batch through KeyBERT's embedding backend
+    batches = [kw_model.model.embed(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+    return np.vstack(batches).astype(np.float32)
+
+def embed_phrases(kw_model, phrases, cache=None, batch_size=EMBEDDING_BATCH_SIZE):
+    found = cache.get_many(phrases) if cache is not None else {}
+    missing = [phrase for phrase in phrases if phrase not in found]
+
+    if missing:
+        new_embeddings = embed_in_batches(kw_model, missing, batch_size)
+        found.update(zip(missing, new_embeddings))
+        if cache is not None:
+            cache.put_many(missing, new_embeddings)
+
+    return np.vstack([found[phrase] for phrase in phrases])
+
+def extract_keywords_batch(kw_model, texts, cache=None, batch_size=EMBEDDING_BATCH_SIZE, top_n=TOP_N):
+    # Keywords for many texts at once: documents and candidate phrases are embedded in
+    # batches (phrases through the cache) and handed to KeyBERT precomputed
+    if not texts:
+        return []
+
+    vectorizer = CountVectorizer(ngram_range=KEYPHRASE_NGRAM_RANGE, stop_words=STOP_WORDS)
+    try:
+        vectorizer.fit(texts)
+    except ValueError:
+        # Nothing but stop words in the whole batch
+        return [[] for _ in texts]
+
+    # KeyBERT fits the same vectorizer internally, so the vocabulary order matches
+    phrases = list(vectorizer.get_feature_names_out())
+    word_embeddings = embed_phrases(kw_model, phrases, cache, batch_size)
+    doc_embeddings = embed_in_batches(kw_model, texts, batch_size)
+
+    keywords = kw_model.extract_keywords(
+        texts,
+        keyphrase_ngram_range=KEYPHRASE_NGRAM_RANGE,
+        stop_words=STOP_WORDS,
+        top_n=top_n,
+        doc_embeddings=doc_embeddings,
+        word_embeddings=word_embeddings
+    )
+
+    # KeyBERT unwraps the result when given a single document
+    if len(texts) == 1:
+        keywords = [keywords]
+    return keywords
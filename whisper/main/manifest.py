@@ -0,0 +1,53 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def file_hash(path):
+    # SHA-256 of the file contents, read in chunks so large videos don't sit in memory
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def config_fingerprint(settings):
+    # Stable hash of everything that changes the output (pipeline version, models, thresholds)
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+class Manifest:
+    # Persistent record of which pipeline stages finished for each (content, config) pair,
+    # with each stage's output so a rerun can resume after the last completed stage.
+    # Shared by the decode and writer threads, so access is serialised with a lock.
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS stages ("
+                "content_hash TEXT, config_hash TEXT, stage TEXT, video_path TEXT, "
+                "payload TEXT, finished_at REAL, PRIMARY KEY (content_hash, config_hash, stage))"
+            )
+
+    def stages(self, content_hash, config_hash):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT stage, payload FROM stages WHERE content_hash = ? AND config_hash = ?",
+                (content_hash, config_hash)
+            ).fetchall()
+        return {stage: json.loads(payload) for stage, payload in rows}
+
+    def mark(self, content_hash, config_hash, stage, video_path, payload=None):
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?, ?)",
+                (content_hash, config_hash, stage, video_path, json.dumps(payload), time.time())
+            )
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -1,59 +1,306 @@
 import os
+import subprocess
+import tempfile
+from fractions import Fraction
 from moviepy.editor import VideoFileClip, concatenate_videoclips
 import numpy as np
 
 # Threshold for detecting silence
 SILENCE_THRESHOLD = 0.01  # Adjust this based on noise level
+SILENCE_THRESHOLD_DB = 20 * np.log10(SILENCE_THRESHOLD)  # Same threshold in dBFS (-40 dB)
 MIN_SILENCE_DURATION = 0.5  # Minimum duration of silence in seconds to remove
 
-def remove_silent_parts(video_path, output_path):
+# Windowed energy detection settings
+SAMPLE_RATE = 16000  # Audio is decoded to mono at this rate for detection
+WINDOW_SIZE = 0.03  # Length of each RMS window in seconds
+HOP_SIZE = 0.01  # Step between consecutive windows in seconds
+HYSTERESIS_DB = 6.0  # Speech ends only once energy drops this far below the threshold
+MIN_SPEECH_DURATION = 0.1  # Drop speech bursts shorter than this (clicks, pops)
+SPEECH_PADDING = 0.1  # Seconds kept on each side of a speech interval
+
+# Output modes for remove_silent_parts
+CUT_MODE_EXACT = "exact"  # Re-encode the whole result with moviepy (frame accurate, slow)
+CUT_MODE_FAST = "fast"  # Cut with ffmpeg and stream copy, re-encoding only partial GOPs
+SMART_ENCODE_PRESET = "veryfast"  # x264 preset for the re-encoded cut boundaries
+SMART_ENCODE_CRF = 18  # x264 quality for the re-encoded cut boundaries
+KEYFRAME_TOLERANCE = 0.05  # Cuts this close to a keyframe are snapped without re-encoding
+SMART_ENCODE_CODECS = ("h264",)  # Codecs libx264 can splice into without breaking stream copy
+DEFAULT_FRAME_RATE = 30  # Used when the source has too few frames to measure its rate
+
+def load_audio(video_path, sample_rate=SAMPLE_RATE):
+    # Decode the whole audio track once into a mono float32 buffer using ffmpeg
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", video_path,
+        "-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "f32le", "-"
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def window_energy_db(samples, sample_rate=SAMPLE_RATE, window_size=WINDOW_SIZE, hop_size=HOP_SIZE):
+    # RMS level of every window in dBFS, computed from a running sum of squares
+    window = max(1, int(round(window_size * sample_rate)))
+    hop = max(1, int(round(hop_size * sample_rate)))
+    if len(samples) < window:
+        window = max(1, len(samples))
+
+    squares = np.square(samples, dtype=np.float64)
+    cumulative = np.concatenate(([0.0], np.cumsum(squares)))
+    starts = np.arange(0, len(samples) - window + 1, hop)
+    mean_square = (cumulative[starts + window] - cumulative[starts]) / window
+
+    return 10 * np.log10(np.maximum(mean_square, 1e-12)), hop
+
+def hysteresis_mask(energy_db, threshold_db=SILENCE_THRESHOLD_DB, hysteresis_db=HYSTERESIS_DB):
+    # A window opens speech above threshold_db and only closes it below threshold_db - hysteresis_db.
+    # Windows in between inherit the state of the last window that crossed either line.
+    above = energy_db > threshold_db
+    below = energy_db < threshold_db - hysteresis_db
+    decided = above | below
+    last_decided = np.where(decided, np.arange(len(energy_db)), 0)
+    np.maximum.accumulate(last_decided, out=last_decided)
+    return above[last_decided] & decided[last_decided]
+
+def mask_to_intervals(mask, hop_seconds, window_seconds):
+    # Convert runs of True windows into (start, end) times
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return starts * hop_seconds, (ends - 1) * hop_seconds + window_seconds
+
+def detect_non_silent_intervals(samples, sample_rate=SAMPLE_RATE, threshold_db=SILENCE_THRESHOLD_DB,
+                                window_size=WINDOW_SIZE, hop_size=HOP_SIZE, hysteresis_db=HYSTERESIS_DB,
+                                min_speech_duration=MIN_SPEECH_DURATION,
+                                min_silence_duration=MIN_SILENCE_DURATION, padding=SPEECH_PADDING):
+    duration = len(samples) / sample_rate
+    if len(samples) == 0:
+        return []
+
+    energy_db, hop = window_energy_db(samples, sample_rate, window_size, hop_size)
+    mask = hysteresis_mask(energy_db, threshold_db, hysteresis_db)
+    starts, ends = mask_to_intervals(mask, hop / sample_rate, min(window_size, duration))
+    if len(starts) == 0:
+        return []
+
+    # Silences shorter than min_silence_duration are kept as part of the speech around them
+    if len(starts) > 1:
+        keep_gap = starts[1:] - ends[:-1] >= min_silence_duration
+        starts = starts[np.concatenate(([True], keep_gap))]
+        ends = ends[np.concatenate((keep_gap, [True]))]
+
+    # Bursts shorter than min_speech_duration are treated as noise
+    long_enough = ends - starts >= min_speech_duration
+    starts, ends = starts[long_enough], ends[long_enough]
+    if len(starts) == 0:
+        return []
+
+    # Pad each interval and merge any that now overlap
+    starts = np.maximum(starts - padding, 0.0)
+    ends = np.minimum(ends + padding, duration)
+    overlaps = starts[1:] <= ends[:-1]
+    starts = starts[np.concatenate(([True], ~overlaps))]
+    ends = ends[np.concatenate((~overlaps, [True]))]
+
+    return [(round(float(start), 3), round(float(end), 3)) for start, end in zip(starts, ends)]
+
+def build_speech_track(samples, intervals, sample_rate=SAMPLE_RATE):
+    # Join only the speech intervals into one buffer and remember where each one came from
+    bounds = [(int(start * sample_rate), int(end * sample_rate)) for start, end in intervals]
+    speech = np.concatenate([samples[start:end] for start, end in bounds]) if bounds else samples[:0]
+    lengths = np.array([end - start for start, end in bounds], dtype=np.int64)
+    speech_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) / sample_rate if bounds else np.zeros(0)
+    original_starts = np.array([start for start, _ in bounds], dtype=np.float64) / sample_rate
+    return speech, speech_starts, original_starts
+
+def to_original_time(t, speech_starts, original_starts, is_end=False):
+    # Map a time on the speech-only track back onto the source video's timeline.
+    # An end time sitting exactly on a join belongs to the interval before it.
+    side = "left" if is_end else "right"
+    index = max(int(np.searchsorted(speech_starts, t, side=side)) - 1, 0)
+    return float(original_starts[index] + (t - speech_starts[index]))
+
+def probe_video_packets(video_path):
+    # Read the packet list of the first video (and audio) stream without decoding
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", video_path,
+        "-map", "0:v:0", "-map", "0:a:0?", "-c", "copy", "-f", "framecrc", "-"
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, text=True)
+
+    stream = {"codec": None, "keyframes": [], "has_audio": False, "reordered": False}
+    time_base = None
+    pts = []
+    for line in result.stdout.splitlines():
+        if line.startswith("#tb 0:"):
+            numerator, denominator = line.split(":", 1)[1].strip().split("/")
+            time_base = Fraction(int(numerator), int(denominator))
+        elif line.startswith("#tb 1:"):
+            stream["has_audio"] = True
+        elif line.startswith("#codec_id 0:"):
+            stream["codec"] = line.split(":", 1)[1].strip()
+        elif not line.startswith("#"):
+            fields = [field.strip() for field in line.split(",")]
+            if fields[0] != "0":
+                continue
+            # Packets come in decode order; a pts going backwards means B-frames
+            if pts and int(fields[2]) < pts[-1]:
+                stream["reordered"] = True
+            pts.append(int(fields[2]))
+            # framecrc only prints packet flags when they differ from "keyframe"
+            flags = fields[6] if len(fields) > 6 else "F=0x1"
+            if int(flags.split("=")[1], 16) & 1:
+                stream["keyframes"].append(float(pts[-1] * time_base))
+
+    # Mean frame spacing, snapped to the nearest NTSC-style rate (30, 30000/1001, ...)
+    span = (max(pts) - min(pts)) * time_base if len(pts) > 1 else 0
+    frame_rate = Fraction(len(pts) - 1) / span if span else Fraction(DEFAULT_FRAME_RATE)
+    stream["frame_rate"] = frame_rate.limit_denominator(1001)
+    stream["timescale"] = time_base.denominator
+    stream["keyframes"].sort()
+    return stream
+
+def plan_fast_cuts(intervals, keyframes, smart_encode=True, reordered=False):
+    # Turn speech intervals into ("encode" | "copy", start, end) pieces.
+    # Stream copy can only start on a keyframe, so each interval either gets its head
+    # (up to the next keyframe) re-encoded, or its start snapped back to the previous keyframe.
+    # With B-frames (reordered) a copy can't stop mid-GOP either, so the tail after the last
+    # keyframe is re-encoded too, or the end snapped forward to the next keyframe.
+    keyframes = np.asarray(keyframes, dtype=np.float64)
+    pieces = []
+    for start, end in intervals:
+        previous_index = np.searchsorted(keyframes, start + KEYFRAME_TOLERANCE, side="right") - 1
+        next_index = np.searchsorted(keyframes, start - KEYFRAME_TOLERANCE, side="left")
+        previous_key = keyframes[previous_index] if previous_index >= 0 else 0.0
+        next_key = keyframes[next_index] if next_index < len(keyframes) else end
+
+        if start - previous_key <= KEYFRAME_TOLERANCE:
+            new_pieces = [("copy", previous_key, end)]
+        elif not smart_encode:
+            new_pieces = [("copy", previous_key, end)]
+        elif next_key >= end:
+            new_pieces = [("encode", start, end)]
+        else:
+            new_pieces = [("encode", start, next_key), ("copy", next_key, end)]
+
+        if reordered and new_pieces[-1][0] == "copy":
+            _, copy_start, copy_end = new_pieces.pop()
+            tail_index = np.searchsorted(keyframes, copy_end + KEYFRAME_TOLERANCE, side="right") - 1
+            tail_key = keyframes[tail_index] if tail_index >= 0 else 0.0
+            after_index = np.searchsorted(keyframes, copy_end, side="left")
+            if abs(copy_end - tail_key) <= KEYFRAME_TOLERANCE:
+                new_pieces.append(("copy", copy_start, tail_key))
+            elif not smart_encode:
+                new_pieces.append(("copy", copy_start, keyframes[after_index] if after_index < len(keyframes) else copy_end))
+            elif tail_key > copy_start:
+                new_pieces += [("copy", copy_start, tail_key), ("encode", tail_key, copy_end)]
+            else:
+                new_pieces.append(("encode", copy_start, copy_end))
+
+        for kind, piece_start, piece_end in new_pieces:
+            # Snapping back can overlap the previous piece; extend that piece instead
+            # (a copy only swallows an encode when it is free to stop mid-GOP)
+            if pieces and piece_start <= pieces[-1][2]:
+                last_kind, last_start, last_end = pieces[-1]
+                if last_kind == kind or (kind == "encode" and not reordered):
+                    pieces[-1] = (last_kind, last_start, max(last_end, piece_end))
+                    continue
+                piece_start = last_end
+            pieces.append((kind, float(piece_start), float(piece_end)))
+
+    return pieces
+
+def fast_cut(video_path, intervals, output_path, smart_encode=True):
+    stream = probe_video_packets(video_path)
+    frame_rate, timescale = stream["frame_rate"], stream["timescale"]
+    smart_encode = smart_encode and stream["codec"] in SMART_ENCODE_CODECS
+    pieces = []
+    for kind, start, end in plan_fast_cuts(intervals, stream["keyframes"], smart_encode, stream["reordered"]):
+        # Whole frames only, so every piece lasts exactly frames / frame_rate
+        first_frame, end_frame = round(start * frame_rate), round(end * frame_rate)
+        if end_frame > first_frame:
+            pieces.append((kind, first_frame, end_frame))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Video pieces are written as MP4 in the source's time base and joined with the concat
+        # demuxer; each one starts at zero and holds an exact frame count, so the joins line up
+        piece_paths = []
+        for i, (kind, first_frame, end_frame) in enumerate(pieces):
+            piece_path = os.path.join(tmp_dir, f"piece_{i:05d}.mp4")
+            start = first_frame / frame_rate
+            # Copy pieces seek a hair past their keyframe so rounding can't land on the previous one
+            seek = float(start) + 0.001 if kind == "copy" else float(start)
+            command = [
+                "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+                "-ss", f"{seek:.6f}", "-i", video_path,
+                "-map", "0:v:0", "-frames:v", str(end_frame - first_frame)
+            ]
+            if kind == "copy":
+                command += ["-c", "copy"]
+            else:
+                command += ["-c:v", "libx264", "-preset", SMART_ENCODE_PRESET, "-crf", str(SMART_ENCODE_CRF),
+                            "-r", str(frame_rate)]
+            command += ["-avoid_negative_ts", "make_zero", "-video_track_timescale", str(timescale), piece_path]
+            subprocess.run(command, check=True)
+            piece_paths.append(piece_path)
+
+        list_path = os.path.join(tmp_dir, "pieces.txt")
+        with open(list_path, "w") as f:
+            for piece_path in piece_paths:
+                f.write(f"file '{piece_path}'\n")
+
+        command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_path]
+        if stream["has_audio"]:
+            # The audio is cut from the source in one pass over the same frame-aligned spans and
+            # re-encoded as a single track, so no AAC priming or packet padding lands on a join
+            spans = []
+            for _, first_frame, end_frame in pieces:
+                if spans and spans[-1][1] == first_frame:
+                    spans[-1][1] = end_frame
+                else:
+                    spans.append([first_frame, end_frame])
+            trims = "".join(
+                f"[1:a:0]atrim=start={float(first / frame_rate):.6f}:end={float(end / frame_rate):.6f},"
+                f"asetpts=PTS-STARTPTS[a{i}];" for i, (first, end) in enumerate(spans)
+            )
+            labels = "".join(f"[a{i}]" for i in range(len(spans)))
+            command += [
+                "-i", video_path, "-filter_complex", f"{trims}{labels}concat=n={len(spans)}:v=0:a=1[audio]",
+                "-map", "0:v:0", "-map", "[audio]", "-c:a", "aac"
+            ]
+        command += ["-c:v", "copy", "-video_track_timescale", str(timescale), "-movflags", "+faststart", output_path]
+        subprocess.run(command, check=True)
+
+    return [(kind, float(first / frame_rate), float(end / frame_rate)) for kind, first, end in pieces]
+
+def exact_cut(video_path, intervals, output_path):
+    video = VideoFileClip(video_path)
     try:
-        # Load video
-        video = VideoFileClip(video_path)
-        
-        # Extract the audio from the video
-        audio = video.audio
-
-        # Get the audio volume at each frame
-        audio_volume = np.array([audio.get_frame(t).mean() for t in np.arange(0, audio.duration, 1 / audio.fps)])
-
-        # Detect non-silent segments
-        non_silent_intervals = []
-        start = None
-        
-        for i, volume in enumerate(audio_volume):
-            time = i / audio.fps
-
-            if volume > SILENCE_THRESHOLD:
-                if start is None:
-                    start = time  # Mark the start of a non-silent segment
+        # Concatenate non-silent clips and re-encode the output video
+        clips = [video.subclip(start, min(end, video.duration)) for start, end in intervals]
+        final_video = concatenate_videoclips(clips)
+        final_video.write_videofile(output_path, codec="libx264")
+    finally:
+        # Properly close the video object to release system resources
+        video.close()
+
+def remove_silent_parts(video_path, output_path, mode=CUT_MODE_EXACT, smart_encode=True):
+    try:
+        # Decode the audio once and detect non-silent segments
+        samples = load_audio(video_path)
+        non_silent_intervals = detect_non_silent_intervals(samples)
+
+        if non_silent_intervals:
+            if mode == CUT_MODE_FAST:
+                fast_cut(video_path, non_silent_intervals, output_path, smart_encode)
             else:
-                if start is not None and time - start > MIN_SILENCE_DURATION:
-                    non_silent_intervals.append((start, time))  # Store the non-silent interval
-                    start = None
-
-        if start is not None:
-            non_silent_intervals.append((start, audio.duration))  # Add the last non-silent interval
-        
-        # Create new video clips from non-silent segments
-        clips = [video.subclip(start, end) for start, end in non_silent_intervals]
-
-        if clips:
-            # Concatenate non-silent clips and write the output video
-            final_video = concatenate_videoclips(clips)
-            final_video.write_videofile(output_path, codec="libx264")
+                exact_cut(video_path, non_silent_intervals, output_path)
             print(f"Processed video saved to {output_path}")
         else:
             print(f"No non-silent sections detected in {video_path}")
 
-        # Properly close the video and audio objects to release system resources
-        audio.close()
-        video.close()
-
     except Exception as e:
         print(f"Error processing video {video_path}: {e}")
 
-def remove_silent_parts_from_videos():
+def remove_silent_parts_from_videos(mode=CUT_MODE_EXACT):
     # Define input and output folders
     current_dir = os.path.dirname(os.path.abspath(__file__))
     source_folder = os.path.normpath(os.path.join(current_dir, "input_videos"))
@@ -68,4 +315,4 @@ def remove_silent_parts_from_videos():
             video_path = os.path.join(source_folder, filename)
             output_filename = filename.replace(".mp4", "_nosilence.mp4")
             output_path = os.path.join(output_folder, output_filename)
-            remove_silent_parts(video_path, output_path)
+            remove_silent_parts(video_path, output_path, mode)
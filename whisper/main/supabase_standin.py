@@ -0,0 +1,115 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Minimal in-memory stand-in for the Supabase (PostgREST) REST endpoint: enough of
+# insert/upsert/select on /rest/v1/<table> to run the batch job without a real project.
+# Point SUPABASE_PROJECT_URL at it; any JWT-shaped SUPABASE_ANON_KEY is accepted.
+
+class StandinState:
+    def __init__(self, delay=0.0, fail_rate=0.0):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.tables = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _table(self):
+            parsed = urlparse(self.path)
+            parts = parsed.path.strip("/").split("/")
+            if len(parts) != 3 or parts[:2] != ["rest", "v1"]:
+                return None, parsed
+            return parts[2], parsed
+
+        def _send(self, status, body=None):
+            payload = json.dumps(body).encode() if body is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            table, _ = self._table()
+            if table is None:
+                return self._send(404, {"message": "not found"})
+            with state.lock:
+                rows = list(state.tables.get(table, {}).values())
+            self._send(200, rows)
+
+        def do_POST(self):
+            table, parsed = self._table()
+            if table is None:
+                return self._send(404, {"message": "not found"})
+
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with state.lock:
+                state.requests += 1
+
+            if state.delay:
+                time.sleep(state.delay)
+            if random.random() < state.fail_rate:
+                return self._send(503, {"message": "stand-in injected failure"})
+
+            rows = json.loads(body or b"[]")
+            if isinstance(rows, dict):
+                rows = [rows]
+
+            # Upserts key rows on the on_conflict columns, plain inserts get a fresh id
+            query = parse_qs(parsed.query)
+            conflict_columns = query.get("on_conflict", [""])[0].split(",")
+            merge = "merge-duplicates" in self.headers.get("Prefer", "") or query.get("on_conflict")
+
+            with state.lock:
+                stored = state.tables.setdefault(table, {})
+                keys = [
+                    tuple(row[column] for column in conflict_columns)
+                    if merge and all(column in row for column in conflict_columns) else None
+                    for row in rows
+                ]
+                keyed = [key for key in keys if key is not None]
+                if len(set(keyed)) < len(keyed):
+                    # Like Postgres, one upsert can't update the same row twice
+                    return self._send(500, {
+                        "code": "21000",
+                        "message": "ON CONFLICT DO UPDATE command cannot affect row a second time",
+                    })
+                for row, key in zip(rows, keys):
+                    key = key or ("__id", len(stored))
+                    stored[key] = {**stored.get(key, {}), **row}
+
+            prefer = self.headers.get("Prefer", "")
+            self._send(201, rows if "return=representation" in prefer else [])
+
+    return Handler
+
+def start_standin(port=0, delay=0.0, fail_rate=0.0):
+    # Start the stand-in on a background thread; returns (server, state, url)
+    state = StandinState(delay, fail_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Supabase REST endpoint")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to stall every write")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of writes answered with 503")
+    args = parser.parse_args()
+
+    server, state, url = start_standin(args.port, args.delay, args.fail_rate)
+    print(f"Supabase stand-in listening on {url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,141 @@
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, asdict
+
+# Bulk writer settings
+MAX_CHUNK_ROWS = 500  # Rows per upsert request
+MAX_CHUNK_BYTES = 512 * 1024  # JSON payload size per upsert request
+MAX_RETRIES = 4
+SLOW_WRITE_SECONDS = 10.0  # After a write this slow, remaining chunks go to the spool
+UPSERT_KEY = "video_title,start"  # Needs a unique constraint on (video_title, start)
+
+@dataclass
+class TranscriptSegment:
+    video_title: str
+    start: float
+    end: float
+    text: str
+    keywords: str
+
+    def to_row(self):
+        return asdict(self)
+
+def build_segments(video_title, whisper_segments, segment_keywords):
+    # Whisper segments + KeyBERT results -> TranscriptSegment records
+    return [
+        TranscriptSegment(
+            video_title=video_title,
+            start=round(float(segment["start"]), 2),
+            end=round(float(segment["end"]), 2),
+            text=segment["text"].strip(),
+            keywords=", ".join(kw[0] for kw in keywords)
+        )
+        for segment, keywords in zip(whisper_segments, segment_keywords)
+    ]
+
+def format_transcript(records):
+    # Human readable transcript file, same layout as before
+    result_text = ""
+    for record in records:
+        result_text += f"Segment Start: {record.start:.2f}s, End: {record.end:.2f}s\n"
+        result_text += f"Text: {record.text}\n"
+        result_text += f"Keywords: {record.keywords}\n\n"
+    return result_text
+
+def chunk_rows(rows, max_rows=MAX_CHUNK_ROWS, max_bytes=MAX_CHUNK_BYTES):
+    # Split rows into chunks bounded by both row count and encoded size
+    chunk = []
+    chunk_bytes = 0
+    for row in rows:
+        row_bytes = len(json.dumps(row))
+        if chunk and (len(chunk) >= max_rows or chunk_bytes + row_bytes > max_bytes):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(row)
+        chunk_bytes += row_bytes
+    if chunk:
+        yield chunk
+
+def dedupe_rows(rows, key_columns=UPSERT_KEY.split(",")):
+    # One row per upsert key, the last one given winning. Postgres rejects an upsert that
+    # touches the same row twice, and starts are rounded, so two segments can share a key.
+    deduped = {}
+    for index, row in enumerate(rows):
+        key = tuple(row.get(column) for column in key_columns) if all(column in row for column in key_columns) else index
+        deduped.pop(key, None)
+        deduped[key] = row
+    return list(deduped.values())
+
+class BulkWriter:
+    # Upserts transcript rows into a Supabase table in size-bounded chunks with retry and
+    # backoff. Chunks that fail, or that would queue behind a slow database, are appended
+    # to a local JSONL spool and replayed by flush_spool().
+
+    def __init__(self, client, table="transcripts", spool_path=None, max_rows=MAX_CHUNK_ROWS,
+                 max_bytes=MAX_CHUNK_BYTES, max_retries=MAX_RETRIES, slow_write_seconds=SLOW_WRITE_SECONDS):
+        self.client = client
+        self.table = table
+        self.spool_path = spool_path
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.slow_write_seconds = slow_write_seconds
+
+    def write(self, records):
+        rows = dedupe_rows([record.to_row() if isinstance(record, TranscriptSegment) else record for record in records])
+        written = 0
+        spooled = 0
+        database_slow = False
+
+        for chunk in chunk_rows(rows, self.max_rows, self.max_bytes):
+            if database_slow and self.spool_path:
+                spooled += self._spool(chunk)
+                continue
+
+            start = time.perf_counter()
+            if self._upsert(chunk):
+                written += len(chunk)
+                database_slow = time.perf_counter() - start > self.slow_write_seconds
+            elif self.spool_path:
+                spooled += self._spool(chunk)
+            else:
+                raise RuntimeError(f"Failed to write {len(chunk)} rows to {self.table}")
+
+        return {"written": written, "spooled": spooled}
+
+    def flush_spool(self):
+        # Replay spooled chunks; anything that still fails stays in the spool
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return 0
+
+        with open(self.spool_path, "r", encoding="utf-8") as f:
+            chunks = [json.loads(line) for line in f if line.strip()]
+        os.remove(self.spool_path)
+
+        written = 0
+        for chunk in map(dedupe_rows, chunks):
+            if self._upsert(chunk):
+                written += len(chunk)
+            else:
+                self._spool(chunk)
+        return written
+
+    def _upsert(self, chunk):
+        for attempt in range(self.max_retries):
+            try:
+                self.client.table(self.table).upsert(chunk, on_conflict=UPSERT_KEY).execute()
+                return True
+            except Exception as e:
+                print(f"Upsert of {len(chunk)} rows failed (attempt {attempt + 1}/{self.max_retries}): {e}")
+
+            if attempt < self.max_retries - 1:
+                time.sleep((2 ** attempt) + random.random())
+        return False
+
+    def _spool(self, chunk):
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(chunk) + "\n")
+        return len(chunk)
@@ -1,116 +1,383 @@
 import os
+import time
+import argparse
+import multiprocessing
 import whisper
-import subprocess
 import json
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from keybert import KeyBERT
 from supabase import create_client
 from dotenv import load_dotenv
-from silencer import remove_silent_parts
+import silencer
+import keywords
+import instrumentation
+from silencer import SAMPLE_RATE, remove_silent_parts, load_audio, detect_non_silent_intervals, build_speech_track, to_original_time
+from keywords import EmbeddingCache, extract_keywords_batch
+from transcripts import TranscriptSegment, BulkWriter, build_segments, format_transcript
+from manifest import Manifest, file_hash, config_fingerprint
 
 # Load environment variables from .env file
 load_dotenv()
-
-# Get Supabase credentials from environment variables
-url = os.getenv("SUPABASE_PROJECT_URL")
-key = os.getenv("SUPABASE_ANON_KEY")
-
-# Initialize Supabase client
-supabase = create_client(url, key)
+instrumentation.configure(pipeline="whisper_main")
 
 # Define input and output folders
 current_dir = os.path.dirname(os.path.abspath(__file__))
 input_folder = os.path.join(current_dir, "input_videos")
 output_folder = os.path.join(current_dir, "output_videos")
 
-# Ensure the output folder exists
-os.makedirs(output_folder, exist_ok=True)
+# "speech_only" decodes the source audio once and transcribes just the detected speech,
+# "silence_removal" writes a _nosilence.mp4 first and transcribes that file
+PIPELINE_MODE = os.getenv("WHISPER_PIPELINE_MODE", "speech_only")
+
+# Worker pool: each transcription worker loads the models once. Decoding and silence
+# detection run on threads ahead of the workers, DB writes on a thread behind them.
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+DECODE_THREADS = int(os.getenv("DECODE_THREADS", "2"))
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+
+KEYWORD_BATCH_SIZE = int(os.getenv("KEYWORD_BATCH_SIZE", "64"))
+# Transcribed videos whose segments go through one keyword extraction call together
+KEYWORD_VIDEO_BATCH = int(os.getenv("KEYWORD_VIDEO_BATCH", "8"))
+KEYWORD_CACHE_PATH = os.getenv("KEYWORD_CACHE_PATH", os.path.join(output_folder, "keyword_embeddings.sqlite"))
+
+# Chunks that can't be written (or would wait on a slow database) are spooled here and retried
+SUPABASE_SPOOL_PATH = os.getenv("SUPABASE_SPOOL_PATH", os.path.join(output_folder, "supabase_spool.jsonl"))
+
+# Finished stages per (file content, pipeline config); bump PIPELINE_VERSION when the
+# processing logic changes in a way the settings below don't capture
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", os.path.join(output_folder, "manifest.sqlite"))
+PIPELINE_VERSION = 1
+
+def pipeline_settings(mode=PIPELINE_MODE):
+    # Everything that changes the stored transcript; a change here reprocesses every video
+    return {
+        "pipeline_version": PIPELINE_VERSION,
+        "mode": mode,
+        "whisper_model": WHISPER_MODEL,
+        "silence_threshold_db": silencer.SILENCE_THRESHOLD_DB,
+        "window_size": silencer.WINDOW_SIZE,
+        "hop_size": silencer.HOP_SIZE,
+        "hysteresis_db": silencer.HYSTERESIS_DB,
+        "min_speech_duration": silencer.MIN_SPEECH_DURATION,
+        "min_silence_duration": silencer.MIN_SILENCE_DURATION,
+        "speech_padding": silencer.SPEECH_PADDING,
+        "keyphrase_ngram_range": list(keywords.KEYPHRASE_NGRAM_RANGE),
+        "keyword_top_n": keywords.TOP_N
+    }
+
+# Per-process models, loaded by init_worker
+model = None
+kw_model = None
+embedding_cache = None
+
+def init_worker(torch_threads=None):
+    global model, kw_model, embedding_cache
+
+    # Split the cores between workers instead of letting every worker grab all of them
+    if torch_threads:
+        import torch
+        torch.set_num_threads(torch_threads)
+
+    # Load the Whisper model
+    model = whisper.load_model(WHISPER_MODEL)
+    kw_model = KeyBERT()
+    embedding_cache = EmbeddingCache(path=KEYWORD_CACHE_PATH)
+
+def video_title_for(path):
+    return os.path.splitext(os.path.basename(path))[0]  # Extract the video title
+
+def prepare_audio(job, manifest=None, fingerprint=None):
+    # Stage 1 (decode thread): decode audio and cut it down to speech
+    video_path, output_path, speech_only = job
+    nosilence_path = output_path.replace("_transcription.txt", ".mp4")
+    title_path = video_path if speech_only else nosilence_path
+    video = video_title_for(video_path)
+    timings = {}
+    prepared = {
+        "video_path": video_path,
+        "title_path": title_path,
+        "output_path": output_path,
+        "audio_seconds": 0.0,
+        "timings": timings
+    }
 
-# Load the Whisper model
-model = whisper.load_model("base")
-kw_model = KeyBERT()
+    stages = {}
+    if manifest is not None:
+        with instrumentation.stage("hash", video=video) as span:
+            prepared["content_hash"] = file_hash(video_path)
+            stages = manifest.stages(prepared["content_hash"], fingerprint)
+            span.count("bytes", os.path.getsize(video_path))
+        timings["hash"] = span.seconds
 
-def parse_transcript(transcript, video_title):
-    parsed_data = []
-    segments = transcript.strip().split("\n\n")  
+        video_title = video_title_for(title_path)
+        if video_title in stages.get("upload", []):
+            prepared["skip"] = True
+            return prepared
+        if "transcribe" in stages:
+            # Resume after transcription; a renamed file only needs new titles
+            prepared["records"] = [TranscriptSegment(**{**row, "video_title": video_title}) for row in stages["transcribe"]["records"]]
+            prepared["audio_seconds"] = stages["transcribe"]["audio_seconds"]
+            return prepared
 
+    if speech_only:
+        with instrumentation.stage("decode", video=video) as span:
+            samples = load_audio(video_path)
+            span.count("samples", len(samples))
+        timings["decode"] = span.seconds
+
+        with instrumentation.stage("detect", video=video) as span:
+            intervals = stages.get("detect")
+            if intervals is None:
+                intervals = detect_non_silent_intervals(samples)
+                if manifest is not None:
+                    manifest.mark(prepared["content_hash"], fingerprint, "detect", video_path, intervals)
+            speech, speech_starts, original_starts = build_speech_track(samples, intervals)
+            span.count("intervals", len(intervals))
+        timings["detect"] = span.seconds
+    else:
+        # Call the remove_silent_parts function from silencer.py, then transcribe its output
+        with instrumentation.stage("detect", video=video) as span:
+            if not (stages.get("detect") and os.path.exists(nosilence_path)):
+                remove_silent_parts(video_path, nosilence_path)
+                if manifest is not None:
+                    manifest.mark(prepared["content_hash"], fingerprint, "detect", video_path, True)
+        timings["detect"] = span.seconds
+
+        with instrumentation.stage("decode", video=video) as span:
+            speech = load_audio(nosilence_path)
+            speech_starts, original_starts = [0.0], [0.0]
+            span.count("samples", len(speech))
+        timings["decode"] = span.seconds
+
+    prepared["audio_seconds"] = len(speech) / SAMPLE_RATE
+    prepared["speech"] = speech
+    prepared["speech_starts"] = speech_starts
+    prepared["original_starts"] = original_starts
+    return prepared
+
+def transcribe_prepared(prepared):
+    # Stage 2 (worker process): Whisper
+    speech = prepared.pop("speech")
+    speech_starts = prepared.pop("speech_starts")
+    original_starts = prepared.pop("original_starts")
+    timings = prepared["timings"]
+    video = video_title_for(prepared["video_path"])
+
+    with instrumentation.stage("transcribe", video=video) as span:
+        segments = model.transcribe(speech)["segments"] if len(speech) else []
+        span.count("samples", len(speech))
+        span.count("segments", len(segments))
+    timings["transcribe"] = span.seconds
+
+    # Put segment times back on the original video's timeline
     for segment in segments:
-        segment_data = {}
-        lines = segment.split("\n")
-
-        for line in lines:
-            if line.startswith("Segment Start:"):
-                # Split the line by commas to separate start and end
-                start_end = line.split(",")
-                start_time = start_end[0].split(":")[1].strip().replace("s", "")
-                end_time = start_end[1].split(":")[1].strip().replace("s", "")
-                
-                segment_data["start"] = float(start_time)
-                segment_data["end"] = float(end_time)
-            elif line.startswith("Text:"):
-                segment_data["text"] = line.split(":")[1].strip()
-            elif line.startswith("Keywords:"):
-                segment_data["keywords"] = line.split(":")[1].strip()
-
-        # Add the video title to each segment
-        segment_data["video_title"] = video_title
-
-        # Add to the list only if start and end times are present
-        if "start" in segment_data and "end" in segment_data:
-            parsed_data.append(segment_data)
-
-    return parsed_data
-
-def insert_to_supabase(data):
-    # Insert data into Supabase
-    response = supabase.table("transcripts").insert(data).execute()
-    return response
-
-def process_video(video_path, output_path):
-    video_title = os.path.splitext(os.path.basename(video_path))[0]  # Extract the video title
-    audio_path = output_path.replace(".txt", ".wav")
-    
-    try:
-        # Extract audio from video using ffmpeg
-        subprocess.run(['ffmpeg', '-i', video_path, audio_path], check=True)
-    except Exception as e:
-        print(f"Error converting video: {e}")
-        return
-
-    # Transcribe audio using Whisper model
-    result = model.transcribe(audio_path)
-
-    # Prepare the result text with segments
-    result_text = ""
-    for segment in result["segments"]:
-        start_time = segment["start"]
-        end_time = segment["end"]
-        text = segment["text"]
-        keywords = kw_model.extract_keywords(text, keyphrase_ngram_range=(1, 2), stop_words='english')
-
-        # Append segment info to result text
-        result_text += f"Segment Start: {start_time:.2f}s, End: {end_time:.2f}s\n"
-        result_text += f"Text: {text.strip()}\n"
-        result_text += f"Keywords: {', '.join([kw[0] for kw in keywords])}\n\n"
-
-    # Save the results to a text file
-    with open(output_path, "w") as f:
-        f.write(result_text)
-
-    # Parse the transcript and insert into Supabase, including the video title
-    formatted_data = parse_transcript(result_text, video_title)
-    insert_response = insert_to_supabase(formatted_data)
-    print(f"Inserted into Supabase: {insert_response}")
-
-# Invoke the silencer to process all videos and remove silent parts
-for filename in os.listdir(input_folder):
-    if filename.endswith(".mp4"):
-        video_path = os.path.join(input_folder, filename)
-        output_filename = filename.replace(".mp4", "_nosilence.mp4")
-        output_path = os.path.join(output_folder, output_filename)
-
-        # Call the remove_silent_parts function from silencer.py
-        remove_silent_parts(video_path, output_path)
-
-        # After silence removal, process the video
-        transcription_output_path = output_path.replace(".mp4", "_transcription.txt")
-        process_video(output_path, transcription_output_path)
+        segment["start"] = to_original_time(segment["start"], speech_starts, original_starts)
+        segment["end"] = to_original_time(segment["end"], speech_starts, original_starts, is_end=True)
+
+    prepared["segments"] = segments
+    return prepared
+
+def extract_keywords_for(results):
+    # Stage 3 (worker process): keywords for the segments of several transcribed videos in
+    # one call, so their documents and candidate phrases share embedding batches
+    texts = [segment["text"] for result in results for segment in result["segments"]]
+    with instrumentation.stage("keywords", videos=len(results)) as span:
+        segment_keywords = extract_keywords_batch(kw_model, texts, embedding_cache, KEYWORD_BATCH_SIZE)
+        span.count("segments", len(texts))
+
+    offset = 0
+    for result in results:
+        segments = result.pop("segments")
+        # Each video is charged its share of the call
+        result["timings"]["keywords"] = span.seconds * len(segments) / max(len(texts), 1)
+        result["records"] = build_segments(video_title_for(result["title_path"]), segments,
+                                           segment_keywords[offset:offset + len(segments)])
+        offset += len(segments)
+    return results
+
+def save_transcript(result, transcript_writer, manifest=None, fingerprint=None):
+    # Stage 4 (writer thread): transcript file + Supabase upsert
+    video_title = video_title_for(result["title_path"])
+    with instrumentation.stage("write", video=video_title_for(result["video_path"])) as span:
+        with open(result["output_path"], "w") as f:
+            f.write(format_transcript(result["records"]))
+
+        insert_response = transcript_writer.write(result["records"])
+        print(f"Inserted into Supabase: {insert_response}")
+        span.count("rows", len(result["records"]))
+        span.count("rows_spooled", insert_response["spooled"])
+
+        # Spooled rows aren't in the database yet, so leave the upload stage open for the next run.
+        # The same content can be uploaded under several names, so keep every title.
+        if manifest is not None and insert_response["spooled"] == 0:
+            uploaded_titles = manifest.stages(result["content_hash"], fingerprint).get("upload", [])
+            if video_title not in uploaded_titles:
+                manifest.mark(result["content_hash"], fingerprint, "upload", result["video_path"], uploaded_titles + [video_title])
+
+    result["timings"]["write"] = span.seconds
+    return result
+
+def find_jobs(mode=PIPELINE_MODE):
+    jobs = []
+    for filename in sorted(os.listdir(input_folder)):
+        if filename.endswith(".mp4"):
+            video_path = os.path.join(input_folder, filename)
+            if mode == "speech_only":
+                # No intermediate video: transcript timestamps refer to the original upload
+                output_path = os.path.join(output_folder, filename.replace(".mp4", "_transcription.txt"))
+            else:
+                output_path = os.path.join(output_folder, filename.replace(".mp4", "_nosilence_transcription.txt"))
+            jobs.append((video_path, output_path, mode == "speech_only"))
+    return jobs
+
+def run_batch(jobs, transcript_writer, workers=WHISPER_WORKERS, decode_threads=DECODE_THREADS, manifest=None, fingerprint=None,
+              keyword_video_batch=KEYWORD_VIDEO_BATCH):
+    # Keep at most two prepared videos per worker in flight so decoded audio doesn't pile up.
+    # Workers are spawned rather than forked because the decode threads are already running.
+    # Transcribed videos wait for keyword_video_batch others (or the end of the queue) and
+    # then go through keyword extraction together.
+    max_in_flight = workers * 2
+    keyword_video_batch = max(1, keyword_video_batch)
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    pending_jobs = iter(jobs)
+    decoding = {}
+    transcribing = {}
+    awaiting_keywords = []
+    keywording = {}
+    writes = []
+    failed = []
+    skipped = []
+    started = time.perf_counter()
+
+    with instrumentation.stage("run_batch", workers=workers) as batch_span, \
+            ThreadPoolExecutor(decode_threads) as decode_pool, \
+            ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                initializer=init_worker, initargs=(torch_threads,)) as transcribe_pool, \
+            ThreadPoolExecutor(1) as write_pool:
+
+        def submit_next():
+            job = next(pending_jobs, None)
+            if job is not None:
+                decoding[decode_pool.submit(prepare_audio, job, manifest, fingerprint)] = job
+
+        def submit_write(result):
+            writes.append(write_pool.submit(save_transcript, result, transcript_writer, manifest, fingerprint))
+
+        def submit_keywords():
+            batch = awaiting_keywords[:keyword_video_batch]
+            del awaiting_keywords[:keyword_video_batch]
+            keywording[transcribe_pool.submit(extract_keywords_for, batch)] = [result["video_path"] for result in batch]
+
+        for _ in range(max_in_flight):
+            submit_next()
+
+        while decoding or transcribing or keywording or awaiting_keywords:
+            # Nothing else will join a partial batch once decoding and transcription have drained
+            while len(awaiting_keywords) >= keyword_video_batch or (awaiting_keywords and not (decoding or transcribing)):
+                submit_keywords()
+
+            done, _ = wait(list(decoding) + list(transcribing) + list(keywording), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in decoding:
+                    job = decoding.pop(future)
+                    try:
+                        prepared = future.result()
+                    except Exception as e:
+                        print(f"Error decoding audio for {job[0]}: {e}")
+                        failed.append(job[0])
+                        submit_next()
+                        continue
+
+                    if prepared.get("skip"):
+                        # Unchanged since the last completed run
+                        skipped.append(job[0])
+                        submit_next()
+                    elif "records" in prepared:
+                        # Transcribed by an earlier run that didn't finish writing
+                        submit_write(prepared)
+                        submit_next()
+                    else:
+                        transcribing[transcribe_pool.submit(transcribe_prepared, prepared)] = job
+                elif future in transcribing:
+                    job = transcribing.pop(future)
+                    try:
+                        awaiting_keywords.append(future.result())
+                    except Exception as e:
+                        print(f"Error transcribing {job[0]}: {e}")
+                        failed.append(job[0])
+                    submit_next()
+                else:
+                    video_paths = keywording.pop(future)
+                    try:
+                        for result in future.result():
+                            if manifest is not None:
+                                manifest.mark(result["content_hash"], fingerprint, "transcribe", result["video_path"], {
+                                    "records": [record.to_row() for record in result["records"]],
+                                    "audio_seconds": result["audio_seconds"]
+                                })
+                            submit_write(result)
+                    except Exception as e:
+                        print(f"Error extracting keywords for {', '.join(video_paths)}: {e}")
+                        failed.extend(video_paths)
+
+        results = []
+        for future in writes:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Error saving transcript: {e}")
+        batch_span.count("videos", len(results))
+        batch_span.count("failed", len(failed))
+        batch_span.count("skipped", len(skipped))
+
+    print_summary(results, failed, skipped, time.perf_counter() - started, workers)
+    return results
+
+def print_summary(results, failed, skipped, wall_time, workers):
+    audio_seconds = sum(result["audio_seconds"] for result in results)
+    stage_totals = {}
+    for result in results:
+        for stage, seconds in result["timings"].items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
+    print("Batch summary")
+    print("=============")
+    print(f"Videos: {len(results)} processed, {len(skipped)} unchanged, {len(failed)} failed, {workers} workers")
+    print(f"Wall time: {wall_time:.1f}s ({len(results) / max(wall_time, 1e-9) * 60:.1f} videos/min)")
+    print(f"Speech audio: {audio_seconds:.1f}s ({audio_seconds / max(wall_time, 1e-9):.1f}x real time)")
+    for stage, seconds in stage_totals.items():
+        print(f"  {stage:10s} {seconds:8.1f}s total")
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe every video in input_videos and store the segments")
+    parser.add_argument("--workers", type=int, default=WHISPER_WORKERS, help="Transcription worker processes")
+    parser.add_argument("--decode-threads", type=int, default=DECODE_THREADS)
+    parser.add_argument("--mode", choices=["speech_only", "silence_removal"], default=PIPELINE_MODE)
+    parser.add_argument("--no-manifest", action="store_true", help="Reprocess everything and record nothing")
+    args = parser.parse_args()
+
+    # Ensure the output folder exists
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Get Supabase credentials from environment variables
+    url = os.getenv("SUPABASE_PROJECT_URL")
+    key = os.getenv("SUPABASE_ANON_KEY")
+
+    # Initialize Supabase client
+    supabase = create_client(url, key)
+    transcript_writer = BulkWriter(supabase, "transcripts", spool_path=SUPABASE_SPOOL_PATH)
+
+    # Retry anything left in the spool by an earlier run
+    transcript_writer.flush_spool()
+
+    manifest = None if args.no_manifest else Manifest(MANIFEST_PATH)
+    fingerprint = config_fingerprint(pipeline_settings(args.mode))
+
+    run_batch(find_jobs(args.mode), transcript_writer, args.workers, args.decode_threads, manifest, fingerprint)
+
+    transcript_writer.flush_spool()
+    if manifest is not None:
+        manifest.close()
+
+if __name__ == "__main__":
+    main()